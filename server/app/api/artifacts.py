@@ -0,0 +1,132 @@
+"""大对象（Artifact）读取 API
+
+Celery 结果中只包含大对象的引用 key，客户端通过本接口获取完整内容：
+- 支持 HTTP Range 请求（断点续传 / 分段读取）
+- JSON Lines 对象支持 offset/limit 分页
+"""
+
+import re
+
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+
+from app.models.api_models import SuccessResponse
+from app.services.blob_store import BlobNotFoundError, get_blob_store, read_jsonl
+
+router = APIRouter()
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+_CONTENT_TYPES = {
+    ".json": "application/json",
+    ".jsonl": "application/x-ndjson",
+}
+
+
+def parse_range(range_header: str, size: int) -> tuple[int, int]:
+    """
+    解析单区间 Range 头
+
+    Returns:
+        (start, end)，半开区间 [start, end)
+
+    Raises:
+        ValueError: 区间格式错误或无法满足
+    """
+    match = _RANGE_PATTERN.match(range_header.strip())
+    if not match:
+        raise ValueError(f"不支持的 Range: {range_header}")
+
+    start_text, end_text = match.groups()
+    if not start_text and not end_text:
+        raise ValueError(f"不支持的 Range: {range_header}")
+
+    if not start_text:
+        # bytes=-N：最后 N 个字节
+        suffix = int(end_text)
+        if suffix == 0:
+            raise ValueError("Range 长度为 0")
+        return max(0, size - suffix), size
+
+    start = int(start_text)
+    end = size if not end_text else min(size, int(end_text) + 1)
+    if start >= size or start >= end:
+        raise ValueError(f"Range 超出范围: {range_header}")
+    return start, end
+
+
+def _content_type(key: str) -> str:
+    for suffix, content_type in _CONTENT_TYPES.items():
+        if key.endswith(suffix):
+            return content_type
+    return "application/octet-stream"
+
+
+@router.get("/{key:path}/items", response_model=SuccessResponse)
+async def list_artifact_items(
+    key: str,
+    offset: int = Query(0, ge=0, description="起始行"),
+    limit: int = Query(50, ge=1, le=500, description="每页条数"),
+):
+    """
+    分页读取 JSON Lines 大对象
+
+    - **key**: 大对象 key（如 documents/{id}/chunks.jsonl）
+    - **offset / limit**: 分页参数
+    """
+    if not key.endswith(".jsonl"):
+        raise HTTPException(status_code=400, detail="只有 JSON Lines 对象支持分页")
+
+    try:
+        items, total = read_jsonl(get_blob_store(), key, offset, limit)
+    except BlobNotFoundError:
+        raise HTTPException(status_code=404, detail="对象不存在")
+
+    next_offset = offset + len(items)
+    return SuccessResponse(
+        data={
+            "items": items,
+            "offset": offset,
+            "limit": limit,
+            "total": total,
+            "next_offset": next_offset if next_offset < total else None,
+        }
+    )
+
+
+@router.get("/{key:path}")
+async def get_artifact(key: str, range_header: str | None = Header(None, alias="Range")):
+    """
+    读取大对象原始内容
+
+    - **key**: 大对象 key（任务结果中的 artifact.key）
+    - 支持 `Range: bytes=start-end` 请求头，返回 206 Partial Content
+    """
+    store = get_blob_store()
+
+    try:
+        size = store.size(key)
+    except (BlobNotFoundError, ValueError):
+        raise HTTPException(status_code=404, detail="对象不存在")
+
+    headers = {"Accept-Ranges": "bytes"}
+    media_type = _content_type(key)
+
+    if range_header is None:
+        return Response(content=store.get_bytes(key), media_type=media_type, headers=headers)
+
+    try:
+        start, end = parse_range(range_header, size)
+    except ValueError:
+        raise HTTPException(
+            status_code=416,
+            detail="请求的区间无法满足",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+
+    headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+    return Response(
+        content=store.get_bytes(key, start, end),
+        status_code=206,
+        media_type=media_type,
+        headers=headers,
+    )
@@ -0,0 +1,84 @@
+"""文档分块 API
+
+按游标分页列出已摄取文档的分块，支持字段投影，
+响应体直接由分块存储中的 JSON 行拼接后流式输出。
+"""
+
+import base64
+import binascii
+from typing import Iterator
+
+import orjson
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from app.services.blob_store import BlobNotFoundError
+from app.services.chunk_store import ChunkFields, get_chunk_store
+
+router = APIRouter()
+
+
+def encode_cursor(offset: int) -> str:
+    """分页游标编码（对客户端不透明）"""
+    return base64.urlsafe_b64encode(f"o:{offset}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """分页游标解码"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, _, value = base64.urlsafe_b64decode(padded).decode().partition(":")
+        offset = int(value)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError(f"无效的游标: {cursor}")
+
+    if prefix != "o" or offset < 0:
+        raise ValueError(f"无效的游标: {cursor}")
+    return offset
+
+
+def _render_page(
+    document_id: str, items: Iterator[bytes], total: int, next_cursor: str | None
+) -> Iterator[bytes]:
+    """逐条输出 SuccessResponse 格式的分页响应"""
+    yield b'{"code":0,"message":"success","data":{"document_id":'
+    yield orjson.dumps(document_id)
+    yield b',"total":' + str(total).encode() + b',"items":['
+    for i, item in enumerate(items):
+        if i:
+            yield b","
+        yield item
+    yield b'],"next_cursor":' + orjson.dumps(next_cursor) + b"}}"
+
+
+@router.get("/{document_id}/chunks")
+async def list_document_chunks(
+    document_id: str,
+    cursor: str | None = Query(None, description="分页游标（上一页返回的 next_cursor）"),
+    limit: int = Query(50, ge=1, le=500, description="每页条数"),
+    fields: ChunkFields = Query("all", description="字段投影：all / text / metadata"),
+):
+    """
+    分页列出文档分块
+
+    - **document_id**: 文档ID（摄取结果中的 document_id）
+    - **cursor**: 分页游标，首页不传
+    - **fields**: `text` 只返回正文，`metadata` 只返回页码、token 数等元数据
+    """
+    try:
+        offset = decode_cursor(cursor) if cursor else 0
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        items, total = get_chunk_store().iter_page(document_id, offset, limit, fields)
+    except (BlobNotFoundError, ValueError):
+        raise HTTPException(status_code=404, detail="文档不存在")
+
+    next_offset = offset + limit
+    next_cursor = encode_cursor(next_offset) if next_offset < total else None
+
+    return StreamingResponse(
+        _render_page(document_id, items, total, next_cursor),
+        media_type="application/json",
+    )
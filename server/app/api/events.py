@@ -0,0 +1,145 @@
+"""任务进度推送 API
+
+通过 SSE 或 WebSocket 推送任务进度事件，替代客户端轮询 /ingest/tasks/{id}
+和 /personalize/tasks/{id}。任务结束（success / failure）后连接自动关闭。
+
+长时间收不到事件时（发布失败、worker 崩溃等）查询 Celery 任务状态兜底；
+超过总时长后关闭连接，客户端回退到轮询接口。
+"""
+
+import asyncio
+import time
+from typing import AsyncIterator
+
+import orjson
+import redis
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from app.config import get_settings
+from app.services.progress import TERMINAL_STATUSES, get_progress_hub
+
+router = APIRouter()
+settings = get_settings()
+
+
+async def _subscribe(task_id: str) -> asyncio.Queue:
+    try:
+        return await get_progress_hub().subscribe(task_id)
+    except (redis.RedisError, OSError):
+        raise HTTPException(status_code=503, detail="进度推送服务不可用，请改用轮询接口")
+
+
+def _celery_event(task_id: str) -> dict | None:
+    """根据 Celery 任务状态构造终止事件；任务未结束或查询失败时返回 None"""
+    try:
+        from celery.result import AsyncResult
+
+        from app.tasks.worker import celery_app
+
+        state = AsyncResult(task_id, app=celery_app).state
+    except Exception as e:
+        print(f"⚠️ 查询任务状态失败: {e}")
+        return None
+
+    if state == "SUCCESS":
+        status, progress = "success", 100
+    elif state in ("FAILURE", "REVOKED"):
+        status, progress = "failure", 0
+    else:
+        return None
+    return {
+        "task_id": task_id,
+        "status": status,
+        "stage": state.lower(),
+        "progress": progress,
+        "detail": {"source": "celery"},
+        "ts": time.time(),
+    }
+
+
+async def _events(task_id: str, queue: asyncio.Queue) -> AsyncIterator[dict | None]:
+    """
+    产出进度事件，等待超过心跳间隔时产出 None（由调用方发送心跳）
+
+    空闲超过 PROGRESS_IDLE_TIMEOUT 时查询 Celery 状态，任务已结束则补发终止事件；
+    超过 PROGRESS_STREAM_TIMEOUT 后直接结束
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.progress_stream_timeout
+    last_event = loop.time()
+
+    while True:
+        now = loop.time()
+        if now >= deadline:
+            return
+        timeout = min(settings.progress_heartbeat, deadline - now)
+        try:
+            event = await asyncio.wait_for(queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            if loop.time() - last_event >= settings.progress_idle_timeout:
+                last_event = loop.time()
+                event = await asyncio.to_thread(_celery_event, task_id)
+                if event is not None:
+                    yield event
+                    return
+            yield None
+            continue
+
+        last_event = loop.time()
+        yield event
+        if event.get("status") in TERMINAL_STATUSES:
+            return
+
+
+async def _sse_stream(task_id: str, queue: asyncio.Queue) -> AsyncIterator[bytes]:
+    """SSE 事件流：事件之间定期发送注释行作为心跳"""
+    hub = get_progress_hub()
+    try:
+        yield b"retry: 3000\n\n"
+        async for event in _events(task_id, queue):
+            if event is None:
+                yield b": keep-alive\n\n"
+            else:
+                yield b"event: progress\ndata: " + orjson.dumps(event) + b"\n\n"
+    finally:
+        hub.unsubscribe(task_id, queue)
+
+
+@router.get("/{task_id}/events")
+async def stream_task_events(task_id: str):
+    """
+    以 SSE（text/event-stream）推送任务进度
+
+    - **task_id**: 摄取或个性化任务 ID
+    - 每个事件：`{"task_id", "status", "stage", "progress", "detail", "ts"}`
+    """
+    queue = await _subscribe(task_id)
+    return StreamingResponse(
+        _sse_stream(task_id, queue),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/{task_id}/ws")
+async def task_events_websocket(websocket: WebSocket, task_id: str):
+    """以 WebSocket 推送任务进度（消息格式与 SSE 相同）"""
+    await websocket.accept()
+
+    hub = get_progress_hub()
+    try:
+        queue = await hub.subscribe(task_id)
+    except (redis.RedisError, OSError):
+        await websocket.close(code=1011, reason="progress channel unavailable")
+        return
+
+    try:
+        async for event in _events(task_id, queue):
+            if event is not None:
+                await websocket.send_text(orjson.dumps(event).decode())
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        hub.unsubscribe(task_id, queue)
@@ -7,11 +7,14 @@ import os
 import uuid
 from pathlib import Path
 
-from fastapi import APIRouter, File, HTTPException, UploadFile
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
 
 from app.config import get_settings
 from app.models.api_models import IngestResponse, SuccessResponse, TaskResponse
-from app.tasks.ingest_pdf import ingest_pdf_task
+from app.services.chunk_store import get_chunk_store
+from app.services.reingest import load_previous_version, reuse_chunk_ids
+from app.services.result_store import sync_results
+from app.tasks.ingest_pdf import ingest_pdf_task, preview_chunks
 
 router = APIRouter()
 settings = get_settings()
@@ -22,17 +25,25 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 
 @router.post("/pdf", response_model=SuccessResponse[IngestResponse])
-async def upload_pdf(file: UploadFile = File(...)):
+async def upload_pdf(
+    file: UploadFile = File(...),
+    document_id: str | None = Form(None),
+):
     """
     上传 PDF 文件并启动解析任务
     
     - **file**: PDF 文件（multipart/form-data）
+    - **document_id**: 可选，上传已有文档的修订版时传入；只重新处理变化的页面，
+      未变化分块的 chunk_id 保持不变
     - 返回任务ID，用于后续查询进度
     """
     # 验证文件类型
     if not file.filename or not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="只支持 PDF 文件")
     
+    if document_id is not None and not get_chunk_store().exists(document_id):
+        raise HTTPException(status_code=404, detail=f"文档不存在: {document_id}")
+    
     # 验证文件大小
     content = await file.read()
     file_size = len(content)
@@ -72,7 +83,7 @@ async def upload_pdf(file: UploadFile = File(...)):
         
         if redis_available:
             # Redis 可用，使用 Celery 异步处理
-            task = ingest_pdf_task.delay(str(file_path))
+            task = ingest_pdf_task.delay(str(file_path), document_id)
             task_id = task.id
             message = f"文件上传成功，异步处理中（任务ID: {task_id}）"
         else:
@@ -80,28 +91,38 @@ async def upload_pdf(file: UploadFile = File(...)):
             print("⚠️  Redis 不可用，使用同步模式处理（演示）")
             from app.services.pdf_parser import PDFParser, clean_and_chunk
             
+            store = get_chunk_store()
+            target_id = document_id or file_id
+            previous = load_previous_version(store, target_id) if document_id else None
+            
             # 解析 PDF
             parser = PDFParser()
-            parse_result = parser.parse_pdf(file_path)
+            parse_result = parser.parse_pdf(
+                file_path, previous_pages=previous.pages if previous else None
+            )
             
             # 清洗和分块（直接 await，因为已经在 async 函数中）
             chunks = await clean_and_chunk(parse_result["pages"])
+            if previous:
+                reuse_chunk_ids(chunks, previous.chunks)
+            artifacts = store.save(target_id, chunks)
+            artifacts["pages"] = store.save_pages(target_id, parse_result["pages"])
             
             # 生成演示用的任务 ID
             task_id = f"sync_{file_id}"
             message = f"文件上传成功，同步处理完成（演示模式，任务ID: {task_id}）"
             
-            # 将结果临时存储（用于后续查询）
-            if not hasattr(upload_pdf, '_sync_results'):
-                upload_pdf._sync_results = {}
-            upload_pdf._sync_results[task_id] = {
+            # 结果只保留摘要（完整分块通过 /documents/{id}/chunks 分页获取）
+            sync_results.set(task_id, {
                 "status": "success",
+                "document_id": target_id,
                 "filename": parse_result["filename"],
                 "total_pages": parse_result["total_pages"],
                 "chunks_count": len(chunks),
-                "chunks": chunks,  # 包含完整的分块数据
+                "chunks": preview_chunks(chunks),
+                "artifacts": artifacts,
                 "message": "同步处理完成（演示模式）"
-            }
+            })
         
     except Exception as e:
         # 如果任务创建失败，删除已上传的文件
@@ -114,6 +135,7 @@ async def upload_pdf(file: UploadFile = File(...)):
             task_id=task_id,
             filename=file.filename,
             status="pending",
+            document_id=document_id or file_id,
         ),
         message=message,
     )
@@ -129,8 +151,8 @@ async def get_task_status(task_id: str):
     """
     # 检查是否是同步模式的任务
     if task_id.startswith("sync_"):
-        if hasattr(upload_pdf, '_sync_results') and task_id in upload_pdf._sync_results:
-            sync_result = upload_pdf._sync_results[task_id]
+        sync_result = sync_results.get(task_id)
+        if sync_result is not None:
             return SuccessResponse(
                 data=TaskResponse(
                     task_id=task_id,
@@ -141,7 +163,7 @@ async def get_task_status(task_id: str):
                 )
             )
         else:
-            raise HTTPException(status_code=404, detail="任务不存在")
+            raise HTTPException(status_code=404, detail="任务不存在或已过期")
     
     # Celery 异步任务
     from celery.result import AsyncResult
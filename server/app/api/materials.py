@@ -12,6 +12,7 @@ from app.models.api_models import (
     SuccessResponse,
 )
 from app.services.material_generator import (
+    MaterialGenerationError,
     get_immersive_generator,
     get_mindmap_generator,
     get_quiz_generator,
@@ -31,6 +32,8 @@ async def generate_quiz(request: QuizRequest):
     - 判断题 (tf)
     - 简答题 (short)
     
+    整章内容按片段并行生成候选题，去重后按难度均衡选题。
+    
     Args:
         request: 包含 chunk_id, profile_id, content, count
         
@@ -45,11 +48,15 @@ async def generate_quiz(request: QuizRequest):
     
     # 调用生成服务
     generator = get_quiz_generator()
-    result = await generator.generate(
-        content=request.content,
-        profile=profile,
-        count=request.count,
-    )
+    try:
+        result = await generator.generate_document(
+            content=request.content,
+            profile=profile,
+            count=request.count,
+            must_keep_terms=request.must_keep_terms,
+        )
+    except MaterialGenerationError as e:
+        raise HTTPException(status_code=502, detail=f"素材生成失败：{e}")
     
     # 验证结果
     if not generator.validate(result):
@@ -70,6 +77,8 @@ async def generate_mindmap(request: MaterialRequest):
     - 节点：核心概念、子概念、示例
     - 边：概念之间的关系
     
+    整章内容按片段并行生成子图，再合并标签相似的节点。
+    
     Args:
         request: 包含 chunk_id, profile_id, content
         
@@ -84,10 +93,14 @@ async def generate_mindmap(request: MaterialRequest):
     
     # 调用生成服务
     generator = get_mindmap_generator()
-    result = await generator.generate(
-        content=request.content,
-        profile=profile,
-    )
+    try:
+        result = await generator.generate_document(
+            content=request.content,
+            profile=profile,
+            must_keep_terms=request.must_keep_terms,
+        )
+    except MaterialGenerationError as e:
+        raise HTTPException(status_code=502, detail=f"素材生成失败：{e}")
     
     # 验证结果
     if not generator.validate(result):
@@ -127,10 +140,14 @@ async def generate_immersive(request: MaterialRequest):
     
     # 调用生成服务
     generator = get_immersive_generator()
-    result = await generator.generate(
-        content=request.content,
-        profile=profile,
-    )
+    try:
+        result = await generator.generate_document(
+            content=request.content,
+            profile=profile,
+            must_keep_terms=request.must_keep_terms,
+        )
+    except MaterialGenerationError as e:
+        raise HTTPException(status_code=502, detail=f"素材生成失败：{e}")
     
     # 验证结果
     if not generator.validate(result):
@@ -0,0 +1,14 @@
+"""Prometheus 指标 API"""
+
+from fastapi import APIRouter, Response
+
+from app.services.metrics import render_metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 抓取端点"""
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
@@ -1,6 +1,6 @@
 """个性化 API"""
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 
 from app.models.api_models import (
     PersonalizeRequest,
@@ -32,7 +32,7 @@ async def personalize_content(request: PersonalizeRequest):
     
     # 创建 Celery 任务
     task = personalize_text_task.apply_async(
-        args=[request.chunk_id, request.profile_id, request.original_text],
+        args=[request.chunk_id, request.profile_id, request.original_text, request.must_keep_terms],
         task_id=f"personalize_{request.chunk_id}_{request.profile_id}",
     )
     
@@ -43,12 +43,16 @@ async def personalize_content(request: PersonalizeRequest):
 
 
 @router.get("/tasks/{task_id}", response_model=SuccessResponse[TaskResponse])
-async def get_personalize_task(task_id: str):
+async def get_personalize_task(
+    task_id: str,
+    expand: bool = Query(False, description="是否从 Blob 存储展开完整结果"),
+):
     """
     查询个性化任务状态
     
     Args:
         task_id: 任务 ID
+        expand: 为 True 时返回完整改写结果，否则只返回摘要和大对象引用
         
     Returns:
         任务状态和结果
@@ -79,6 +83,13 @@ async def get_personalize_task(task_id: str):
     result = None
     if status == "success":
         result = task.result
+        if expand and isinstance(result, dict) and result.get("artifact"):
+            from app.services.blob_store import BlobNotFoundError, get_blob_store, get_json
+            
+            try:
+                result = get_json(get_blob_store(), result["artifact"]["key"])
+            except BlobNotFoundError:
+                raise HTTPException(status_code=410, detail="任务结果已过期")
     
     return SuccessResponse(
         data=TaskResponse(
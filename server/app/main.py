@@ -1,15 +1,31 @@
 """FastAPI 应用入口"""
 
+import time
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import ORJSONResponse
 
-from app.api import health, ingest, materials, personalize, personalize_sync, profiles
+from app.api import (
+    artifacts,
+    documents,
+    events,
+    health,
+    ingest,
+    materials,
+    metrics,
+    personalize,
+    personalize_sync,
+    profiles,
+)
 from app.config import get_settings
+from app.services.metrics import HTTP_REQUEST_LATENCY
+from app.services.progress import get_progress_hub
+from app.services.tracing import init_tracing, trace_http_request
 
 settings = get_settings()
+init_tracing(f"{settings.app_name}-api")
 
 
 @asynccontextmanager
@@ -23,6 +39,7 @@ async def lifespan(app: FastAPI):
     yield
     
     # 关闭时
+    await get_progress_hub().close()
     print(f"👋 Shutting down {settings.app_name}")
 
 
@@ -46,13 +63,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """记录每个路由的请求延迟（按路由模板聚合，避免路径参数导致标签爆炸）"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_LATENCY.labels(
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status),
+        ).observe(time.perf_counter() - start)
+
+
+# 追踪中间件最后注册（最外层），使 span 覆盖整个请求
+app.middleware("http")(trace_http_request)
+
+
 # 注册路由
 app.include_router(health.router, tags=["健康检查"])
+app.include_router(metrics.router, tags=["监控指标"])
 app.include_router(profiles.router, prefix="/profiles", tags=["用户画像"])
 app.include_router(ingest.router, prefix="/ingest", tags=["PDF摄取"])
+app.include_router(documents.router, prefix="/documents", tags=["文档分块"])
 app.include_router(personalize.router, prefix="/personalize", tags=["个性化-异步"])
 app.include_router(personalize_sync.router, prefix="/personalize", tags=["个性化-同步（无需Redis）"])
 app.include_router(materials.router, prefix="/materials", tags=["学习素材"])
+app.include_router(events.router, prefix="/tasks", tags=["任务进度推送"])
+app.include_router(artifacts.router, prefix="/artifacts", tags=["大对象存储"])
 
 
 @app.get("/")
@@ -79,6 +79,7 @@ class IngestResponse(BaseModel):
     task_id: str
     filename: str
     status: str
+    document_id: str | None = None
 
 
 # ============ 个性化模型 ============
@@ -122,6 +123,7 @@ class MaterialRequest(BaseModel):
     chunk_id: str = Field(..., description="文本块ID")
     profile_id: str = Field(..., description="用户画像ID")
     content: str = Field(..., description="学习内容")
+    must_keep_terms: list[str] | None = Field(None, description="必须保留的术语列表")
     
     model_config = {
         "json_schema_extra": {
@@ -143,6 +145,7 @@ class QuizRequest(BaseModel):
     profile_id: str = Field(..., description="用户画像ID")
     content: str = Field(..., description="学习内容")
     count: int = Field(10, ge=1, le=50, description="题目数量")
+    must_keep_terms: list[str] | None = Field(None, description="必须保留的术语列表")
     
     model_config = {
         "json_schema_extra": {
@@ -0,0 +1,130 @@
+"""提示词注册表
+
+所有提示词模板集中注册，带版本号，并按「前缀缓存友好」的布局组织：
+
+- system：只包含不随请求变化的说明、规则和输出格式示例，注册时校验其中没有变量，
+  因而对所有请求逐字节相同，可以被上游的前缀缓存（OpenAI 自动缓存、Anthropic
+  cache_control）复用
+- user：按请求变化的变量（年级、兴趣、正文等）放在最后
+
+模板在注册时预编译为「字面量 + 变量」片段，渲染时只做拼接。渲染结果带有
+prompt_id（名称@版本），各级缓存的 key 都应包含它，提示词升级后旧结果自然失效。
+"""
+
+import re
+import string
+from dataclasses import dataclass, field
+
+from app.config import get_settings
+from app.services.tracing import set_span_attributes
+
+settings = get_settings()
+
+# system 中疑似遗留的模板变量（JSON 示例的花括号内是带引号的键，不会匹配）
+_SYSTEM_VARIABLE = re.compile(r"\{[A-Za-z_]\w*\}")
+
+
+class PromptMessages(list):
+    """渲染后的消息列表（list[dict]），附带模板标识"""
+
+    def __init__(self, messages: list[dict[str, str]], prompt_id: str):
+        super().__init__(messages)
+        self.prompt_id = prompt_id
+
+
+def _compile(text: str) -> tuple[tuple[str, str | None], ...]:
+    """解析 str.format 语法为 (字面量, 变量名) 片段；不支持格式说明与转换"""
+    pieces = []
+    for literal, name, spec, conversion in string.Formatter().parse(text):
+        if name is not None and (not name.isidentifier() or spec or conversion):
+            raise ValueError(f"提示词变量只支持简单名称: {{{name}}}")
+        pieces.append((literal, name))
+    return tuple(pieces)
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """版本化的提示词模板"""
+
+    name: str
+    version: str
+    system: str  # 原样使用，不做格式化（JSON 示例中的花括号无需转义）
+    user: str  # str.format 语法，变量集中放在末尾
+    _pieces: tuple = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "_pieces", _compile(self.user))
+
+    @property
+    def prompt_id(self) -> str:
+        return f"{self.name}@{self.version}"
+
+    @property
+    def variables(self) -> set[str]:
+        return {name for _, name in self._pieces if name is not None}
+
+    def render(self, **values: object) -> PromptMessages:
+        """
+        渲染为 chat 消息
+
+        Raises:
+            KeyError: 缺少模板变量
+        """
+        missing = self.variables - values.keys()
+        if missing:
+            raise KeyError(f"提示词 {self.prompt_id} 缺少变量: {', '.join(sorted(missing))}")
+        user = "".join(
+            literal + ("" if name is None else str(values[name])) for literal, name in self._pieces
+        )
+        set_span_attributes(**{"prompt.id": self.prompt_id})
+        return PromptMessages(
+            [{"role": "system", "content": self.system}, {"role": "user", "content": user}],
+            self.prompt_id,
+        )
+
+
+class PromptRegistry:
+    """提示词注册表：同名模板可注册多个版本，默认使用最后注册的版本"""
+
+    def __init__(self, pinned: dict[str, str] | None = None):
+        self._templates: dict[str, dict[str, PromptTemplate]] = {}
+        # 按名称固定版本（回滚或 A/B 对比），来自 PROMPT_VERSIONS
+        self.pinned = dict(pinned or {})
+
+    def register(self, template: PromptTemplate) -> PromptTemplate:
+        """
+        注册模板
+
+        Raises:
+            ValueError: 版本重复，或 system 中包含变量
+        """
+        if _SYSTEM_VARIABLE.search(template.system):
+            raise ValueError(f"{template.prompt_id} 的 system 中不能包含按请求变化的变量")
+        versions = self._templates.setdefault(template.name, {})
+        if template.version in versions:
+            raise ValueError(f"提示词版本重复: {template.prompt_id}")
+        versions[template.version] = template
+        return template
+
+    def get(self, name: str, version: str | None = None) -> PromptTemplate:
+        """
+        获取模板
+
+        Raises:
+            KeyError: 名称或版本不存在
+        """
+        versions = self._templates[name]
+        version = version or self.pinned.get(name)
+        if version is None:
+            return next(reversed(versions.values()))
+        return versions[version]
+
+    def render(self, name: str, **values: object) -> PromptMessages:
+        """按名称渲染当前版本"""
+        return self.get(name).render(**values)
+
+    def names(self) -> list[str]:
+        return list(self._templates)
+
+
+registry = PromptRegistry(pinned=settings.prompt_versions)
@@ -0,0 +1,280 @@
+"""大对象存储服务
+
+分块列表、向量、生成素材等大对象写入 Blob 存储，Celery 结果中只保留引用 key，
+避免大 payload 经过 JSON 序列化进入 Redis 结果后端。
+
+支持两种后端：
+- local：本地文件系统（开发环境 / 单机部署）
+- s3：S3 兼容对象存储（本地可用 MinIO 替代）
+"""
+
+import os
+import tempfile
+from array import array
+from pathlib import Path
+from typing import Any, Iterable, Protocol
+
+import orjson
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+class BlobNotFoundError(KeyError):
+    """Blob 不存在"""
+
+
+class BlobStore(Protocol):
+    """Blob 存储接口
+
+    读取区间采用 Python 切片语义：[start, end)，end 为 None 表示读到末尾
+    """
+
+    def put_bytes(self, key: str, data: bytes, content_type: str = "application/octet-stream") -> int:
+        """写入对象，返回字节数"""
+        ...
+
+    def get_bytes(self, key: str, start: int = 0, end: int | None = None) -> bytes:
+        """读取对象（支持区间读取）"""
+        ...
+
+    def size(self, key: str) -> int:
+        """对象大小（字节）"""
+        ...
+
+    def exists(self, key: str) -> bool:
+        """对象是否存在"""
+        ...
+
+    def delete(self, key: str) -> None:
+        """删除对象"""
+        ...
+
+
+class LocalBlobStore:
+    """本地文件系统 Blob 存储"""
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root).resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        """key 转换为文件路径（禁止跳出根目录）"""
+        path = (self.root / key.lstrip("/")).resolve()
+        if self.root not in path.parents:
+            raise ValueError(f"非法的 blob key: {key}")
+        return path
+
+    def put_bytes(self, key: str, data: bytes, content_type: str = "application/octet-stream") -> int:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # 先写临时文件再原子替换，读者不会看到写了一半的对象
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp_")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return len(data)
+
+    def get_bytes(self, key: str, start: int = 0, end: int | None = None) -> bytes:
+        path = self._path(key)
+        if not path.is_file():
+            raise BlobNotFoundError(key)
+
+        with open(path, "rb") as f:
+            f.seek(start)
+            if end is None:
+                return f.read()
+            return f.read(max(0, end - start))
+
+    def size(self, key: str) -> int:
+        path = self._path(key)
+        if not path.is_file():
+            raise BlobNotFoundError(key)
+        return path.stat().st_size
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).is_file()
+
+    def delete(self, key: str) -> None:
+        path = self._path(key)
+        if path.is_file():
+            path.unlink()
+
+    def local_path(self, key: str) -> Path:
+        """返回对象的本地文件路径（供内存映射等场景直接访问）"""
+        return self._path(key)
+
+
+class S3BlobStore:
+    """S3 兼容 Blob 存储（AWS S3 / MinIO）"""
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: str | None = None,
+        access_key: str | None = None,
+        secret_key: str | None = None,
+        region: str = "us-east-1",
+    ):
+        try:
+            import boto3
+        except ImportError as e:
+            raise ImportError("使用 S3 存储需要安装 boto3：pip install boto3") from e
+
+        self.bucket = bucket
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            aws_access_key_id=access_key or None,
+            aws_secret_access_key=secret_key or None,
+            region_name=region,
+        )
+
+    def put_bytes(self, key: str, data: bytes, content_type: str = "application/octet-stream") -> int:
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType=content_type)
+        return len(data)
+
+    def get_bytes(self, key: str, start: int = 0, end: int | None = None) -> bytes:
+        kwargs: dict[str, Any] = {"Bucket": self.bucket, "Key": key}
+        if start > 0 or end is not None:
+            if end is not None and end <= start:
+                return b""
+            # HTTP Range 为闭区间
+            kwargs["Range"] = f"bytes={start}-{'' if end is None else end - 1}"
+
+        try:
+            response = self.client.get_object(**kwargs)
+        except self.client.exceptions.NoSuchKey as e:
+            raise BlobNotFoundError(key) from e
+        return response["Body"].read()
+
+    def size(self, key: str) -> int:
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=key)
+        except Exception as e:
+            raise BlobNotFoundError(key) from e
+        return response["ContentLength"]
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.size(key)
+            return True
+        except BlobNotFoundError:
+            return False
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+
+# ============ 序列化辅助函数 ============
+
+
+def put_json(store: BlobStore, key: str, obj: Any) -> int:
+    """写入 JSON 对象"""
+    return store.put_bytes(key, orjson.dumps(obj), content_type="application/json")
+
+
+def get_json(store: BlobStore, key: str) -> Any:
+    """读取 JSON 对象"""
+    return orjson.loads(store.get_bytes(key))
+
+
+def jsonl_index_key(key: str) -> str:
+    """JSON Lines 对象的行偏移索引 key（如 chunks.jsonl -> chunks.idx）"""
+    return key.removesuffix(".jsonl") + ".idx"
+
+
+def put_jsonl(store: BlobStore, key: str, items: Iterable[Any]) -> int:
+    """
+    写入 JSON Lines（每行一个对象，便于分页和区间读取）
+
+    同时写入行偏移索引（每行起始字节偏移，uint64，共 N+1 个），分页时只读需要的字节区间
+    """
+    lines = [orjson.dumps(item) + b"\n" for item in items]
+    offsets = array("Q", [0])
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+
+    size = store.put_bytes(key, b"".join(lines), content_type="application/x-ndjson")
+    store.put_bytes(jsonl_index_key(key), offsets.tobytes())
+    return size
+
+
+def read_jsonl_offsets(store: BlobStore, key: str) -> array:
+    """
+    读取 JSON Lines 对象的行偏移索引
+
+    Raises:
+        BlobNotFoundError: 索引不存在
+    """
+    offsets = array("Q")
+    offsets.frombytes(store.get_bytes(jsonl_index_key(key)))
+    return offsets
+
+
+def read_jsonl(
+    store: BlobStore, key: str, offset: int = 0, limit: int | None = None
+) -> tuple[list[Any], int]:
+    """
+    分页读取 JSON Lines
+
+    按行偏移索引只读取当前页的字节区间；没有索引的对象（早期版本写入）读取整个对象
+
+    Returns:
+        (当前页对象列表, 总行数)
+    """
+    try:
+        offsets = read_jsonl_offsets(store, key)
+    except BlobNotFoundError:
+        lines = store.get_bytes(key).splitlines()
+        total = len(lines)
+        end = total if limit is None else min(total, offset + limit)
+        return [orjson.loads(line) for line in lines[offset:end]], total
+
+    total = len(offsets) - 1
+    end = total if limit is None else min(total, offset + limit)
+    if offset >= end:
+        return [], total
+    data = store.get_bytes(key, offsets[offset], offsets[end])
+    return [orjson.loads(line) for line in data.splitlines()], total
+
+
+def artifact_ref(key: str, size: int, **extra: Any) -> dict[str, Any]:
+    """构造 Celery 结果中使用的大对象引用"""
+    return {"key": key, "size": size, "url": f"/artifacts/{key}", **extra}
+
+
+def put_task_artifact(kind: str, task_id: str, payload: Any) -> dict[str, Any]:
+    """将任务的完整结果写入 Blob 存储，返回引用"""
+    key = f"{kind}/{task_id}.json"
+    size = put_json(get_blob_store(), key, payload)
+    return artifact_ref(key, size)
+
+
+# 单例
+_blob_store: BlobStore | None = None
+
+
+def get_blob_store() -> BlobStore:
+    """根据配置获取 Blob 存储单例"""
+    global _blob_store
+    if _blob_store is None:
+        if settings.blob_store_backend == "s3":
+            _blob_store = S3BlobStore(
+                bucket=settings.s3_bucket,
+                endpoint_url=settings.s3_endpoint_url,
+                access_key=settings.s3_access_key,
+                secret_key=settings.s3_secret_key,
+                region=settings.s3_region,
+            )
+        else:
+            _blob_store = LocalBlobStore(settings.blob_store_dir)
+    return _blob_store
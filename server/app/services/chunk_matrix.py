@@ -0,0 +1,180 @@
+"""分块列式存储（内存映射）
+
+chunks.jsonl 面向 API 分页；Worker 做相似度检索时只需要正文和向量，
+逐行反序列化再把向量转成 Python list（每个 1536 维向量约 50KB 对象）代价过高。
+这里为每个文档额外写一份列式布局：
+
+- documents/{id}/matrix.json：{"version", "count", "dim", "dtype", "model", "chunk_ids"}
+- documents/{id}/text.idx：正文起始字节偏移（uint64 小端序，共 N+1 个）
+- documents/{id}/text.bin：UTF-8 正文依次拼接
+- documents/{id}/embeddings.f32 或 embeddings.f16：小端序向量矩阵（行优先）
+
+本地存储时读者直接 np.memmap 映射文件，API 进程与各 Celery Worker 通过页缓存共享
+同一份数据，无需反序列化；S3 存储无法映射，退化为整块读入内存。
+"""
+
+from typing import Any, Literal, Sequence
+
+import numpy as np
+
+from app.services.blob_store import BlobStore, artifact_ref, get_json, put_json
+
+EmbeddingDtype = Literal["float32", "float16"]
+
+MATRIX_VERSION = 1
+
+_OFFSET_DTYPE = np.dtype("<u8")
+_EMBEDDING_DTYPES = {"float32": np.dtype("<f4"), "float16": np.dtype("<f2")}
+_EMBEDDING_SUFFIX = {"float32": "f32", "float16": "f16"}
+
+# 暴力检索时每次转换为 float32 计算的行数，控制临时内存
+SEARCH_BLOCK_ROWS = 4096
+
+
+def embeddings_key(prefix: str, dtype: EmbeddingDtype) -> str:
+    """向量矩阵的 key（后缀区分精度）"""
+    return f"{prefix}/embeddings.{_EMBEDDING_SUFFIX[dtype]}"
+
+
+def write_matrix(
+    store: BlobStore,
+    prefix: str,
+    chunks: list[dict[str, Any]],
+    dtype: EmbeddingDtype = "float32",
+    model: str | None = None,
+) -> dict[str, Any] | None:
+    """
+    写入列式正文与向量矩阵
+
+    Args:
+        model: 向量所属的嵌入模型，写入清单（跨文档复用向量时据此校验）
+
+    Returns:
+        向量矩阵引用；分块不全带向量时只写正文，返回 None
+    """
+    texts = [chunk["text"].encode("utf-8") for chunk in chunks]
+    offsets = np.zeros(len(texts) + 1, dtype=_OFFSET_DTYPE)
+    np.cumsum([len(text) for text in texts], out=offsets[1:])
+
+    vectors = [chunk["embedding"] for chunk in chunks if "embedding" in chunk]
+    complete = bool(vectors) and len(vectors) == len(chunks)
+    dim = len(vectors[0]) if complete else 0
+
+    store.put_bytes(f"{prefix}/text.bin", b"".join(texts))
+    store.put_bytes(f"{prefix}/text.idx", offsets.tobytes())
+
+    ref = None
+    if complete:
+        key = embeddings_key(prefix, dtype)
+        matrix = np.asarray(vectors, dtype=_EMBEDDING_DTYPES[dtype])
+        size = store.put_bytes(key, matrix.tobytes())
+        ref = artifact_ref(key, size, dtype=dtype, shape=[len(vectors), dim])
+
+    # 清单在数据文件之后写入：读者以清单为准，并在打开时校验文件大小
+    put_json(store, f"{prefix}/matrix.json", {
+        "version": MATRIX_VERSION,
+        "count": len(chunks),
+        "dim": dim,
+        "dtype": dtype if complete else None,
+        "model": model if complete else None,
+        "chunk_ids": [chunk["chunk_id"] for chunk in chunks],
+    })
+
+    # 删除重新摄取前残留的其他精度 / 已失效的向量矩阵
+    for name in _EMBEDDING_DTYPES:
+        if not (complete and name == dtype):
+            store.delete(embeddings_key(prefix, name))
+    return ref
+
+
+def _load_array(store: BlobStore, key: str, dtype: np.dtype) -> np.ndarray:
+    """本地存储时内存映射（只读），否则读入内存"""
+    if hasattr(store, "local_path"):
+        path = store.local_path(key)
+        if path.stat().st_size == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r")
+    return np.frombuffer(store.get_bytes(key), dtype=dtype)
+
+
+class ChunkMatrix:
+    """文档分块的只读列式视图"""
+
+    def __init__(self, store: BlobStore, prefix: str):
+        """
+        Raises:
+            BlobNotFoundError: 文档没有列式数据
+            ValueError: 文件与清单不一致（文档正在被重新写入）
+        """
+        manifest = get_json(store, f"{prefix}/matrix.json")
+        self.count: int = manifest["count"]
+        self.dim: int = manifest["dim"]
+        self.dtype: EmbeddingDtype | None = manifest["dtype"]
+        # 早期版本的清单没有记录模型
+        self.model: str | None = manifest.get("model")
+        self.chunk_ids: list[str] = manifest["chunk_ids"]
+
+        self._offsets = _load_array(store, f"{prefix}/text.idx", _OFFSET_DTYPE)
+        self._text = _load_array(store, f"{prefix}/text.bin", np.dtype("u1"))
+        if len(self._offsets) != self.count + 1 or len(self._text) != int(self._offsets[-1]):
+            raise ValueError(f"分块列式数据与清单不一致: {prefix}")
+
+        self.embeddings: np.ndarray | None = None
+        if self.dtype is not None:
+            flat = _load_array(
+                store, embeddings_key(prefix, self.dtype), _EMBEDDING_DTYPES[self.dtype]
+            )
+            if len(flat) != self.count * self.dim:
+                raise ValueError(f"向量矩阵与清单不一致: {prefix}")
+            self.embeddings = flat.reshape(self.count, self.dim)
+
+        self._norms: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def text(self, index: int) -> str:
+        """第 index 个分块的正文（只解码这一段）"""
+        start, end = int(self._offsets[index]), int(self._offsets[index + 1])
+        return self._text[start:end].tobytes().decode("utf-8")
+
+    def _row_norms(self) -> np.ndarray:
+        if self._norms is None:
+            norms = np.empty(self.count, dtype=np.float32)
+            for start in range(0, self.count, SEARCH_BLOCK_ROWS):
+                block = np.asarray(
+                    self.embeddings[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32
+                )
+                norms[start:start + len(block)] = np.linalg.norm(block, axis=1)
+            self._norms = norms
+        return self._norms
+
+    def search(self, query: Sequence[float], top_k: int = 5) -> list[tuple[int, float]]:
+        """
+        余弦相似度暴力检索
+
+        Returns:
+            [(分块下标, 相似度)]，按相似度降序
+        """
+        if self.embeddings is None or self.count == 0:
+            return []
+
+        q = np.asarray(query, dtype=np.float32)
+        q_norm = float(np.linalg.norm(q))
+        if q_norm == 0:
+            return []
+
+        scores = np.empty(self.count, dtype=np.float32)
+        for start in range(0, self.count, SEARCH_BLOCK_ROWS):
+            block = np.asarray(
+                self.embeddings[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32
+            )
+            scores[start:start + len(block)] = block @ q
+        norms = self._row_norms()
+        # 占位零向量的相似度记为 0
+        scores = np.divide(scores, norms * q_norm, out=np.zeros_like(scores), where=norms > 0)
+
+        k = min(top_k, self.count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
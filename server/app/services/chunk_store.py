@@ -0,0 +1,193 @@
+"""分块存储服务
+
+文档的完整分块以 JSON Lines 形式保存在 Blob 存储中，并附带行偏移索引：
+- documents/{id}/chunks.jsonl：分块（不含向量），每行一个
+- documents/{id}/chunks.idx：每行起始字节偏移（uint64 小端序，共 N+1 个）
+- documents/{id}/matrix.json、text.idx、text.bin、embeddings.f32|f16：
+  供检索使用的列式正文与向量矩阵（可内存映射，见 chunk_matrix）
+- documents/{id}/pages.json：页面解析结果（含页面内容哈希，供增量重新摄取比对）
+
+分页读取时只按偏移索引读取需要的字节区间，不加载整个文档；
+不做字段投影时直接透传原始 JSON 行，无需反序列化再序列化。
+"""
+
+from array import array
+from typing import Any, Iterator, Literal
+
+import orjson
+
+from app.config import get_settings
+from app.services.blob_store import (
+    BlobNotFoundError,
+    BlobStore,
+    artifact_ref,
+    get_blob_store,
+    get_json,
+    put_json,
+    put_jsonl,
+    read_jsonl_offsets,
+)
+from app.services.chunk_matrix import ChunkMatrix, write_matrix
+
+settings = get_settings()
+
+ChunkFields = Literal["all", "text", "metadata"]
+
+# 字段投影时 text 视图保留的字段
+TEXT_FIELDS = ("chunk_id", "text")
+
+
+class ChunkStore:
+    """文档分块存储"""
+
+    def __init__(self, store: BlobStore):
+        self.store = store
+
+    @staticmethod
+    def _prefix(document_id: str) -> str:
+        return f"documents/{document_id}"
+
+    def save(
+        self, document_id: str, chunks: list[dict[str, Any]], model: str | None = None
+    ) -> dict[str, Any]:
+        """
+        保存文档分块与向量
+
+        Args:
+            model: 向量所属的嵌入模型（记录在向量矩阵清单中）
+
+        Returns:
+            {"chunks": 引用, "embeddings": 引用 | None}
+        """
+        prefix = self._prefix(document_id)
+
+        # 同时写入行偏移索引 chunks.idx
+        chunks_key = f"{prefix}/chunks.jsonl"
+        chunks_size = put_jsonl(
+            self.store,
+            chunks_key,
+            ({k: v for k, v in chunk.items() if k != "embedding"} for chunk in chunks),
+        )
+
+        return {
+            "chunks": artifact_ref(chunks_key, chunks_size, count=len(chunks)),
+            "embeddings": write_matrix(
+                self.store, prefix, chunks, settings.embedding_dtype, model=model
+            ),
+        }
+
+    def save_pages(self, document_id: str, pages: list[dict[str, Any]]) -> dict[str, Any]:
+        """保存页面解析结果，返回引用"""
+        key = f"{self._prefix(document_id)}/pages.json"
+        size = put_json(self.store, key, pages)
+        return artifact_ref(key, size, count=len(pages))
+
+    def load_pages(self, document_id: str) -> list[dict[str, Any]] | None:
+        """读取页面解析结果，不存在时返回 None"""
+        try:
+            return get_json(self.store, f"{self._prefix(document_id)}/pages.json")
+        except BlobNotFoundError:
+            return None
+
+    def load_all(self, document_id: str) -> list[dict[str, Any]]:
+        """
+        读取文档的全部分块（有向量时附带 embedding）
+
+        Raises:
+            BlobNotFoundError: 文档不存在
+        """
+        prefix = self._prefix(document_id)
+        chunks = [
+            orjson.loads(line)
+            for line in self.store.get_bytes(f"{prefix}/chunks.jsonl").splitlines()
+        ]
+
+        try:
+            embeddings = self.open_matrix(document_id).embeddings
+        except BlobNotFoundError:
+            embeddings = None  # 早期版本写入的文档没有列式数据
+        if embeddings is not None:
+            for chunk, vector in zip(chunks, embeddings.astype("float32").tolist()):
+                chunk["embedding"] = vector
+        return chunks
+
+    def open_matrix(self, document_id: str) -> ChunkMatrix:
+        """
+        打开文档的列式正文与向量矩阵（本地存储时为内存映射，只读）
+
+        Raises:
+            BlobNotFoundError: 文档不存在
+        """
+        return ChunkMatrix(self.store, self._prefix(document_id))
+
+    def _offsets(self, document_id: str) -> array:
+        """读取行偏移索引"""
+        return read_jsonl_offsets(self.store, f"{self._prefix(document_id)}/chunks.jsonl")
+
+    def count(self, document_id: str) -> int:
+        """文档分块数量"""
+        return len(self._offsets(document_id)) - 1
+
+    def exists(self, document_id: str) -> bool:
+        """文档分块是否存在"""
+        return self.store.exists(f"{self._prefix(document_id)}/chunks.idx")
+
+    def read_raw(self, document_id: str, start: int, limit: int) -> tuple[list[bytes], int]:
+        """
+        按区间读取原始 JSON 行
+
+        Returns:
+            (JSON 行列表（不含换行符）, 分块总数)
+
+        Raises:
+            BlobNotFoundError: 文档不存在
+        """
+        offsets = self._offsets(document_id)
+        total = len(offsets) - 1
+        end = min(total, start + limit)
+        if start >= end:
+            return [], total
+
+        data = self.store.get_bytes(
+            f"{self._prefix(document_id)}/chunks.jsonl", offsets[start], offsets[end]
+        )
+        base = offsets[start]
+        lines = [
+            data[offsets[i] - base : offsets[i + 1] - base - 1] for i in range(start, end)
+        ]
+        return lines, total
+
+    def iter_page(
+        self, document_id: str, start: int, limit: int, fields: ChunkFields = "all"
+    ) -> tuple[Iterator[bytes], int]:
+        """
+        读取一页分块并按字段投影
+
+        Returns:
+            (JSON 字节串迭代器, 分块总数)
+        """
+        lines, total = self.read_raw(document_id, start, limit)
+        if fields == "all":
+            return iter(lines), total
+        return (orjson.dumps(project_chunk(orjson.loads(line), fields)) for line in lines), total
+
+
+def project_chunk(chunk: dict[str, Any], fields: ChunkFields) -> dict[str, Any]:
+    """分块字段投影：text 只保留正文，metadata 去掉正文"""
+    if fields == "text":
+        return {k: chunk[k] for k in TEXT_FIELDS if k in chunk}
+    if fields == "metadata":
+        return {k: v for k, v in chunk.items() if k != "text"}
+    return chunk
+
+
+# 单例
+_chunk_store: ChunkStore | None = None
+
+
+def get_chunk_store() -> ChunkStore:
+    """获取分块存储单例"""
+    global _chunk_store
+    if _chunk_store is None:
+        _chunk_store = ChunkStore(get_blob_store())
+    return _chunk_store
@@ -0,0 +1,234 @@
+"""提示词压缩（本地、抽取式）
+
+同一个分块会被送进改写、测验题、思维导图、沉浸式文本等多个提示词，其中的空白噪声、
+重复句子和重复短语每次都按 token 计费。压缩分两步，均在本地完成、不调用模型：
+
+1. 规则清理（总是执行）：合并空白、去掉汉字之间的断行空格、折叠连续重复的短语、
+   删除重复句子
+2. 抽取式删句（文本不短于 min_tokens 时）：按句子与全文的词项重合度（中心度）、
+   段首位置、定义 / 结论类提示词打分，在目标比例的 token 预算内保留得分最高的句子，
+   并按原顺序输出；包含 must_keep_terms 的句子总是保留
+
+结果按 (文本, 术语, 比例) 缓存在进程内，同一分块的多个提示词只压缩一次。
+"""
+
+import math
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+
+from app.config import get_settings
+from app.services.metrics import PROMPT_COMPRESSION_TOKENS
+from app.services.tokenizer import count_tokens
+from app.services.tracing import set_span_attributes
+
+settings = get_settings()
+
+_CJK = r"\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_INLINE_SPACE = re.compile(r"[ \t\u3000\xa0]+")
+_CJK_GAP = re.compile(rf"(?<=[{_CJK}，。！？；：、])[ \t]+(?=[{_CJK}])|(?<=[{_CJK}])[ \t]+(?=[，。！？；：、])")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+# 连续出现 3 次及以上的短语（2-8 个非数字字符）折叠为 1 次
+_REPEATED_PHRASE = re.compile(r"([^\d\s]{2,8}?)\1{2,}")
+# 句末标点（含其后的右引号 / 右括号）之后断句；英文句号后须有空白
+_SENTENCE_END = re.compile(r"(?<=[。！？!?；;])(?![”’」』）)])|(?<=[。！？!?；;][”’」』）)])|(?<=\.)\s+")
+_TERMS = re.compile(rf"[{_CJK}]+|[A-Za-z]+|\d+")
+_PUNCT_SPACE = re.compile(rf"[^{_CJK}A-Za-z0-9]+")
+
+# 定义、定律、结论类句子通常是关键句
+_KEY_CUES = ("是指", "称为", "叫做", "定义", "定律", "定理", "公式", "原理", "因此", "所以", "总之")
+
+
+@dataclass(frozen=True)
+class CompressionResult:
+    """压缩结果"""
+
+    text: str
+    original_tokens: int
+    compressed_tokens: int
+    dropped_sentences: int
+
+    @property
+    def ratio(self) -> float:
+        """压缩后 / 压缩前的 token 比例"""
+        return self.compressed_tokens / self.original_tokens if self.original_tokens else 1.0
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.compressed_tokens
+
+
+def clean_text(text: str) -> str:
+    """规则清理：空白噪声与连续重复短语"""
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = _INLINE_SPACE.sub(" ", text)
+    text = _CJK_GAP.sub("", text)
+    text = _REPEATED_PHRASE.sub(r"\1", text)
+    lines = [line.strip() for line in text.split("\n")]
+    return _BLANK_LINES.sub("\n", "\n".join(lines)).strip()
+
+
+def split_sentences(paragraph: str) -> list[str]:
+    return [s.strip() for s in _SENTENCE_END.split(paragraph) if s and s.strip()]
+
+
+def _sentence_key(sentence: str) -> str:
+    """判断重复句子用：NFKC + 去掉标点与空白"""
+    return _PUNCT_SPACE.sub("", unicodedata.normalize("NFKC", sentence)).lower()
+
+
+def _features(sentence: str) -> set[str]:
+    """词项：汉字二元组与拉丁单词 / 数字"""
+    features = set()
+    for run in _TERMS.findall(sentence.lower()):
+        if run[0].isascii():
+            features.add(run)
+        elif len(run) == 1:
+            features.add(run)
+        else:
+            features.update(run[i:i + 2] for i in range(len(run) - 1))
+    return features
+
+
+def _join(sentences: list[str]) -> str:
+    """按原文习惯拼接：英文句子之间补空格，中文直接相连"""
+    text = ""
+    for sentence in sentences:
+        if text and text[-1].isascii() and sentence[0].isascii():
+            text += " "
+        text += sentence
+    return text
+
+
+class PromptCompressor:
+    """抽取式提示词压缩器"""
+
+    def __init__(self, ratio: float | None = None, min_tokens: int | None = None):
+        """
+        Args:
+            ratio: 目标比例（压缩后 / 压缩前的 token 数），1.0 表示只做规则清理
+            min_tokens: 短于该值的文本只做规则清理
+        """
+        self.ratio = settings.prompt_compression_ratio if ratio is None else ratio
+        self.min_tokens = settings.prompt_compression_min_tokens if min_tokens is None else min_tokens
+        self._cached = lru_cache(maxsize=256)(self._compress)
+
+    def compress(
+        self,
+        text: str,
+        must_keep_terms: list[str] | None = None,
+        ratio: float | None = None,
+    ) -> CompressionResult:
+        """
+        压缩文本
+
+        Args:
+            text: 原文
+            must_keep_terms: 必须保留的术语，包含它们的句子不会被删除
+            ratio: 覆盖默认的目标比例
+        """
+        terms = tuple(sorted({t for t in must_keep_terms or [] if t}))
+        return self._cached(text, terms, self.ratio if ratio is None else ratio)
+
+    def _compress(self, text: str, terms: tuple[str, ...], ratio: float) -> CompressionResult:
+        original_tokens = count_tokens(text)
+
+        # 规则清理 + 删除重复句子
+        seen: set[str] = set()
+        paragraphs: list[list[str]] = []
+        dropped = 0
+        for paragraph in clean_text(text).split("\n"):
+            sentences = []
+            for sentence in split_sentences(paragraph):
+                key = _sentence_key(sentence)
+                if key and key in seen:
+                    dropped += 1
+                    continue
+                seen.add(key)
+                sentences.append(sentence)
+            if sentences:
+                paragraphs.append(sentences)
+
+        flat = [(p, i, s) for p, sentences in enumerate(paragraphs) for i, s in enumerate(sentences)]
+        budget = math.floor(original_tokens * ratio)
+        if ratio < 1.0 and original_tokens >= self.min_tokens and len(flat) > 1:
+            keep = self._select(flat, terms, budget)
+            dropped += len(flat) - len(keep)
+            kept: list[list[str]] = [[] for _ in paragraphs]
+            for p, i, sentence in flat:
+                if (p, i) in keep:
+                    kept[p].append(sentence)
+            paragraphs = [sentences for sentences in kept if sentences]
+
+        compressed = "\n".join(_join(sentences) for sentences in paragraphs)
+        return CompressionResult(compressed, original_tokens, count_tokens(compressed), dropped)
+
+    def _select(
+        self, flat: list[tuple[int, int, str]], terms: tuple[str, ...], budget: int
+    ) -> set[tuple[int, int]]:
+        """在 token 预算内选择得分最高的句子，返回 (段落, 句序) 集合"""
+        features = [_features(s) for _, _, s in flat]
+        frequency = Counter(f for fs in features for f in fs)
+
+        scored = []
+        required: set[tuple[int, int]] = set()
+        for (p, i, sentence), fs in zip(flat, features):
+            if any(term in sentence for term in terms):
+                required.add((p, i))
+            # 中心度：与其他句子共享的词项越多越重要，按句长开方归一
+            shared = sum(math.log(frequency[f]) for f in fs)
+            score = shared / math.sqrt(len(fs)) if fs else 0.0
+            if i == 0:
+                score *= 1.3
+            if any(cue in sentence for cue in _KEY_CUES):
+                score *= 1.3
+            scored.append((score, p, i, count_tokens(sentence)))
+
+        keep = set(required)
+        used = sum(tokens for _, p, i, tokens in scored if (p, i) in required)
+        for score, p, i, tokens in sorted(scored, key=lambda item: -item[0]):
+            if (p, i) in keep:
+                continue
+            if used + tokens <= budget:
+                keep.add((p, i))
+                used += tokens
+        if not keep:
+            # 预算连一句都放不下时至少保留得分最高的一句
+            _, p, i, _ = max(scored)
+            keep.add((p, i))
+        return keep
+
+
+def compress_for_prompt(
+    text: str, must_keep_terms: list[str] | None = None, enabled: bool | None = None
+) -> str:
+    """
+    压缩送入提示词的正文并记录节省的 token；未启用时原样返回
+
+    Args:
+        enabled: 是否压缩，为 None 时按 PROMPT_COMPRESSION_ENABLED
+    """
+    if not (settings.prompt_compression_enabled if enabled is None else enabled) or not text:
+        return text
+    result = get_prompt_compressor().compress(text, must_keep_terms)
+    PROMPT_COMPRESSION_TOKENS.labels(stage="original").inc(result.original_tokens)
+    PROMPT_COMPRESSION_TOKENS.labels(stage="compressed").inc(result.compressed_tokens)
+    set_span_attributes(**{
+        "compression.original_tokens": result.original_tokens,
+        "compression.compressed_tokens": result.compressed_tokens,
+    })
+    return result.text
+
+
+# 单例
+_prompt_compressor: PromptCompressor | None = None
+
+
+def get_prompt_compressor() -> PromptCompressor:
+    """获取提示词压缩器单例"""
+    global _prompt_compressor
+    if _prompt_compressor is None:
+        _prompt_compressor = PromptCompressor()
+    return _prompt_compressor
@@ -0,0 +1,360 @@
+"""近重复分块检测（MinHash + LSH）
+
+不同版本、不同出版社的教材大量重复近乎相同的段落，每份拷贝都会被单独分块、向量化、
+存储并个性化改写。摄取时为每个分块计算字符 shingle 的 MinHash 签名，
+在跨文档共享的 LSH 索引中查找相似度不低于阈值的已有分块：
+
+- 命中：分块记录 canonical（规范分块的文档 ID、chunk_id 和估计相似度），
+  向量模型相同时直接沿用规范分块的向量
+- 未命中：分块自身成为规范分块，写入索引
+
+索引存放在 Redis 中（签名 + 分段桶 + 文档反向索引），Redis 不可用时跳过检测。
+"""
+
+import hashlib
+import zlib
+from collections import defaultdict
+from typing import Any, Callable, Protocol
+
+import numpy as np
+import redis
+
+from app.config import get_settings
+from app.services.chunk_store import ChunkStore
+from app.services.embedder import is_placeholder_vector
+from app.services.embedding_cache import normalize_text
+
+settings = get_settings()
+
+# 2^61 - 1（梅森素数）与 32 位哈希上限，与常见 MinHash 实现一致
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+BandKeysFn = Callable[[np.ndarray], list[str]]
+
+# LSH 候选阈值相对判定阈值的余量：宁可多取候选再用签名精确过滤，也不漏检
+LSH_RECALL_MARGIN = 0.05
+
+
+def chunk_ref(document_id: str, chunk_id: str) -> str:
+    """分块全局引用"""
+    return f"{document_id}/{chunk_id}"
+
+
+def choose_bands(num_perm: int, threshold: float) -> tuple[int, int]:
+    """
+    选择 LSH 分段数 b 与每段行数 r（b * r == num_perm）
+
+    相似度为 s 的两个分块成为候选的概率为 1 - (1 - s^r)^b，拐点约为 (1/b)^(1/r)；
+    取拐点不高于 threshold - LSH_RECALL_MARGIN 的最大 r（误报最少）。
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold - LSH_RECALL_MARGIN:
+            best = (bands, rows)
+    return best
+
+
+class MinHasher:
+    """字符 shingle 的 MinHash 签名"""
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 61, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 61, size=num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> set[str]:
+        """规范化后去掉空白，按字符 n-gram 切分（对中文无需分词）"""
+        compact = "".join(normalize_text(text).split())
+        k = self.shingle_size
+        if len(compact) <= k:
+            return {compact}
+        return {compact[i:i + k] for i in range(len(compact) - k + 1)}
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash 签名（uint32 数组）"""
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in self.shingles(text)), dtype=np.uint64
+        )
+        # 乘法在 uint64 上回绕，与 datasketch 等实现相同，不影响作为哈希族使用
+        with np.errstate(over="ignore"):
+            permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME
+        return (permuted & _MAX_HASH).min(axis=1).astype(np.uint32)
+
+
+def estimate_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """由签名估计 Jaccard 相似度"""
+    return float(np.mean(a == b))
+
+
+class LSHStore(Protocol):
+    """LSH 索引存储接口"""
+
+    def candidates(self, band_keys: list[str]) -> set[str]:
+        """返回与任一分段桶相同的分块引用"""
+        ...
+
+    def signatures(self, refs: list[str]) -> list[np.ndarray | None]:
+        """批量读取签名"""
+        ...
+
+    def add(self, document_id: str, ref: str, band_keys: list[str], signature: np.ndarray) -> None:
+        """写入一个规范分块"""
+        ...
+
+    def remove_document(self, document_id: str, band_keys_of: BandKeysFn) -> int:
+        """删除文档的全部分块，返回删除数量"""
+        ...
+
+
+class MemoryLSHStore:
+    """进程内 LSH 存储（测试 / 单机演示）"""
+
+    def __init__(self):
+        self.buckets: dict[str, set[str]] = defaultdict(set)
+        self.sigs: dict[str, np.ndarray] = {}
+        self.docs: dict[str, set[str]] = defaultdict(set)
+
+    def candidates(self, band_keys: list[str]) -> set[str]:
+        refs: set[str] = set()
+        for key in band_keys:
+            refs |= self.buckets.get(key, set())
+        return refs
+
+    def signatures(self, refs: list[str]) -> list[np.ndarray | None]:
+        return [self.sigs.get(ref) for ref in refs]
+
+    def add(self, document_id: str, ref: str, band_keys: list[str], signature: np.ndarray) -> None:
+        for key in band_keys:
+            self.buckets[key].add(ref)
+        self.sigs[ref] = signature
+        self.docs[document_id].add(ref)
+
+    def remove_document(self, document_id: str, band_keys_of: BandKeysFn) -> int:
+        refs = self.docs.pop(document_id, set())
+        for ref in refs:
+            signature = self.sigs.pop(ref)
+            for key in band_keys_of(signature):
+                self.buckets[key].discard(ref)
+        return len(refs)
+
+
+class RedisLSHStore:
+    """Redis LSH 存储（所有 Worker 共享）
+
+    - dedup:sig:{ref}：签名字节
+    - dedup:band:{key}：分段桶（分块引用集合）
+    - dedup:doc:{document_id}：文档的分块引用集合（删除 / 重新摄取时使用）
+    """
+
+    PREFIX = "dedup:"
+
+    def __init__(self, client: Any = None):
+        self.client = client if client is not None else redis.from_url(
+            settings.redis_url, socket_connect_timeout=1
+        )
+
+    def candidates(self, band_keys: list[str]) -> set[str]:
+        pipe = self.client.pipeline()
+        for key in band_keys:
+            pipe.smembers(f"{self.PREFIX}band:{key}")
+        refs: set[str] = set()
+        for members in pipe.execute():
+            refs.update(m.decode() if isinstance(m, bytes) else m for m in members)
+        return refs
+
+    def signatures(self, refs: list[str]) -> list[np.ndarray | None]:
+        if not refs:
+            return []
+        values = self.client.mget([f"{self.PREFIX}sig:{ref}" for ref in refs])
+        return [np.frombuffer(v, dtype="<u4") if v else None for v in values]
+
+    def add(self, document_id: str, ref: str, band_keys: list[str], signature: np.ndarray) -> None:
+        pipe = self.client.pipeline()
+        for key in band_keys:
+            pipe.sadd(f"{self.PREFIX}band:{key}", ref)
+        pipe.set(f"{self.PREFIX}sig:{ref}", signature.astype("<u4").tobytes())
+        pipe.sadd(f"{self.PREFIX}doc:{document_id}", ref)
+        pipe.execute()
+
+    def remove_document(self, document_id: str, band_keys_of: BandKeysFn) -> int:
+        doc_key = f"{self.PREFIX}doc:{document_id}"
+        refs = [m.decode() if isinstance(m, bytes) else m for m in self.client.smembers(doc_key)]
+        pipe = self.client.pipeline()
+        for ref, signature in zip(refs, self.signatures(refs)):
+            if signature is not None:
+                for key in band_keys_of(signature):
+                    pipe.srem(f"{self.PREFIX}band:{key}", ref)
+            pipe.delete(f"{self.PREFIX}sig:{ref}")
+        pipe.delete(doc_key)
+        pipe.execute()
+        return len(refs)
+
+
+class NearDuplicateIndex:
+    """近重复分块索引"""
+
+    def __init__(
+        self,
+        store: LSHStore,
+        threshold: float = 0.8,
+        num_perm: int = 128,
+        shingle_size: int = 5,
+    ):
+        self.store = store
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm=num_perm, shingle_size=shingle_size)
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+
+    def band_keys(self, signature: np.ndarray) -> list[str]:
+        """签名按段切分，每段哈希为一个桶 key（带段号，不同段互不冲突）"""
+        signature = np.ascontiguousarray(signature, dtype="<u4")
+        keys = []
+        for i in range(self.bands):
+            band = signature[i * self.rows:(i + 1) * self.rows].tobytes()
+            keys.append(f"{i}:{hashlib.blake2b(band, digest_size=8).hexdigest()}")
+        return keys
+
+    def query(self, signature: np.ndarray) -> tuple[str, float] | None:
+        """查找最相似的规范分块，相似度低于阈值时返回 None"""
+        refs = sorted(self.store.candidates(self.band_keys(signature)))
+        best = None
+        for ref, other in zip(refs, self.store.signatures(refs)):
+            if other is None:
+                continue
+            similarity = estimate_similarity(signature, other)
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (ref, similarity)
+        return best
+
+    def link(self, document_id: str, chunks: list[dict[str, Any]]) -> dict[str, Any]:
+        """
+        为文档分块标注规范分块（原地修改），并把新的规范分块写入索引
+
+        重新摄取时先移除该文档上一版本的索引项，文档内部的重复同样会被识别。
+
+        Returns:
+            {"near_duplicates": int, "cross_document": int, "tokens_saved": int}
+        """
+        self.store.remove_document(document_id, self.band_keys)
+
+        duplicates = cross_document = tokens_saved = 0
+        for chunk in chunks:
+            chunk.pop("canonical", None)
+            signature = self.hasher.signature(chunk["text"])
+            match = self.query(signature)
+            if match is None:
+                self.store.add(
+                    document_id,
+                    chunk_ref(document_id, chunk["chunk_id"]),
+                    self.band_keys(signature),
+                    signature,
+                )
+                continue
+
+            ref, similarity = match
+            canonical_doc, _, canonical_chunk = ref.partition("/")
+            chunk["canonical"] = {
+                "document_id": canonical_doc,
+                "chunk_id": canonical_chunk,
+                "similarity": round(similarity, 3),
+            }
+            duplicates += 1
+            cross_document += canonical_doc != document_id
+            tokens_saved += chunk.get("tokens", 0)
+
+        return {
+            "near_duplicates": duplicates,
+            "cross_document": cross_document,
+            "tokens_saved": tokens_saved,
+        }
+
+
+def is_local_duplicate(chunk: dict[str, Any], document_id: str) -> bool:
+    """规范分块在同一文档内"""
+    canonical = chunk.get("canonical")
+    return canonical is not None and canonical["document_id"] == document_id
+
+
+def reuse_canonical_embeddings(
+    store: ChunkStore, document_id: str, chunks: list[dict[str, Any]], model: str
+) -> int:
+    """
+    为跨文档的近重复分块沿用规范分块的向量（从其文档的内存映射矩阵读取）
+
+    只有向量矩阵清单记录的模型与 model 相同时才沿用（未记录模型的旧矩阵不沿用），
+    避免切换嵌入模型后混入另一个向量空间的向量；全零占位向量也不沿用。
+
+    Returns:
+        沿用的向量数
+    """
+    wanted: dict[str, list[dict[str, Any]]] = defaultdict(list)
+    for chunk in chunks:
+        canonical = chunk.get("canonical")
+        if canonical and canonical["document_id"] != document_id and "embedding" not in chunk:
+            wanted[canonical["document_id"]].append(chunk)
+
+    reused = 0
+    for canonical_doc, duplicates in wanted.items():
+        try:
+            matrix = store.open_matrix(canonical_doc)
+        except Exception:
+            continue  # 规范分块所在文档已删除或尚未写入向量
+        if matrix.embeddings is None or matrix.model != model:
+            continue
+        index = {chunk_id: i for i, chunk_id in enumerate(matrix.chunk_ids)}
+        for chunk in duplicates:
+            row = index.get(chunk["canonical"]["chunk_id"])
+            if row is not None and not is_placeholder_vector(matrix.embeddings[row]):
+                chunk["embedding"] = matrix.embeddings[row].astype("float32").tolist()
+                chunk["embedding_dim"] = matrix.dim
+                reused += 1
+    return reused
+
+
+def copy_local_embeddings(document_id: str, chunks: list[dict[str, Any]]) -> int:
+    """文档内的近重复分块复制规范分块的向量（规范分块向量化之后调用）"""
+    by_id = {chunk["chunk_id"]: chunk for chunk in chunks}
+    copied = 0
+    for chunk in chunks:
+        if is_local_duplicate(chunk, document_id) and "embedding" not in chunk:
+            canonical = by_id.get(chunk["canonical"]["chunk_id"])
+            if canonical is not None and "embedding" in canonical:
+                chunk["embedding"] = canonical["embedding"]
+                chunk["embedding_dim"] = canonical["embedding_dim"]
+                copied += 1
+    return copied
+
+
+# 单例
+_dedup_index: NearDuplicateIndex | None = None
+
+
+def get_dedup_index() -> NearDuplicateIndex | None:
+    """获取近重复索引单例，未启用时返回 None"""
+    global _dedup_index
+    if _dedup_index is None and settings.dedup_enabled:
+        _dedup_index = NearDuplicateIndex(
+            RedisLSHStore(),
+            threshold=settings.dedup_threshold,
+            num_perm=settings.dedup_num_perm,
+            shingle_size=settings.dedup_shingle_size,
+        )
+    return _dedup_index
+
+
+def link_near_duplicates(document_id: str, chunks: list[dict[str, Any]]) -> dict[str, Any] | None:
+    """标注近重复分块；未启用或 Redis 不可用时返回 None"""
+    index = get_dedup_index()
+    if index is None:
+        return None
+    try:
+        return index.link(document_id, chunks)
+    except redis.RedisError as e:
+        print(f"⚠️ 近重复检测跳过（索引不可用）: {e}")
+        return None
@@ -1,26 +1,60 @@
 """嵌入服务
 
-负责文本向量化，支持多种嵌入模型
+负责文本向量化，支持多种嵌入模型；按规范化文本缓存向量，跨文档复用
 """
 
-from typing import Any
+from typing import Any, Callable
 
 from app.config import get_settings
+from app.services.embedding_cache import EmbeddingCache, get_embedding_cache, normalize_text
+from app.services.local_models import (
+    LocalModelUnavailableError,
+    get_local_provider,
+    local_embedding_model_name,
+)
 
 settings = get_settings()
 
 
+def is_placeholder_vector(vector: Any) -> bool:
+    """是否为 Embedding API 不可用时返回的全零占位向量（不应被缓存或沿用）"""
+    return not any(vector)
+
+
 class Embedder:
     """文本嵌入器"""
 
-    def __init__(self):
+    def __init__(self, cache: EmbeddingCache | None = None):
         # 暂时不导入 LLM provider，避免在没有配置时报错
         self.provider = None
+        self.cache = cache if cache is not None else get_embedding_cache()
+        # 本实例的缓存命中统计（每次摄取新建一个 Embedder）
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def cache_stats(self) -> dict[str, Any]:
+        """缓存命中统计"""
+        total = self.cache_hits + self.cache_misses
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": round(self.cache_hits / total, 4) if total else 0.0,
+        }
+
+    @property
+    def model_name(self) -> str:
+        """向量所属的模型（区分缓存 key）"""
+        if settings.model_serve_mode == "local":
+            return local_embedding_model_name()
+        return settings.embedding_model
 
     async def embed_texts(self, texts: list[str]) -> list[list[float]]:
         """
         嵌入文本列表
 
+        先查向量缓存，只把未命中的文本（规范化后去重）发给嵌入接口，再按原顺序拼回。
+
         Args:
             texts: 文本列表
 
@@ -30,6 +64,39 @@ class Embedder:
         if not texts:
             return []
 
+        model = self.model_name
+        vectors = self.cache.get_many(model, texts) if self.cache else [None] * len(texts)
+
+        missing: dict[str, list[int]] = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(normalize_text(texts[i]), []).append(i)
+        missed = sum(len(indexes) for indexes in missing.values())
+        self.cache_hits += len(texts) - missed
+        self.cache_misses += missed
+        if not missing:
+            return vectors
+
+        miss_texts = [texts[indexes[0]] for indexes in missing.values()]
+        fresh = await self._embed_uncached(miss_texts)
+        for indexes, vector in zip(missing.values(), fresh):
+            for i in indexes:
+                vectors[i] = vector
+        if self.cache:
+            self.cache.set_many(model, miss_texts, fresh)
+        return vectors
+
+    async def _embed_uncached(self, texts: list[str]) -> list[list[float]]:
+        """调用嵌入接口"""
+        if settings.model_serve_mode == "local":
+            try:
+                if self.provider is None:
+                    self.provider = get_local_provider()
+                return await self.provider.embed(texts)
+            except LocalModelUnavailableError as e:
+                print(f"⚠️ 本地嵌入模型不可用，返回占位向量: {e}")
+                return [[0.0] * 1536 for _ in texts]
+
         # TODO: 实际调用 LLM Provider 的 embed 方法
         # try:
         #     from app.services.llm_provider import get_llm_provider
@@ -46,21 +113,35 @@ class Embedder:
         print(f"生成 {len(texts)} 个文本的占位向量（实际部署时会调用真实 API）")
         return [[0.0] * 1536 for _ in texts]
 
-    async def embed_chunks(self, chunks: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    async def embed_chunks(
+        self,
+        chunks: list[dict[str, Any]],
+        batch_size: int = 64,
+        on_progress: Callable[[int, int], None] | None = None,
+    ) -> list[dict[str, Any]]:
         """
         嵌入分块文本
 
+        已带 embedding 的分块（增量重新摄取时沿用上一版本向量）会被跳过。
+
         Args:
             chunks: 分块列表
+            batch_size: 每批嵌入的分块数
+            on_progress: 每完成一批的回调 (已嵌入分块数, 待嵌入分块数)
 
         Returns:
             带向量的分块列表
         """
-        texts = [chunk["text"] for chunk in chunks]
-        embeddings = await self.embed_texts(texts)
+        pending = [chunk for chunk in chunks if "embedding" not in chunk]
+        texts = [chunk["text"] for chunk in pending]
+        embeddings: list[list[float]] = []
+        for start in range(0, len(texts), batch_size):
+            embeddings.extend(await self.embed_texts(texts[start:start + batch_size]))
+            if on_progress is not None:
+                on_progress(len(embeddings), len(texts))
 
         # 将向量添加到 chunk
-        for chunk, embedding in zip(chunks, embeddings):
+        for chunk, embedding in zip(pending, embeddings):
             chunk["embedding"] = embedding
             chunk["embedding_dim"] = len(embedding)
 
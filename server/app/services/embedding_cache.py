@@ -0,0 +1,103 @@
+"""向量缓存
+
+不同教材之间大量重复的定义、例题和通用段落，以及重新摄取时未变化的分块，
+都不应该再次调用嵌入 API。缓存以 (嵌入模型, 规范化文本哈希) 为 key，
+值为 float32 小端序字节（1536 维约 6KB），存放在 Redis 中供所有 Worker 共享。
+
+Redis 不可用时静默降级为全部未命中，不影响摄取本身。
+"""
+
+import hashlib
+import re
+import time
+import unicodedata
+from typing import Any
+
+import numpy as np
+import redis
+
+from app.config import get_settings
+from app.services.metrics import record_cache
+
+settings = get_settings()
+
+KEY_PREFIX = "emb:"
+
+# Redis 出错后暂停访问的时间（秒），避免每批都等待连接超时
+RETRY_AFTER = 30.0
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本：NFKC（全角转半角等）+ 合并空白"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def cache_key(model: str, text: str) -> str:
+    """缓存 key：模型名 + 规范化文本的 SHA-256"""
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{KEY_PREFIX}{model}:{digest}"
+
+
+class EmbeddingCache:
+    """基于 Redis 的向量缓存"""
+
+    def __init__(self, client: Any = None, ttl: int | None = None):
+        self.client = client if client is not None else redis.from_url(
+            settings.embedding_cache_url or settings.redis_url, socket_connect_timeout=1
+        )
+        self.ttl = settings.embedding_cache_ttl if ttl is None else ttl
+        self._retry_at = 0.0
+
+    def _available(self) -> bool:
+        return time.monotonic() >= self._retry_at
+
+    def _fail(self, error: Exception) -> None:
+        print(f"⚠️ 向量缓存不可用: {error}")
+        self._retry_at = time.monotonic() + RETRY_AFTER
+
+    def get_many(self, model: str, texts: list[str]) -> list[list[float] | None]:
+        """批量查询，未命中的位置为 None"""
+        if not texts:
+            return []
+        values: list[Any] = [None] * len(texts)
+        if self._available():
+            try:
+                values = self.client.mget([cache_key(model, text) for text in texts])
+            except redis.RedisError as e:
+                self._fail(e)
+
+        vectors = [
+            np.frombuffer(value, dtype="<f4").tolist() if value else None for value in values
+        ]
+        hits = sum(1 for vector in vectors if vector is not None)
+        record_cache("embedding", hits=hits, misses=len(texts) - hits)
+        return vectors
+
+    def set_many(self, model: str, texts: list[str], vectors: list[list[float]]) -> None:
+        """批量写入（跳过全零的占位向量，避免接口故障时污染缓存）"""
+        if not texts or not self._available():
+            return
+        try:
+            pipe = self.client.pipeline()
+            for text, vector in zip(texts, vectors):
+                matrix = np.asarray(vector, dtype="<f4")
+                if not matrix.any():
+                    continue
+                pipe.set(cache_key(model, text), matrix.tobytes(), ex=self.ttl or None)
+            pipe.execute()
+        except redis.RedisError as e:
+            self._fail(e)
+
+
+# 单例
+_embedding_cache: EmbeddingCache | None = None
+
+
+def get_embedding_cache() -> EmbeddingCache | None:
+    """获取向量缓存单例，未启用时返回 None"""
+    global _embedding_cache
+    if _embedding_cache is None and settings.embedding_cache_enabled:
+        _embedding_cache = EmbeddingCache()
+    return _embedding_cache
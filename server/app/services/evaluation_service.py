@@ -3,10 +3,15 @@
 负责评估个性化改写的质量，提供多维度评分
 """
 
+import asyncio
 from typing import Dict, List
 
 from app.config import get_settings
+from app.prompts import registry
+from app.services.compressor import get_prompt_compressor
 from app.services.llm_provider import get_llm_provider
+from app.services.personalize_service import get_personalize_service
+from app.services.tracing import traced
 
 settings = get_settings()
 
@@ -44,70 +49,17 @@ class EvaluationService:
             interests: 用户兴趣列表
             
         Returns:
-            消息列表（用于 LLM Chat API）
+            消息列表（用于 LLM Chat API），附带 prompt_id
         """
-        dimensions_desc = "\n".join([
-            f"- **{key}（{info['name']}）**: {info['description']}，权重 {info['weight']}"
-            for key, info in self.EVALUATION_DIMENSIONS.items()
-        ])
-        
-        interests_text = "、".join(interests) if interests else "无"
-        
-        system_prompt = f"""你是一位严格的教育内容评测专家，负责评估文本改写的质量。
-
-你的任务是根据以下评测维度，对改写后的文本进行评分（每个维度 1-5 分）：
-
-{dimensions_desc}
-
-**评分标准**：
-- 5 分：优秀，完全达标
-- 4 分：良好，基本达标
-- 3 分：合格，有改进空间
-- 2 分：不合格，存在明显问题
-- 1 分：很差，严重偏离目标
-
-请客观、公正地评分，并为每个维度提供简短的评价理由。"""
-
-        user_prompt = f"""请评测以下文本改写的质量：
-
-**目标年级**：{grade} 年级
-**用户兴趣**：{interests_text}
-
-**原始文本**：
-{original_text}
-
-**改写后的文本**：
-{personalized_text}
-
-请按以下 JSON 格式输出评测结果：
-```json
-{{
-    "scores": {{
-        "correctness": 4.5,
-        "coverage": 4.0,
-        "readability": 4.2,
-        "interest_fit": 4.3,
-        "length_control": 4.5
-    }},
-    "comments": {{
-        "correctness": "事实准确，无明显错误",
-        "coverage": "保留了大部分关键信息，略有遗漏",
-        "readability": "用词和句式适合5年级学生",
-        "interest_fit": "成功融入了足球相关的例子",
-        "length_control": "长度适中，与原文接近"
-    }},
-    "overall_score": 4.3,
-    "summary": "改写质量良好，建议...",
-    "strengths": ["融入兴趣例子自然", "可读性提升明显"],
-    "weaknesses": ["个别专业术语可以进一步解释"]
-}}
-```"""
-
-        return [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ]
+        return registry.render(
+            "evaluation",
+            grade=grade,
+            interests="、".join(interests) if interests else "无",
+            original_text=original_text,
+            personalized_text=personalized_text,
+        )
     
+    @traced("evaluation.judge")
     async def evaluate_personalization(
         self,
         original_text: str,
@@ -167,6 +119,74 @@ class EvaluationService:
         
         return evaluation_result
     
+    @traced("evaluation.compression")
+    async def evaluate_compression(
+        self,
+        original_text: str,
+        grade: int,
+        interests: List[str],
+        must_keep_terms: List[str] | None = None,
+        ratio: float | None = None,
+    ) -> Dict:
+        """
+        评测提示词压缩对改写质量的影响
+        
+        分别用原文和压缩后的文本生成改写，两份改写都对照原文评测（遗漏的信息会体现在
+        覆盖度上），给出 token 节省量与各维度得分的变化。
+        
+        Args:
+            original_text: 原始文本
+            grade: 目标年级
+            interests: 用户兴趣列表
+            must_keep_terms: 必须保留的术语列表
+            ratio: 目标压缩比例，为 None 时使用 PROMPT_COMPRESSION_RATIO
+            
+        Returns:
+            {
+                "original_tokens": int,
+                "compressed_tokens": int,
+                "saved_tokens": int,
+                "compression_ratio": float,
+                "baseline": Dict,
+                "compressed": Dict,
+                "score_delta": Dict[str, float],
+                "overall_delta": float,
+                "term_coverage_delta": float
+            }
+        """
+        personalize_service = get_personalize_service()
+        compression = get_prompt_compressor().compress(original_text, must_keep_terms, ratio)
+
+        async def run(text: str) -> Dict:
+            rewrite = await personalize_service.personalize_text(
+                text, grade, interests, must_keep_terms, compress=False
+            )
+            personalized_text = rewrite["personalized_text"]
+            evaluation = await self.evaluate_personalization(
+                original_text, personalized_text, grade, interests
+            )
+            validation = await personalize_service.validate_personalization(
+                original_text, personalized_text, must_keep_terms
+            )
+            return {**evaluation, "term_coverage": validation["term_coverage"]}
+
+        baseline, compressed = await asyncio.gather(run(original_text), run(compression.text))
+
+        return {
+            "original_tokens": compression.original_tokens,
+            "compressed_tokens": compression.compressed_tokens,
+            "saved_tokens": compression.saved_tokens,
+            "compression_ratio": round(compression.ratio, 3),
+            "baseline": baseline,
+            "compressed": compressed,
+            "score_delta": {
+                dim: round(compressed["scores"].get(dim, 0) - score, 2)
+                for dim, score in baseline["scores"].items()
+            },
+            "overall_delta": round(compressed["overall_score"] - baseline["overall_score"], 2),
+            "term_coverage_delta": round(compressed["term_coverage"] - baseline["term_coverage"], 2),
+        }
+    
     def calculate_weighted_score(self, scores: Dict[str, float]) -> float:
         """
         计算加权总分
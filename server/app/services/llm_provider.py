@@ -3,16 +3,66 @@
 不使用 LangChain，通过 Protocol 定义接口，支持多家 LLM 厂商切换
 """
 
+import asyncio
 import json
-from typing import Any, Protocol
+import time
+from typing import Any, AsyncIterator, Callable, Protocol
 
 import httpx
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import (
+    RetryCallState,
+    retry,
+    retry_if_not_exception_type,
+    wait_exponential,
+)
 
 from app.config import get_settings
+from app.services.metrics import (
+    LLM_FAILOVERS,
+    LLM_HEDGE_WINS,
+    LLM_REQUEST_LATENCY,
+    LLM_RETRIES,
+    LLM_TOKENS,
+    record_llm_usage,
+)
+from app.services.resilience import CircuitBreaker, LatencyTracker
+from app.services.singleflight import SingleFlight, flight_key, get_singleflight
+from app.services.tokenizer import ContextOverflowError, fit_max_tokens
+from app.services.tracing import detached_span, set_span_attributes, traced
 
 settings = get_settings()
 
+# 可换 Provider / 端点重试的网络错误（与 HTTP 状态码无关）
+_TRANSIENT_ERRORS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    错误分类：rate_limited（429）、error（5xx / 超时 / 连接失败）、client_error（其他 HTTP 错误）
+
+    client_error 是请求本身的问题（参数错误、鉴权失败等），换 Provider 重试也会失败；
+    非 HTTP 异常（额度等待超时、响应解析失败等）按 error 处理。
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        if status == 429:
+            return "rate_limited"
+        return "error" if status >= 500 else "client_error"
+    if isinstance(error, _TRANSIENT_ERRORS):
+        return "error"
+    return "client_error" if isinstance(error, httpx.HTTPError) else "error"
+
+
+def _record_retry(retry_state: RetryCallState) -> None:
+    """tenacity 重试回调：记录重试次数"""
+    provider = retry_state.args[0]
+    LLM_RETRIES.labels(provider=provider.provider_name, model=provider.model).inc()
+
+
+def _stop_after_attempts(retry_state: RetryCallState) -> bool:
+    """按 Provider 实例的 max_attempts 停止重试"""
+    return retry_state.attempt_number >= retry_state.args[0].max_attempts
+
 
 class LLMProvider(Protocol):
     """LLM 提供商接口"""
@@ -25,6 +75,10 @@ class LLMProvider(Protocol):
         """对话补全"""
         ...
 
+    def stream_chat(self, messages: list[dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """流式对话补全，逐段产出生成的文本"""
+        ...
+
     async def embed(self, texts: list[str]) -> list[list[float]]:
         """文本嵌入"""
         ...
@@ -38,12 +92,18 @@ class OpenAICompatibleProvider:
         api_key: str, 
         model: str = "gpt-4o-mini",
         base_url: str = "https://api.openai.com/v1",
+        provider_name: str = "openai_compatible",
+        max_attempts: int = 3,
+        on_response: Callable[[httpx.Response], None] | None = None,
     ):
         self.api_key = api_key
         self.model = model
         self.base_url = base_url.rstrip("/")
+        self.provider_name = provider_name  # 指标标签
+        self.max_attempts = max_attempts  # Provider 池中为 1，由池换端点重试
+        self.on_response = on_response  # 收到响应时回调（读取限流响应头）
         self.client = httpx.AsyncClient(
-            timeout=60.0,
+            timeout=settings.llm_timeout,
             headers={
                 "Authorization": f"Bearer {api_key}",
                 "Content-Type": "application/json",
@@ -56,10 +116,13 @@ class OpenAICompatibleProvider:
         return await self.chat([{"role": "user", "content": prompt}], **kwargs)
 
     @retry(
-        stop=stop_after_attempt(3),
+        stop=_stop_after_attempts,
         wait=wait_exponential(multiplier=1, min=2, max=10),
+        retry=retry_if_not_exception_type(ContextOverflowError),  # 超长提示词重试无意义
+        before_sleep=_record_retry,
         reraise=True
     )
+    @traced("llm.chat")  # 位于 retry 之内：每次尝试一个 span
     async def chat(self, messages: list[dict[str, str]], **kwargs) -> str:
         """
         对话补全
@@ -70,24 +133,42 @@ class OpenAICompatibleProvider:
             
         Returns:
             LLM 生成的文本
+            
+        Raises:
+            ContextOverflowError: 提示词超出上下文窗口
         """
+        start = time.perf_counter()
+        outcome = "error"
         try:
             payload = {
                 "model": self.model,
                 "messages": messages,
                 "temperature": kwargs.get("temperature", 0.7),
-                "max_tokens": kwargs.get("max_tokens", settings.max_tokens),  # 从配置读取
+                # 按提示词长度收紧，避免超出上下文窗口
+                "max_tokens": fit_max_tokens(messages, kwargs.get("max_tokens")),
             }
             
             response = await self.client.post(
                 f"{self.base_url}/chat/completions",
                 json=payload,
             )
+            if self.on_response is not None:
+                self.on_response(response)
             
             response.raise_for_status()
             data = response.json()
             
-            return data["choices"][0]["message"]["content"]
+            usage = data.get("usage") or {}
+            record_llm_usage(self.provider_name, self.model, usage)
+            set_span_attributes(**{
+                "llm.provider": self.provider_name,
+                "llm.model": self.model,
+                "llm.prompt_tokens": usage.get("prompt_tokens"),
+                "llm.completion_tokens": usage.get("completion_tokens"),
+            })
+            content = data["choices"][0]["message"]["content"]
+            outcome = "success"
+            return content
             
         except httpx.HTTPStatusError as e:
             print(f"❌ HTTP Error: {e.response.status_code}")
@@ -96,13 +177,87 @@ class OpenAICompatibleProvider:
         except Exception as e:
             print(f"❌ API 调用失败: {str(e)}")
             raise
+        finally:
+            self._observe("chat", outcome, start)
 
+    def _observe(self, operation: str, outcome: str, start: float) -> None:
+        """记录单次调用延迟"""
+        LLM_REQUEST_LATENCY.labels(
+            provider=self.provider_name,
+            model=self.model,
+            operation=operation,
+            outcome=outcome,
+        ).observe(time.perf_counter() - start)
+
+    async def stream_chat(self, messages: list[dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """
+        流式对话补全（SSE）
+        
+        Args:
+            messages: 消息列表
+            **kwargs: temperature, max_tokens 等参数
+            
+        Yields:
+            每个增量片段的文本（约等于一个 token）
+        """
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": kwargs.get("temperature", 0.7),
+            "max_tokens": fit_max_tokens(messages, kwargs.get("max_tokens")),
+            "stream": True,
+        }
+        
+        # 异步生成器会在调用方的不同上下文中恢复，这里不把 span 设为当前上下文
+        with detached_span(
+            "llm.stream_chat", **{"llm.provider": self.provider_name, "llm.model": self.model}
+        ) as span:
+            start = time.perf_counter()
+            outcome = "error"
+            deltas = 0
+            try:
+                async with self.client.stream(
+                    "POST", f"{self.base_url}/chat/completions", json=payload
+                ) as response:
+                    if self.on_response is not None:
+                        self.on_response(response)
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        
+                        choices = json.loads(data).get("choices") or []
+                        delta = choices[0].get("delta", {}).get("content") if choices else None
+                        if delta:
+                            deltas += 1
+                            yield delta
+                outcome = "success"
+            finally:
+                # 流式响应一般不带 usage，按增量片段数近似 completion token 数
+                LLM_TOKENS.labels(
+                    provider=self.provider_name, model=self.model, kind="completion"
+                ).inc(deltas)
+                self._observe("stream_chat", outcome, start)
+                if span is not None:
+                    span.set_attribute("llm.completion_deltas", deltas)
+
+    @traced("llm.embed")
     async def embed(self, texts: list[str]) -> list[list[float]]:
         """
         文本嵌入
         
         注意：不是所有 OpenAI 兼容 API 都支持 embeddings
         """
+        set_span_attributes(**{
+            "llm.provider": self.provider_name,
+            "llm.model": settings.embedding_model,
+            "llm.batch_size": len(texts),
+        })
+        start = time.perf_counter()
+        outcome = "error"
         try:
             payload = {
                 "model": settings.embedding_model,
@@ -117,12 +272,21 @@ class OpenAICompatibleProvider:
             response.raise_for_status()
             data = response.json()
             
+            record_llm_usage(self.provider_name, settings.embedding_model, data.get("usage"))
+            outcome = "success"
             return [item["embedding"] for item in data["data"]]
             
         except Exception as e:
             print(f"⚠️ Embedding API 不可用，返回占位向量: {str(e)}")
             # 返回占位向量
             return [[0.0] * 1536 for _ in texts]
+        finally:
+            LLM_REQUEST_LATENCY.labels(
+                provider=self.provider_name,
+                model=settings.embedding_model,
+                operation="embed",
+                outcome=outcome,
+            ).observe(time.perf_counter() - start)
 
     async def close(self):
         """关闭连接"""
@@ -136,7 +300,8 @@ class OpenAIProvider(OpenAICompatibleProvider):
         super().__init__(
             api_key=api_key,
             model=model,
-            base_url="https://api.openai.com/v1"
+            base_url="https://api.openai.com/v1",
+            provider_name="openai",
         )
 
 
@@ -147,49 +312,434 @@ class SiliconFlowProvider(OpenAICompatibleProvider):
         super().__init__(
             api_key=api_key,
             model=model,
-            base_url="https://api.siliconflow.cn/v1"
+            base_url="https://api.siliconflow.cn/v1",
+            provider_name="siliconflow",
         )
 
 
 class AnthropicProvider:
-    """Anthropic (Claude) Provider 实现"""
+    """Anthropic (Claude) Provider（Messages API）
 
-    def __init__(self, api_key: str, model: str = "claude-3-haiku-20240307"):
+    system 消息合并为 system 参数，并在末尾打上 cache_control 断点：各服务把较长、
+    对同一批请求不变的说明放在 system 消息中，重复调用时由提供方命中提示词缓存，
+    只按缓存读取价计费。命中 / 写入缓存的 token 数记入 llm_tokens_total。
+    """
+
+    API_VERSION = "2023-06-01"
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "claude-3-haiku-20240307",
+        base_url: str | None = None,
+        provider_name: str = "anthropic",
+        max_attempts: int = 3,
+        prompt_cache: bool | None = None,
+    ):
         self.api_key = api_key
         self.model = model
+        self.base_url = (base_url or settings.anthropic_base_url).rstrip("/")
+        self.provider_name = provider_name
+        self.max_attempts = max_attempts
+        self.prompt_cache = settings.anthropic_prompt_cache if prompt_cache is None else prompt_cache
+        # 连接池在各次请求间复用
+        self.client = httpx.AsyncClient(
+            timeout=settings.llm_timeout,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            headers={
+                "x-api-key": api_key,
+                "anthropic-version": self.API_VERSION,
+                "content-type": "application/json",
+            },
+        )
+
+    def build_payload(self, messages: list[dict[str, str]], **kwargs) -> dict[str, Any]:
+        """转换为 Messages API 请求体"""
+        system = [m["content"] for m in messages if m["role"] == "system"]
+        conversation = [
+            {"role": m["role"], "content": m["content"]} for m in messages if m["role"] != "system"
+        ]
+        # 输出上限按上下文窗口收紧，且不超过模型支持的最大输出
+        max_tokens = min(
+            fit_max_tokens(messages, kwargs.get("max_tokens")), settings.anthropic_max_output_tokens
+        )
+        payload: dict[str, Any] = {
+            "model": self.model,
+            "messages": conversation,
+            "max_tokens": max_tokens,
+            "temperature": kwargs.get("temperature", 0.7),
+        }
+        if system:
+            blocks = [{"type": "text", "text": text} for text in system]
+            if self.prompt_cache:
+                blocks[-1]["cache_control"] = {"type": "ephemeral"}
+            payload["system"] = blocks
+        return payload
 
     async def complete(self, prompt: str, **kwargs) -> str:
         """文本补全"""
-        return f"[Anthropic] {prompt[:50]}..."
+        return await self.chat([{"role": "user", "content": prompt}], **kwargs)
 
+    @retry(
+        stop=_stop_after_attempts,
+        wait=wait_exponential(multiplier=1, min=2, max=10),
+        retry=retry_if_not_exception_type(ContextOverflowError),
+        before_sleep=_record_retry,
+        reraise=True
+    )
+    @traced("llm.chat")
     async def chat(self, messages: list[dict[str, str]], **kwargs) -> str:
-        """对话补全"""
-        return f"[Anthropic Chat] Response to {len(messages)} messages"
+        """
+        对话补全
+
+        Raises:
+            ContextOverflowError: 提示词超出上下文窗口
+        """
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await self.client.post(
+                f"{self.base_url}/v1/messages", json=self.build_payload(messages, **kwargs)
+            )
+            response.raise_for_status()
+            data = response.json()
+
+            usage = data.get("usage") or {}
+            self._record_usage(usage)
+            content = "".join(
+                block.get("text", "") for block in data.get("content", []) if block.get("type") == "text"
+            )
+            outcome = "success"
+            return content
+
+        except httpx.HTTPStatusError as e:
+            print(f"❌ HTTP Error: {e.response.status_code}")
+            print(f"Response: {e.response.text}")
+            raise
+        except Exception as e:
+            print(f"❌ API 调用失败: {str(e)}")
+            raise
+        finally:
+            self._observe("chat", outcome, start)
+
+    async def stream_chat(self, messages: list[dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """
+        流式对话补全（SSE）
+
+        Yields:
+            每个 text_delta 的文本
+        """
+        payload = {**self.build_payload(messages, **kwargs), "stream": True}
+
+        with detached_span(
+            "llm.stream_chat", **{"llm.provider": self.provider_name, "llm.model": self.model}
+        ) as span:
+            start = time.perf_counter()
+            outcome = "error"
+            usage: dict[str, int] = {}
+            try:
+                async with self.client.stream(
+                    "POST", f"{self.base_url}/v1/messages", json=payload
+                ) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        event = json.loads(line[len("data:"):].strip())
+                        kind = event.get("type")
+                        if kind == "message_start":
+                            usage.update(event["message"].get("usage") or {})
+                        elif kind == "content_block_delta":
+                            text = event.get("delta", {}).get("text")
+                            if text:
+                                yield text
+                        elif kind == "message_delta":
+                            usage.update(event.get("usage") or {})
+                        elif kind == "error":
+                            raise RuntimeError(event.get("error", {}).get("message", "stream error"))
+                        elif kind == "message_stop":
+                            break
+                outcome = "success"
+            finally:
+                self._record_usage(usage, span)
+                self._observe("stream_chat", outcome, start)
+
+    def _record_usage(self, usage: dict[str, Any], span: Any = None) -> None:
+        """记录 token 用量（含提示词缓存命中 / 写入），并写入 span 属性"""
+        record_llm_usage(self.provider_name, self.model, usage)
+        attributes = {
+            "llm.provider": self.provider_name,
+            "llm.model": self.model,
+            "llm.prompt_tokens": usage.get("input_tokens"),
+            "llm.completion_tokens": usage.get("output_tokens"),
+            "llm.cache_read_tokens": usage.get("cache_read_input_tokens"),
+            "llm.cache_write_tokens": usage.get("cache_creation_input_tokens"),
+        }
+        if span is None:
+            set_span_attributes(**attributes)
+            return
+        for key, value in attributes.items():
+            if value is not None:
+                span.set_attribute(key, value)
+
+    def _observe(self, operation: str, outcome: str, start: float) -> None:
+        """记录单次调用延迟"""
+        LLM_REQUEST_LATENCY.labels(
+            provider=self.provider_name,
+            model=self.model,
+            operation=operation,
+            outcome=outcome,
+        ).observe(time.perf_counter() - start)
 
     async def embed(self, texts: list[str]) -> list[list[float]]:
         """文本嵌入 - Anthropic 不提供嵌入，使用 Voyage AI 或其他"""
         raise NotImplementedError("Anthropic does not provide embeddings")
 
+    async def close(self):
+        """关闭连接"""
+        await self.client.aclose()
+
+
+class HedgedProvider:
+    """主备 Provider：对冲请求 + 熔断故障转移
+
+    chat 请求发出后，超过主 Provider 最近的 p95 延迟仍未返回时，向备用 Provider
+    发出相同请求，取先成功的结果并取消另一方；主 Provider 失败（5xx、429、超时、
+    连接失败）时立即转到备用，客户端错误（其他 4xx）直接抛出、不计入熔断。
+    主 Provider 熔断期间直接使用备用 Provider。
+    """
+
+    def __init__(
+        self,
+        primary: LLMProvider,
+        secondary: LLMProvider,
+        hedge: bool | None = None,
+        quantile: float | None = None,
+        min_delay: float | None = None,
+        initial_delay: float | None = None,
+    ):
+        self.primary = primary
+        self.secondary = secondary
+        self.hedge = settings.llm_hedge_enabled if hedge is None else hedge
+        self.quantile = settings.llm_hedge_quantile if quantile is None else quantile
+        self.min_delay = settings.llm_hedge_min_delay if min_delay is None else min_delay
+        self.initial_delay = (
+            settings.llm_hedge_initial_delay if initial_delay is None else initial_delay
+        )
+        self.latency = LatencyTracker()
+        self.breakers = {
+            "primary": _breaker(primary),
+            "secondary": _breaker(secondary),
+        }
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.primary, name)
+
+    def hedge_delay(self) -> float | None:
+        """发出对冲请求前等待的时间，None 表示不对冲"""
+        if not self.hedge:
+            return None
+        observed = self.latency.quantile(self.quantile)
+        return max(self.min_delay, self.initial_delay if observed is None else observed)
+
+    async def complete(self, prompt: str, **kwargs) -> str:
+        """文本补全"""
+        return await self.chat([{"role": "user", "content": prompt}], **kwargs)
+
+    async def chat(self, messages: list[dict[str, str]], **kwargs) -> str:
+        """
+        对话补全
+
+        Raises:
+            ContextOverflowError: 提示词超出上下文窗口（不转移）
+            httpx.HTTPStatusError: 客户端错误（429 以外的 4xx，不转移）
+            Exception: 主备均失败时抛出主 Provider 的异常
+        """
+        if not self.breakers["primary"].allow():
+            if self.breakers["secondary"].allow():
+                LLM_FAILOVERS.labels(reason="circuit_open").inc()
+                return await self._call("secondary", messages, kwargs)
+            # 主备都在熔断：仍然尝试主 Provider
+            return await self._call("primary", messages, kwargs)
+
+        tasks = {asyncio.create_task(self._call("primary", messages, kwargs)): "primary"}
+        delay = self.hedge_delay()
+        hedged = False
+        error: BaseException | None = None
+        try:
+            while True:
+                done, _ = await asyncio.wait(
+                    tasks, timeout=None if hedged else delay, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    raced = len(tasks) > 1
+                    role = tasks.pop(task)
+                    if task.exception() is None:
+                        if raced:
+                            LLM_HEDGE_WINS.labels(winner=role).inc()
+                        return task.result()
+                    exc = task.exception()
+                    if isinstance(exc, ContextOverflowError) or classify_error(exc) == "client_error":
+                        raise exc
+                    error = error or exc
+
+                # 超过对冲延迟仍无结果，或主 Provider 已失败：发往备用 Provider
+                if not hedged:
+                    hedged = True
+                    if self.breakers["secondary"].allow():
+                        LLM_FAILOVERS.labels(reason="hedge" if tasks else "error").inc()
+                        task = asyncio.create_task(self._call("secondary", messages, kwargs))
+                        tasks[task] = "secondary"
+                if not tasks:
+                    raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _call(self, role: str, messages: list[dict[str, str]], kwargs: dict) -> str:
+        """调用一方 Provider 并更新熔断器与延迟统计"""
+        provider = self.primary if role == "primary" else self.secondary
+        breaker = self.breakers[role]
+        start = time.perf_counter()
+        try:
+            result = await provider.chat(messages, **kwargs)
+        except asyncio.CancelledError:
+            breaker.release()
+            if role == "primary":
+                # 输给对冲请求的调用耗时只是下界，仍计入统计，避免 p95 只反映快的请求
+                self.latency.add(time.perf_counter() - start)
+            raise
+        except ContextOverflowError:
+            breaker.release()
+            raise
+        except Exception as e:
+            if classify_error(e) == "client_error":
+                breaker.release()  # 请求本身的问题，与 Provider 健康无关
+            else:
+                breaker.record_failure()
+            raise
+        breaker.record_success()
+        if role == "primary":
+            self.latency.add(time.perf_counter() - start)
+        return result
+
+    def stream_chat(self, messages: list[dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """流式对话补全（不对冲，主 Provider 熔断时使用备用）"""
+        if self.breakers["primary"].state == "open":
+            LLM_FAILOVERS.labels(reason="circuit_open").inc()
+            return self.secondary.stream_chat(messages, **kwargs)
+        return self.primary.stream_chat(messages, **kwargs)
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        """文本嵌入（向量需与已有索引同源，不转移）"""
+        return await self.primary.embed(texts)
+
+
+def _breaker(provider: LLMProvider) -> CircuitBreaker:
+    name = f"{getattr(provider, 'provider_name', 'llm')}/{getattr(provider, 'model', '')}"
+    return CircuitBreaker(
+        name,
+        failure_threshold=settings.llm_breaker_failure_threshold,
+        reset_timeout=settings.llm_breaker_reset_timeout,
+    )
+
+
+class SingleFlightProvider:
+    """合并同一时刻相同的 chat 请求（其余接口直接透传）
+
+    流式接口逐段产出、无法共享；嵌入已有向量缓存，均不合并
+    """
+
+    def __init__(self, provider: LLMProvider, flight: SingleFlight | None = None):
+        self.provider = provider
+        self.flight = flight or get_singleflight()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.provider, name)
+
+    async def complete(self, prompt: str, **kwargs) -> str:
+        """文本补全"""
+        return await self.chat([{"role": "user", "content": prompt}], **kwargs)
+
+    async def chat(self, messages: list[dict[str, str]], **kwargs) -> str:
+        """对话补全（相同的模型、提示词版本、消息与参数共享一次上游调用）"""
+        key = flight_key(
+            getattr(self.provider, "provider_name", type(self.provider).__name__),
+            getattr(self.provider, "model", None),
+            getattr(messages, "prompt_id", None),
+            messages,
+            kwargs,
+        )
+        return await self.flight.do(key, lambda: self.provider.chat(messages, **kwargs))
+
+    def stream_chat(self, messages: list[dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """流式对话补全"""
+        return self.provider.stream_chat(messages, **kwargs)
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        """文本嵌入"""
+        return await self.provider.embed(texts)
+
+
+# 单例：同一进程内的各服务共用一套 Provider（Provider 池的额度统计、熔断状态才准确）
+_llm_provider: LLMProvider | None = None
+
 
 def get_llm_provider() -> LLMProvider:
-    """根据配置获取 LLM Provider"""
-    provider_name = settings.llm_provider.lower()
-    
+    """获取 LLM Provider 单例（首次调用时按配置创建）"""
+    global _llm_provider
+    if _llm_provider is None:
+        _llm_provider = _build_llm_provider()
+    return _llm_provider
+
+
+def _build_llm_provider() -> LLMProvider:
+    """根据配置创建 LLM Provider"""
+    if settings.model_serve_mode == "local" and settings.local_chat_model_path:
+        from app.services.local_models import get_local_provider
+
+        provider = get_local_provider()
+    elif settings.llm_endpoints:
+        from app.services.provider_pool import build_provider_pool
+
+        provider = build_provider_pool(settings.llm_endpoints)
+    else:
+        provider = _create_provider(
+            settings.llm_provider.lower(), settings.llm_model, settings.llm_base_url
+        )
+    if settings.llm_fallback_provider or settings.llm_fallback_model:
+        secondary = _create_provider(
+            (settings.llm_fallback_provider or settings.llm_provider).lower(),
+            settings.llm_fallback_model or settings.llm_model,
+            settings.llm_fallback_base_url or settings.llm_base_url,
+            settings.llm_fallback_api_key or None,
+        )
+        provider = HedgedProvider(provider, secondary)
+    if settings.llm_singleflight_enabled:
+        provider = SingleFlightProvider(provider)
+    return provider
+
+
+def _create_provider(
+    provider_name: str, model: str, base_url: str, api_key: str | None = None
+) -> LLMProvider:
+    """创建具体厂商的 Provider（api_key 为 None 时使用该厂商的默认配置项）"""
     if provider_name == "openai":
         return OpenAIProvider(
-            api_key=settings.openai_api_key,
-            model=settings.llm_model,
+            api_key=api_key or settings.openai_api_key,
+            model=model,
         )
     elif provider_name == "siliconflow":
         return OpenAICompatibleProvider(
-            api_key=settings.openai_api_key,  # 复用 OPENAI_API_KEY 配置项
-            model=settings.llm_model,
-            base_url=settings.llm_base_url,  # 从配置读取 API 地址
+            api_key=api_key or settings.openai_api_key,  # 复用 OPENAI_API_KEY 配置项
+            model=model,
+            base_url=base_url,  # 从配置读取 API 地址
+            provider_name="siliconflow",
         )
     elif provider_name == "anthropic":
         return AnthropicProvider(
-            api_key=settings.anthropic_api_key,
-            model=settings.llm_model,
+            api_key=api_key or settings.anthropic_api_key,
+            model=model,
         )
     else:
         raise ValueError(f"Unsupported LLM provider: {provider_name}")
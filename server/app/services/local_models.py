@@ -0,0 +1,354 @@
+"""本地 CPU 推理（model_serve_mode="local"）
+
+- 嵌入：ONNX Runtime 运行小型多语言嵌入模型（如 multilingual-e5-small 导出的 model.onnx
+  + tokenizer.json），摄取时无需网络、没有按 token 计费
+- 对话（可选）：llama.cpp 运行 GGUF 小模型；未配置时对话仍走远程 API
+
+并发的嵌入请求由 EmbeddingBatcher 在后台线程中合并成批（按长度排序、每批单独补齐），
+再交给线程池推理；ONNX Runtime 推理时释放 GIL，多个批次可以并行。批处理线程与
+事件循环无关，API 进程与每次 asyncio.run 的 Celery 任务可以共用。
+
+依赖均为可选：pip install onnxruntime tokenizers [llama-cpp-python]
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Literal
+
+import numpy as np
+
+from app.config import get_settings
+
+settings = get_settings()
+
+Pooling = Literal["mean", "cls"]
+
+
+class LocalModelUnavailableError(RuntimeError):
+    """本地模型未配置或加载失败（依赖缺失、模型文件缺失或损坏等）"""
+
+
+class OnnxEmbeddingModel:
+    """ONNX Runtime 嵌入模型（CPU）"""
+
+    def __init__(
+        self,
+        model_dir: str | Path,
+        max_length: int = 512,
+        batch_size: int = 32,
+        pooling: Pooling = "mean",
+        prefix: str = "",
+        threads: int = 0,
+        session: Any = None,
+        tokenizer: Any = None,
+    ):
+        """
+        Args:
+            model_dir: 包含 model.onnx 与 tokenizer.json 的目录
+            batch_size: 单次推理的最大文本数
+            pooling: mean（按注意力掩码平均）或 cls（取首个 token）
+            prefix: 文本前缀（e5 系列为 "passage: "）
+            threads: 单个会话的算子内线程数，0 表示由 ONNX Runtime 决定
+            session / tokenizer: 测试时注入
+        """
+        model_dir = Path(model_dir)
+        self.name = model_dir.name
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.pooling = pooling
+        self.prefix = prefix
+
+        if tokenizer is None:
+            from tokenizers import Tokenizer
+
+            tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+            tokenizer.no_padding()  # 每批按批内最长文本补齐
+        tokenizer.enable_truncation(max_length)
+        self.tokenizer = tokenizer
+
+        if session is None:
+            import onnxruntime as ort
+
+            options = ort.SessionOptions()
+            if threads:
+                options.intra_op_num_threads = threads
+            session = ort.InferenceSession(
+                str(model_dir / "model.onnx"), options, providers=["CPUExecutionProvider"]
+            )
+        self.session = session
+        self._input_names = {i.name for i in session.get_inputs()}
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """
+        文本向量化（L2 归一化）
+
+        Returns:
+            float32 矩阵 (len(texts), dim)
+        """
+        encodings = self.tokenizer.encode_batch([self.prefix + text for text in texts])
+        # 按长度排序后分批，减少补齐的无效计算
+        order = sorted(range(len(texts)), key=lambda i: len(encodings[i].ids))
+        result: np.ndarray | None = None
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            vectors = self._run([encodings[i] for i in batch])
+            if result is None:
+                result = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            result[batch] = vectors
+        return result if result is not None else np.zeros((0, 0), dtype=np.float32)
+
+    def _run(self, encodings: list[Any]) -> np.ndarray:
+        width = max(len(e.ids) for e in encodings)
+        input_ids = np.zeros((len(encodings), width), dtype=np.int64)
+        attention_mask = np.zeros_like(input_ids)
+        token_type_ids = np.zeros_like(input_ids)
+        for row, encoding in enumerate(encodings):
+            n = len(encoding.ids)
+            input_ids[row, :n] = encoding.ids
+            attention_mask[row, :n] = encoding.attention_mask
+            token_type_ids[row, :n] = encoding.type_ids
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = token_type_ids
+        output = np.asarray(self.session.run(None, feeds)[0], dtype=np.float32)
+
+        if output.ndim == 2:
+            # 模型已输出句向量
+            vectors = output
+        elif self.pooling == "cls":
+            vectors = output[:, 0]
+        else:
+            mask = attention_mask[..., None].astype(np.float32)
+            vectors = (output * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class EmbeddingBatcher:
+    """动态批处理：合并并发请求，在线程池中推理"""
+
+    def __init__(
+        self,
+        encode: Callable[[list[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait: float = 0.005,
+        workers: int = 2,
+    ):
+        """
+        Args:
+            encode: 批量向量化函数
+            max_batch_size: 合并后的最大文本数（单个请求超过时单独成批）
+            max_wait: 收到第一个请求后等待更多请求的时间（秒）
+            workers: 推理线程数
+        """
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="local-embed")
+        self._queue: queue.Queue[tuple[list[str], Future]] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self.batches = 0
+
+    def submit(self, texts: list[str]) -> Future:
+        """提交文本，返回 concurrent.futures.Future[np.ndarray]"""
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((texts, future))
+        return future
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        """异步接口（任意事件循环均可调用）"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._collect, name="local-embed-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self) -> None:
+        """批处理线程：攒批后交给线程池"""
+        while True:
+            pending = [self._queue.get()]
+            size = len(pending[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                pending.append(item)
+                size += len(item[0])
+            self.batches += 1
+            self.executor.submit(self._run_batch, pending)
+
+    def _run_batch(self, pending: list[tuple[list[str], Future]]) -> None:
+        texts = [text for request, _ in pending for text in request]
+        try:
+            vectors = self.encode(texts)
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        start = 0
+        for request, future in pending:
+            future.set_result(vectors[start:start + len(request)])
+            start += len(request)
+
+
+class LlamaChatModel:
+    """llama.cpp 本地对话模型（GGUF）"""
+
+    def __init__(self, model_path: str, n_ctx: int = 4096, threads: int = 0):
+        from llama_cpp import Llama
+
+        self.name = Path(model_path).stem
+        self.llm = Llama(
+            model_path=model_path, n_ctx=n_ctx, n_threads=threads or None, verbose=False
+        )
+        # llama.cpp 的上下文不支持并发推理
+        self._lock = threading.Lock()
+
+    def chat(self, messages: list[dict[str, str]], **kwargs) -> str:
+        with self._lock:
+            response = self.llm.create_chat_completion(
+                messages=messages,
+                temperature=kwargs.get("temperature", 0.7),
+                max_tokens=kwargs.get("max_tokens"),
+            )
+        return response["choices"][0]["message"]["content"]
+
+    def stream(self, messages: list[dict[str, str]], emit: Callable[[str], None], **kwargs) -> None:
+        with self._lock:
+            for chunk in self.llm.create_chat_completion(
+                messages=messages,
+                temperature=kwargs.get("temperature", 0.7),
+                max_tokens=kwargs.get("max_tokens"),
+                stream=True,
+            ):
+                delta = chunk["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    emit(delta)
+
+
+class LocalProvider:
+    """本地推理 Provider（实现 LLMProvider 接口）"""
+
+    provider_name = "local"
+
+    def __init__(
+        self,
+        embedder: EmbeddingBatcher | None = None,
+        chat_model: LlamaChatModel | None = None,
+        executor: ThreadPoolExecutor | None = None,
+        model: str = "local",
+    ):
+        self.embedder = embedder
+        self.chat_model = chat_model
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="local-chat"
+        )
+        self.model = chat_model.name if chat_model else model
+
+    def _require_chat(self) -> LlamaChatModel:
+        if self.chat_model is None:
+            raise LocalModelUnavailableError("未配置本地对话模型（LOCAL_CHAT_MODEL_PATH）")
+        return self.chat_model
+
+    async def complete(self, prompt: str, **kwargs) -> str:
+        """文本补全"""
+        return await self.chat([{"role": "user", "content": prompt}], **kwargs)
+
+    async def chat(self, messages: list[dict[str, str]], **kwargs) -> str:
+        """对话补全"""
+        model = self._require_chat()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, lambda: model.chat(messages, **kwargs))
+
+    async def stream_chat(self, messages: list[dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """流式对话补全：推理线程逐段写入队列"""
+        model = self._require_chat()
+        loop = asyncio.get_running_loop()
+        deltas: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        def run() -> None:
+            try:
+                model.stream(messages, lambda d: loop.call_soon_threadsafe(deltas.put_nowait, d), **kwargs)
+            finally:
+                loop.call_soon_threadsafe(deltas.put_nowait, done)
+
+        task = loop.run_in_executor(self.executor, run)
+        while (delta := await deltas.get()) is not done:
+            yield delta
+        await task
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        """文本嵌入"""
+        if self.embedder is None:
+            raise LocalModelUnavailableError("未配置本地嵌入模型（LOCAL_EMBEDDING_MODEL_DIR）")
+        return (await self.embedder.embed(texts)).tolist()
+
+
+def local_embedding_model_name() -> str:
+    """本地嵌入模型名（用作向量缓存 key 的模型部分）"""
+    return f"local:{Path(settings.local_embedding_model_dir).name}"
+
+
+# 单例
+_local_provider: LocalProvider | None = None
+
+
+def get_local_provider() -> LocalProvider:
+    """
+    获取本地推理 Provider 单例（首次调用时加载模型）
+
+    Raises:
+        LocalModelUnavailableError: 模型加载失败（加载失败不缓存，下次调用重新加载）
+    """
+    global _local_provider
+    if _local_provider is None:
+        try:
+            _local_provider = _load_local_provider()
+        except Exception as e:
+            # tokenizers / onnxruntime / llama.cpp 的加载错误类型各不相同，统一转换
+            raise LocalModelUnavailableError(f"本地模型加载失败: {e}") from e
+    return _local_provider
+
+
+def _load_local_provider() -> LocalProvider:
+    embedder = None
+    if settings.local_embedding_model_dir:
+        model = OnnxEmbeddingModel(
+            settings.local_embedding_model_dir,
+            max_length=settings.local_embedding_max_length,
+            batch_size=settings.local_embedding_batch_size,
+            pooling=settings.local_embedding_pooling,
+            prefix=settings.local_embedding_prefix,
+        )
+        embedder = EmbeddingBatcher(
+            model.encode,
+            max_batch_size=settings.local_embedding_batch_size,
+            max_wait=settings.local_embedding_batch_wait_ms / 1000,
+            workers=settings.local_inference_threads,
+        )
+    chat_model = None
+    if settings.local_chat_model_path:
+        chat_model = LlamaChatModel(
+            settings.local_chat_model_path, n_ctx=settings.local_chat_context
+        )
+    return LocalProvider(embedder, chat_model, model=local_embedding_model_name())
@@ -0,0 +1,229 @@
+"""整章 / 整篇素材的 map-reduce 生成
+
+单个提示词放不下整章内容时，先按段落把正文切成若干片段（map），为每个片段并行生成
+局部素材（思维导图子图、测验候选题、沉浸式小节），再合并（reduce）：
+
+- 思维导图：各子图挂到同一个根节点下，标签相似的节点合并为一个，边随之重定向并去重
+- 测验题：题干相似的候选题去重，按难度分桶后轮流取题，使各难度分布均衡
+- 沉浸式文本：按片段顺序拼接小节
+
+片段之间没有依赖，总耗时随文档长度增长的是并行度而不是串行调用次数。
+"""
+
+import asyncio
+import difflib
+import unicodedata
+from collections import Counter, defaultdict, deque
+from typing import Any, Awaitable, Callable, TypeVar
+
+from app.config import get_settings
+from app.services.compressor import split_sentences
+from app.services.tokenizer import count_tokens
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+
+def split_content(content: str, target_tokens: int | None = None) -> list[str]:
+    """
+    按段落把正文切成不超过 target_tokens 的片段（超长段落按句子切分）
+
+    Returns:
+        片段列表；正文能放进一个片段时只有一个元素
+    """
+    target_tokens = target_tokens or settings.map_reduce_chunk_tokens
+    if count_tokens(content) <= target_tokens:
+        return [content]
+
+    pieces: list[tuple[str, int]] = []
+    for paragraph in content.split("\n"):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        tokens = count_tokens(paragraph)
+        if tokens <= target_tokens:
+            pieces.append((paragraph, tokens))
+        else:
+            pieces.extend((s, count_tokens(s)) for s in split_sentences(paragraph))
+
+    parts: list[str] = []
+    current: list[str] = []
+    current_tokens = 0
+    for text, tokens in pieces:
+        if current and current_tokens + tokens > target_tokens:
+            parts.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        parts.append("\n".join(current))
+    return parts
+
+
+async def map_parts(
+    fn: Callable[[str], Awaitable[T]], parts: list[str], concurrency: int | None = None
+) -> list[T]:
+    """并行处理各片段（同时进行的调用数不超过 concurrency），结果保持片段顺序"""
+    semaphore = asyncio.Semaphore(concurrency or settings.map_reduce_concurrency)
+
+    async def run(part: str) -> T:
+        async with semaphore:
+            return await fn(part)
+
+    return await asyncio.gather(*[run(part) for part in parts])
+
+
+def _label_key(label: str) -> str:
+    """标签规范化：NFKC、小写、去掉空白与标点"""
+    normalized = unicodedata.normalize("NFKC", label).lower()
+    return "".join(ch for ch in normalized if ch.isalnum())
+
+
+def label_similarity(a: str, b: str) -> float:
+    """两个标签的相似度（0-1）"""
+    a, b = _label_key(a), _label_key(b)
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
+
+class _NodeIndex:
+    """按标签相似度合并节点"""
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.nodes: list[dict[str, Any]] = []
+        self._exact: dict[str, str] = {}
+
+    def resolve(self, label: str, node_type: str, node_id: str | None = None) -> str:
+        """返回相似节点的 ID，没有则新建"""
+        key = _label_key(label)
+        if key in self._exact:
+            return self._exact[key]
+        best_id, best = None, self.threshold
+        for node in self.nodes:
+            similarity = label_similarity(label, node["label"])
+            if similarity >= best:
+                best_id, best = node["id"], similarity
+        if best_id is None:
+            best_id = node_id or f"node{len(self.nodes)}"
+            self.nodes.append({"id": best_id, "label": label, "type": node_type})
+        if key:
+            self._exact[key] = best_id
+        return best_id
+
+
+def merge_mindmaps(
+    partials: list[dict[str, Any]], title: str | None = None, threshold: float | None = None
+) -> dict[str, Any]:
+    """
+    合并思维导图子图
+
+    Args:
+        partials: 各片段的 {"nodes": [...], "edges": [...]}
+        title: 根节点标签，为 None 时取各子图中最常见的根节点标签
+        threshold: 标签相似度不低于该值的节点合并
+
+    Returns:
+        {"nodes": [...], "edges": [...]}，根节点 ID 为 "root"
+    """
+    threshold = settings.map_reduce_label_similarity if threshold is None else threshold
+    roots = [
+        node["label"]
+        for partial in partials
+        for node in partial.get("nodes", [])
+        if node.get("type") == "root"
+    ]
+    if title is None:
+        title = Counter(roots).most_common(1)[0][0] if roots else "学习内容"
+
+    index = _NodeIndex(threshold)
+    index.resolve(title, "root", node_id="root")
+    edges: list[dict[str, Any]] = []
+    seen_edges: set[tuple[str, str]] = set()
+
+    def add_edge(source: str, target: str, label: str) -> None:
+        if source == target or (source, target) in seen_edges:
+            return
+        seen_edges.add((source, target))
+        edges.append({"source": source, "target": target, "label": label})
+
+    for partial in partials:
+        mapping: dict[str, str] = {}
+        for node in partial.get("nodes", []):
+            label = str(node.get("label", "")).strip()
+            if not label:
+                continue
+            if node.get("type") == "root":
+                # 子图的根作为章节概念挂到总根下（与总根相似时直接合并）
+                mapped = index.resolve(label, "concept")
+                add_edge("root", mapped, "包含")
+            else:
+                mapped = index.resolve(label, node.get("type", "concept"))
+            mapping[node["id"]] = mapped
+        for edge in partial.get("edges", []):
+            source, target = mapping.get(edge.get("source")), mapping.get(edge.get("target"))
+            if source and target:
+                add_edge(source, target, edge.get("label", ""))
+
+    return {"nodes": index.nodes, "edges": edges}
+
+
+def _difficulty(question: dict[str, Any]) -> int:
+    """题目难度（1-5），缺失或无法解析（None、"中等" 等）时按 3 处理"""
+    try:
+        difficulty = int(question.get("difficulty", 3))
+    except (TypeError, ValueError):
+        return 3
+    return difficulty if 1 <= difficulty <= 5 else 3
+
+
+def balance_quiz(
+    candidates: list[list[dict[str, Any]]], count: int, threshold: float | None = None
+) -> list[dict[str, Any]]:
+    """
+    从各片段的候选题中选出 count 道
+
+    题干相似的候选题只保留一道；按难度分桶，每桶内各片段的题目交替排列（覆盖各章节），
+    再在各难度之间轮流取题，最后按难度从易到难排序并重新编号。
+
+    Args:
+        candidates: 各片段的候选题列表
+        count: 题目数量
+        threshold: 题干相似度不低于该值视为重复
+    """
+    threshold = settings.map_reduce_label_similarity if threshold is None else threshold
+
+    # 各片段交替排列后去重
+    interleaved = []
+    queues = [deque(questions) for questions in candidates]
+    while any(queues):
+        for queue in queues:
+            if queue:
+                interleaved.append(queue.popleft())
+    unique: list[dict[str, Any]] = []
+    for question in interleaved:
+        stem = str(question.get("stem", ""))
+        if any(label_similarity(stem, str(kept.get("stem", ""))) >= threshold for kept in unique):
+            continue
+        unique.append(question)
+
+    buckets: dict[int, deque] = defaultdict(deque)
+    for question in unique:
+        buckets[_difficulty(question)].append(question)
+
+    selected: list[dict[str, Any]] = []
+    while len(selected) < count and any(buckets.values()):
+        for difficulty in sorted(buckets):
+            if buckets[difficulty] and len(selected) < count:
+                selected.append(buckets[difficulty].popleft())
+
+    selected.sort(key=_difficulty)
+    return [
+        {**question, "id": f"q{i}", "difficulty": _difficulty(question)}
+        for i, question in enumerate(selected, 1)
+    ]
+
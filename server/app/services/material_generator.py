@@ -3,15 +3,23 @@
 提供测验题、思维导图、沉浸式文本等多种学习素材的生成
 """
 
+import math
 from abc import ABC, abstractmethod
 from typing import Any, Dict, List
 
 from app.config import get_settings
+from app.prompts import registry
+from app.services.compressor import compress_for_prompt
 from app.services.llm_provider import get_llm_provider
+from app.services.map_reduce import balance_quiz, map_parts, merge_mindmaps, split_content
 
 settings = get_settings()
 
 
+class MaterialGenerationError(RuntimeError):
+    """素材生成失败（整章生成的片段不使用模拟数据降级）"""
+
+
 class MaterialGenerator(ABC):
     """素材生成器基类"""
     
@@ -20,13 +28,67 @@ class MaterialGenerator(ABC):
     
     @abstractmethod
     async def generate(self, content: str, profile: Dict, **kwargs) -> Any:
-        """生成素材的抽象方法"""
+        """
+        生成素材的抽象方法
+        
+        LLM 调用或解析失败时降级为模拟数据；kwargs 中 fallback=False 时改为抛出
+        MaterialGenerationError
+        """
         pass
     
     @abstractmethod
     def validate(self, result: Any) -> bool:
         """验证生成结果的有效性"""
         pass
+    
+    def prepare_content(self, content: str, must_keep_terms: List[str] | None = None) -> str:
+        """
+        送入提示词前的正文处理（按配置压缩，同一分块的多种素材共用压缩结果）
+        
+        Args:
+            must_keep_terms: 必须保留的术语，压缩时不删除包含它们的句子
+        """
+        return compress_for_prompt(content, must_keep_terms)
+    
+    async def generate_document(self, content: str, profile: Dict, **kwargs) -> Any:
+        """
+        生成整章 / 整篇素材
+        
+        正文能放进一个片段时等同于 generate；否则各片段并行生成局部素材，再由 reduce 合并。
+        片段生成失败时不降级为模拟数据（否则模拟内容会混入合并结果），而是跳过该片段；
+        未通过 validate 的局部素材（缺字段、节点无 id 等）同样跳过
+        
+        Raises:
+            MaterialGenerationError: 所有片段都生成失败
+        """
+        parts = split_content(content)
+        if len(parts) == 1:
+            return await self.generate(content, profile, **kwargs)
+        
+        map_kwargs = {**self.map_kwargs(len(parts), **kwargs), "fallback": False}
+        
+        async def generate_part(part: str) -> Any:
+            try:
+                partial = await self.generate(part, profile, **map_kwargs)
+            except MaterialGenerationError:
+                return None
+            return partial if self.validate(partial) else None
+        
+        partials = [p for p in await map_parts(generate_part, parts) if p is not None]
+        if not partials:
+            raise MaterialGenerationError(f"全部 {len(parts)} 个片段生成失败")
+        if len(partials) < len(parts):
+            print(f"⚠️ {len(parts) - len(partials)}/{len(parts)} 个片段生成失败，已跳过")
+        return self.reduce(partials, **kwargs)
+    
+    def map_kwargs(self, n_parts: int, **kwargs) -> Dict:
+        """各片段的生成参数"""
+        return kwargs
+    
+    @abstractmethod
+    def reduce(self, partials: List[Any], **kwargs) -> Any:
+        """合并各片段的局部素材"""
+        pass
 
 
 class QuizGenerator(MaterialGenerator):
@@ -38,95 +100,13 @@ class QuizGenerator(MaterialGenerator):
         self, content: str, grade: int, interests: List[str], count: int = 10
     ) -> List[Dict[str, str]]:
         """构建测验题生成提示词"""
-        
-        interests_text = "、".join(interests) if interests else "日常生活"
-        
-        system_prompt = f"""你是一位专业的教育测评专家，擅长根据学习内容生成高质量的测验题。
-
-你的任务是：
-1. 根据提供的学习内容生成 {count} 道测验题
-2. 题型分布：单选题、多选题、判断题、简答题
-3. 难度分级：1（容易）到 5（困难）
-4. 适合 {grade} 年级学生的认知水平
-5. 在适当的地方融入与「{interests_text}」相关的场景
-
-**题型要求**：
-- **单选题 (single)**：4个选项，只有1个正确答案
-- **多选题 (multi)**：4-5个选项，2-3个正确答案
-- **判断题 (tf)**：对或错
-- **简答题 (short)**：需要文字回答
-
-**必须包含**：
-- 题目描述 (stem)
-- 选项 (options)，判断题和简答题可为空数组
-- 正确答案 (answer)
-- 详细解析 (explanation)
-- 难度等级 (difficulty: 1-5)
-
-**质量要求**：
-- 题目紧扣学习内容的核心概念
-- 干扰项设计合理，避免过于明显
-- 解析清晰，帮助学生理解
-- 覆盖不同认知层次（记忆、理解、应用）"""
-
-        user_prompt = f"""请根据以下学习内容生成 {count} 道测验题：
-
-**学习内容**：
-{content}
-
-**目标年级**：{grade} 年级
-**学生兴趣**：{interests_text}
-
-请以 JSON 格式输出，格式如下：
-```json
-{{
-    "questions": [
-        {{
-            "id": "q1",
-            "type": "single",
-            "stem": "题目描述",
-            "options": ["选项A", "选项B", "选项C", "选项D"],
-            "answer": "选项A",
-            "explanation": "详细解析",
-            "difficulty": 3
-        }},
-        {{
-            "id": "q2",
-            "type": "multi",
-            "stem": "题目描述（可以包含多个正确答案）",
-            "options": ["选项A", "选项B", "选项C", "选项D"],
-            "answer": ["选项A", "选项C"],
-            "explanation": "详细解析",
-            "difficulty": 4
-        }},
-        {{
-            "id": "q3",
-            "type": "tf",
-            "stem": "判断题描述",
-            "options": [],
-            "answer": true,
-            "explanation": "详细解析",
-            "difficulty": 2
-        }},
-        {{
-            "id": "q4",
-            "type": "short",
-            "stem": "简答题描述",
-            "options": [],
-            "answer": "参考答案",
-            "explanation": "评分要点",
-            "difficulty": 4
-        }}
-    ]
-}}
-```
-
-请直接输出 JSON，不要添加额外说明。"""
-
-        return [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ]
+        return registry.render(
+            "quiz",
+            count=count,
+            grade=grade,
+            interests="、".join(interests) if interests else "日常生活",
+            content=content,
+        )
     
     async def generate(
         self, content: str, profile: Dict, count: int = 10, **kwargs
@@ -138,6 +118,7 @@ class QuizGenerator(MaterialGenerator):
             content: 学习内容
             profile: 用户画像
             count: 题目数量
+            must_keep_terms: 必须保留的术语（可选），压缩正文时不删除
             
         Returns:
             {
@@ -158,6 +139,7 @@ class QuizGenerator(MaterialGenerator):
         interests = profile.get("interests", [])
         
         # 构建提示词
+        content = self.prepare_content(content, kwargs.get("must_keep_terms"))
         messages = self.build_quiz_prompt(content, grade, interests, count)
         
         try:
@@ -195,12 +177,23 @@ class QuizGenerator(MaterialGenerator):
         except Exception as e:
             print(f"⚠️ LLM 响应解析失败: {str(e)}")
             print(f"原始响应: {response[:200] if 'response' in locals() else 'N/A'}...")
+            if not kwargs.get("fallback", True):
+                raise MaterialGenerationError(str(e)) from e
             
             # 降级为模拟数据
             print("⚠️ 使用模拟数据作为降级方案")
             questions = self._generate_mock_questions(count, grade, interests)
             return {"questions": questions}
     
+    def map_kwargs(self, n_parts: int, count: int = 10, **kwargs) -> Dict:
+        """各片段多生成一些候选题，供 reduce 去重并按难度均衡"""
+        per_part = math.ceil(count * settings.map_reduce_quiz_overgenerate / n_parts)
+        return {**kwargs, "count": max(per_part, 2)}
+    
+    def reduce(self, partials: List[Dict], count: int = 10, **kwargs) -> Dict:
+        """去重并按难度均衡选题"""
+        return {"questions": balance_quiz([p.get("questions", []) for p in partials], count)}
+    
     def _generate_mock_questions(
         self, count: int, grade: int, interests: List[str]
     ) -> List[Dict]:
@@ -264,8 +257,8 @@ class QuizGenerator(MaterialGenerator):
             if q["type"] not in self.QUESTION_TYPES:
                 return False
             
-            # 检查难度范围
-            if not (1 <= q["difficulty"] <= 5):
+            # 检查难度范围（LLM 可能返回 "中等" 等非整数）
+            if not isinstance(q["difficulty"], int) or not (1 <= q["difficulty"] <= 5):
                 return False
         
         return True
@@ -278,83 +271,12 @@ class MindMapGenerator(MaterialGenerator):
         self, content: str, grade: int, interests: List[str]
     ) -> List[Dict[str, str]]:
         """构建思维导图生成提示词"""
-        
-        interests_text = "、".join(interests) if interests else "日常生活"
-        
-        system_prompt = f"""你是一位专业的知识可视化专家，擅长将学习内容转化为思维导图。
-
-你的任务是：
-1. 识别学习内容中的核心概念和关键关系
-2. 构建清晰的层次结构
-3. 适合 {grade} 年级学生理解
-4. 在适当的地方融入与「{interests_text}」相关的类比
-
-**思维导图要求**：
-- **节点 (nodes)**：包含核心概念、子概念、具体事例
-  - `id`: 唯一标识符（如 "node1", "node2"）
-  - `label`: 节点显示的文本
-  - `type`: 节点类型（"root"根节点, "concept"概念, "example"示例）
-  
-- **连接 (edges)**：表示概念之间的关系
-  - `source`: 起始节点 ID
-  - `target`: 目标节点 ID
-  - `label`: 关系描述（如"包含"、"导致"、"需要"）
-
-**设计原则**：
-- 保持层次清晰，避免过于复杂
-- 确保所有节点都连通（无孤立节点）
-- 关系标签简洁明了
-- 覆盖学习内容的关键概念"""
-
-        user_prompt = f"""请根据以下学习内容生成思维导图的 JSON 数据：
-
-**学习内容**：
-{content}
-
-**目标年级**：{grade} 年级
-**学生兴趣**：{interests_text}
-
-请以 JSON 格式输出，格式如下：
-```json
-{{
-    "nodes": [
-        {{
-            "id": "root",
-            "label": "光合作用",
-            "type": "root"
-        }},
-        {{
-            "id": "node1",
-            "label": "必需条件",
-            "type": "concept"
-        }},
-        {{
-            "id": "node2",
-            "label": "阳光",
-            "type": "example"
-        }}
-    ],
-    "edges": [
-        {{
-            "source": "root",
-            "target": "node1",
-            "label": "需要"
-        }},
-        {{
-            "source": "node1",
-            "target": "node2",
-            "label": "包含"
-        }}
-    ]
-}}
-```
-
-请直接输出 JSON，不要添加额外说明。"""
-
-        return [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ]
+        return registry.render(
+            "mindmap",
+            grade=grade,
+            interests="、".join(interests) if interests else "日常生活",
+            content=content,
+        )
     
     async def generate(self, content: str, profile: Dict, **kwargs) -> Dict:
         """
@@ -363,6 +285,7 @@ class MindMapGenerator(MaterialGenerator):
         Args:
             content: 学习内容
             profile: 用户画像
+            must_keep_terms: 必须保留的术语（可选），压缩正文时不删除
             
         Returns:
             {
@@ -374,6 +297,7 @@ class MindMapGenerator(MaterialGenerator):
         interests = profile.get("interests", [])
         
         # 构建提示词
+        content = self.prepare_content(content, kwargs.get("must_keep_terms"))
         messages = self.build_mindmap_prompt(content, grade, interests)
         
         try:
@@ -403,12 +327,18 @@ class MindMapGenerator(MaterialGenerator):
         except Exception as e:
             print(f"⚠️ LLM 响应解析失败: {str(e)}")
             print(f"原始响应: {response[:200] if 'response' in locals() else 'N/A'}...")
+            if not kwargs.get("fallback", True):
+                raise MaterialGenerationError(str(e)) from e
             
             # 降级为模拟数据
             print("⚠️ 使用模拟数据作为降级方案")
             mindmap_data = self._generate_mock_mindmap(interests)
             return mindmap_data
     
+    def reduce(self, partials: List[Dict], **kwargs) -> Dict:
+        """合并子图：相似标签的节点合并为一个"""
+        return merge_mindmaps(partials)
+    
     def _generate_mock_mindmap(self, interests: List[str]) -> Dict:
         """生成模拟思维导图（用于测试）"""
         interest_example = interests[0] if interests else "植物"
@@ -472,70 +402,12 @@ class ImmersiveTextGenerator(MaterialGenerator):
         self, content: str, grade: int, interests: List[str]
     ) -> List[Dict[str, str]]:
         """构建沉浸式文本生成提示词"""
-        
-        interests_text = "、".join(interests) if interests else "日常生活"
-        
-        system_prompt = f"""你是一位优秀的教育内容创作者，擅长将学习内容改写为引人入胜的沉浸式文本。
-
-你的任务是：
-1. 将学习内容改写为生动、有趣的故事化表达
-2. 分成多个小节，每节有清晰的标题
-3. 适合 {grade} 年级学生阅读
-4. 融入与「{interests_text}」相关的场景和例子
-5. 为关键位置添加插图占位符
-
-**沉浸式文本特点**：
-- 使用第二人称（"你"）或故事叙述的方式
-- 创造情境感，让学生身临其境
-- 保留所有关键概念和定义
-- 语言生动，富有画面感
-
-**插图占位符格式**：
-- 在需要插图的地方使用：`{{image:插图描述}}`
-- 例如：`{{image:一片绿色的叶子在阳光下闪闪发光}}`
-
-**输出格式**：
-每个小节包含：
-- `title`: 小节标题
-- `paragraphs`: 段落数组
-- 在适当段落中包含插图占位符"""
-
-        user_prompt = f"""请将以下学习内容改写为沉浸式文本：
-
-**学习内容**：
-{content}
-
-**目标年级**：{grade} 年级
-**学生兴趣**：{interests_text}
-
-请以 JSON 格式输出，格式如下：
-```json
-{{
-    "sections": [
-        {{
-            "title": "小节标题",
-            "paragraphs": [
-                "第一段文本内容...",
-                "{{{{image:插图描述}}}}",
-                "第二段文本内容..."
-            ]
-        }},
-        {{
-            "title": "另一个小节标题",
-            "paragraphs": [
-                "段落内容..."
-            ]
-        }}
-    ]
-}}
-```
-
-请直接输出 JSON，不要添加额外说明。"""
-
-        return [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ]
+        return registry.render(
+            "immersive",
+            grade=grade,
+            interests="、".join(interests) if interests else "日常生活",
+            content=content,
+        )
     
     async def generate(self, content: str, profile: Dict, **kwargs) -> Dict:
         """
@@ -544,6 +416,7 @@ class ImmersiveTextGenerator(MaterialGenerator):
         Args:
             content: 学习内容
             profile: 用户画像
+            must_keep_terms: 必须保留的术语（可选），压缩正文时不删除
             
         Returns:
             {
@@ -559,6 +432,7 @@ class ImmersiveTextGenerator(MaterialGenerator):
         interests = profile.get("interests", [])
         
         # 构建提示词
+        content = self.prepare_content(content, kwargs.get("must_keep_terms"))
         messages = self.build_immersive_prompt(content, grade, interests)
         
         try:
@@ -588,12 +462,18 @@ class ImmersiveTextGenerator(MaterialGenerator):
         except Exception as e:
             print(f"⚠️ LLM 响应解析失败: {str(e)}")
             print(f"原始响应: {response[:200] if 'response' in locals() else 'N/A'}...")
+            if not kwargs.get("fallback", True):
+                raise MaterialGenerationError(str(e)) from e
             
             # 降级为模拟数据
             print("⚠️ 使用模拟数据作为降级方案")
             immersive_data = self._generate_mock_immersive(interests)
             return immersive_data
     
+    def reduce(self, partials: List[Dict], **kwargs) -> Dict:
+        """按片段顺序拼接小节"""
+        return {"sections": [section for p in partials for section in p.get("sections", [])]}
+    
     def _generate_mock_immersive(self, interests: List[str]) -> Dict:
         """生成模拟沉浸式文本（用于测试）"""
         interest_example = interests[0] if interests else "运动"
@@ -0,0 +1,206 @@
+"""Prometheus 指标
+
+覆盖 HTTP 请求延迟、LLM 调用延迟 / token 用量 / 重试、PDF 摄取各阶段耗时、
+缓存命中率和 Celery 队列长度。
+
+API 进程通过 /metrics 暴露；Celery Worker 在 METRICS_WORKER_PORT 上单独暴露。
+prefork 模式下多个子进程需设置 PROMETHEUS_MULTIPROC_DIR 环境变量，
+各进程把指标写入共享目录，由暴露端聚合。
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily, REGISTRY
+
+from app.config import get_settings
+
+settings = get_settings()
+
+# 秒级延迟分桶：覆盖毫秒级接口到分钟级 LLM 调用
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+HTTP_REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP 请求延迟（按路由模板）",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+LLM_REQUEST_LATENCY = Histogram(
+    "llm_request_duration_seconds",
+    "LLM 调用延迟",
+    ["provider", "model", "operation", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "LLM token 用量",
+    ["provider", "model", "kind"],  # kind: prompt / completion / cache_read / cache_write
+)
+
+LLM_RETRIES = Counter(
+    "llm_retries_total",
+    "LLM 调用重试次数",
+    ["provider", "model"],
+)
+
+LLM_POOL_REQUESTS = Counter(
+    "llm_pool_requests_total",
+    "Provider 池各端点的请求数",
+    ["endpoint", "outcome"],  # outcome: success / rate_limited / error / client_error
+)
+
+LLM_FAILOVERS = Counter(
+    "llm_failovers_total",
+    "发往备用 Provider 的请求数",
+    ["reason"],  # hedge：主 Provider 超过对冲延迟 / error：主 Provider 失败 / circuit_open：主 Provider 熔断
+)
+
+LLM_HEDGE_WINS = Counter(
+    "llm_hedge_wins_total",
+    "对冲请求中先返回的一方",
+    ["winner"],  # primary / secondary
+)
+
+PROMPT_COMPRESSION_TOKENS = Counter(
+    "prompt_compression_tokens_total",
+    "提示词压缩前后的正文 token 数（节省 = original - compressed）",
+    ["stage"],  # original / compressed
+)
+
+INGEST_STAGE_DURATION = Histogram(
+    "ingest_stage_duration_seconds",
+    "PDF 摄取各阶段耗时",
+    ["stage"],  # parse / chunk / dedup / embed / index
+    buckets=LATENCY_BUCKETS,
+)
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "缓存查询次数（命中率 = hit / (hit + miss)）",
+    ["cache", "result"],  # result: hit / miss
+)
+
+
+@contextmanager
+def observe_stage(stage: str) -> Iterator[None]:
+    """记录摄取阶段耗时"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        INGEST_STAGE_DURATION.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+def record_cache(cache: str, hits: int = 0, misses: int = 0) -> None:
+    """记录缓存命中 / 未命中次数"""
+    if hits:
+        CACHE_REQUESTS.labels(cache=cache, result="hit").inc(hits)
+    if misses:
+        CACHE_REQUESTS.labels(cache=cache, result="miss").inc(misses)
+
+
+def record_llm_usage(provider: str, model: str, usage: dict | None) -> None:
+    """记录 usage 字段（OpenAI 与 Anthropic 格式）
+
+    prompt 为提示词总 token 数；其中命中 / 写入提供方提示词缓存的部分另记为
+    cache_read / cache_write
+    """
+    if not usage:
+        return
+    if "input_tokens" in usage:
+        cache_read = usage.get("cache_read_input_tokens") or 0
+        cache_write = usage.get("cache_creation_input_tokens") or 0
+        prompt = usage.get("input_tokens", 0) + cache_read + cache_write
+        completion = usage.get("output_tokens", 0)
+    else:
+        cache_read = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+        cache_write = 0
+        prompt = usage.get("prompt_tokens", 0)
+        completion = usage.get("completion_tokens", 0)
+
+    for kind, value in (
+        ("prompt", prompt),
+        ("completion", completion),
+        ("cache_read", cache_read),
+        ("cache_write", cache_write),
+    ):
+        if value:
+            LLM_TOKENS.labels(provider=provider, model=model, kind=kind).inc(value)
+
+
+class CeleryQueueCollector:
+    """Celery 队列长度采集器（抓取时实时读取 Redis broker 的队列长度）"""
+
+    def __init__(self, broker_url: str, queues: tuple[str, ...] = ("celery",)):
+        self.broker_url = broker_url
+        self.queues = queues
+
+    def collect(self):
+        gauge = GaugeMetricFamily(
+            "celery_queue_length", "Celery 队列中等待的任务数", labels=["queue"]
+        )
+        try:
+            import redis
+
+            client = redis.from_url(self.broker_url, socket_connect_timeout=0.5, socket_timeout=0.5)
+            for queue in self.queues:
+                gauge.add_metric([queue], client.llen(queue))
+        except Exception:
+            # broker 不可用时不输出样本，避免抓取失败
+            pass
+        yield gauge
+
+
+def _multiprocess_registry() -> CollectorRegistry | None:
+    """多进程模式下聚合各进程写入共享目录的指标"""
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return None
+
+    from prometheus_client import multiprocess
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+_queue_collector_registered = False
+
+
+def register_queue_collector() -> None:
+    """注册 Celery 队列长度采集器（只注册一次）"""
+    global _queue_collector_registered
+    if _queue_collector_registered or not settings.celery_broker_url.startswith("redis"):
+        return
+    REGISTRY.register(CeleryQueueCollector(settings.celery_broker_url))
+    _queue_collector_registered = True
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """生成 Prometheus 文本格式的指标"""
+    registry = _multiprocess_registry()
+    if registry is not None:
+        registry.register(CeleryQueueCollector(settings.celery_broker_url))
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    register_queue_collector()
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def start_worker_metrics_server(port: int) -> None:
+    """在 Celery Worker 中启动独立的指标 HTTP 服务"""
+    registry = _multiprocess_registry() or REGISTRY
+    start_http_server(port, registry=registry)
+    print(f"📈 Worker metrics on :{port}/metrics")
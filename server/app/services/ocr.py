@@ -0,0 +1,261 @@
+"""扫描页 OCR 服务
+
+扫描版教材的页面只有整页图片，文本层为空，解析后不会产生任何分块。
+解析器先逐页检测"无文本且被图片覆盖"的页面，只把这些页面渲染成图片交给 OCR：
+
+- OCREngine：可插拔的识别引擎接口，默认使用本地 Tesseract（需安装 pytesseract 和 tesseract）
+- OCRPipeline：按页面图像哈希查询缓存，未命中的页面提交到有界进程池识别，
+  同一时间在途的页面数有上限，渲染好的图片不会在内存中堆积
+
+引擎不可用时只打印警告并跳过 OCR，不影响文本型 PDF 的解析。
+"""
+
+import hashlib
+from concurrent.futures import (
+    ALL_COMPLETED,
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    wait,
+)
+from typing import Any, Callable, Iterable, Protocol
+
+from app.config import get_settings
+from app.services.blob_store import BlobNotFoundError, BlobStore, get_blob_store, get_json, put_json
+
+settings = get_settings()
+
+# PDF 坐标单位为 pt（1/72 英寸）
+POINTS_PER_INCH = 72.0
+
+CACHE_PREFIX = "ocr"
+
+
+class OCREngine(Protocol):
+    """OCR 引擎接口
+
+    实例会被序列化后发送到进程池，需可 pickle（不要在属性中持有连接或句柄）
+    """
+
+    name: str
+
+    def recognize(self, image: bytes) -> list[dict[str, Any]]:
+        """
+        识别页面图片
+
+        Args:
+            image: PNG 图片字节
+
+        Returns:
+            [{"text": str, "bbox": [x0, y0, x1, y1], "font_size": float}, ...]
+            坐标和字号均为图片像素
+        """
+        ...
+
+
+class TesseractEngine:
+    """本地 Tesseract 引擎（pytesseract）"""
+
+    def __init__(self, languages: str = "chi_sim+eng", min_confidence: float = 30.0):
+        import pytesseract
+
+        pytesseract.get_tesseract_version()  # 未安装 tesseract 时在此处失败
+        self.languages = languages
+        self.min_confidence = min_confidence
+        self.name = f"tesseract:{languages}"
+
+    def recognize(self, image: bytes) -> list[dict[str, Any]]:
+        import io
+
+        import pytesseract
+        from PIL import Image
+
+        data = pytesseract.image_to_data(
+            Image.open(io.BytesIO(image)),
+            lang=self.languages,
+            output_type=pytesseract.Output.DICT,
+        )
+
+        # 按 (block, paragraph) 聚合单词，再按行拼接
+        paragraphs: dict[tuple[int, int], dict[str, Any]] = {}
+        for i, word in enumerate(data["text"]):
+            word = word.strip()
+            if not word or float(data["conf"][i]) < self.min_confidence:
+                continue
+            x0, y0 = data["left"][i], data["top"][i]
+            x1, y1 = x0 + data["width"][i], y0 + data["height"][i]
+            para = paragraphs.setdefault(
+                (data["block_num"][i], data["par_num"][i]),
+                {"lines": {}, "bbox": [x0, y0, x1, y1], "heights": []},
+            )
+            para["lines"].setdefault(data["line_num"][i], []).append(word)
+            bbox = para["bbox"]
+            bbox[0], bbox[1] = min(bbox[0], x0), min(bbox[1], y0)
+            bbox[2], bbox[3] = max(bbox[2], x1), max(bbox[3], y1)
+            para["heights"].append(data["height"][i])
+
+        blocks = []
+        for para in paragraphs.values():
+            heights = sorted(para["heights"])
+            blocks.append({
+                "text": " ".join(" ".join(words) for words in para["lines"].values()),
+                "bbox": para["bbox"],
+                # 单词框高度近似字号，取中位数排除标点等异常值
+                "font_size": float(heights[len(heights) // 2]),
+            })
+        return blocks
+
+
+def _recognize_page(engine: OCREngine, image: bytes, scale: float) -> list[dict[str, Any]]:
+    """进程池中执行：识别并把像素坐标换算为 PDF 坐标"""
+    return [
+        {
+            "text": block["text"],
+            "bbox": [round(v * scale, 2) for v in block["bbox"]],
+            "font_size": round(block["font_size"] * scale, 1),
+        }
+        for block in engine.recognize(image)
+    ]
+
+
+def page_image_hash(image: bytes) -> str:
+    """页面图像内容哈希（缓存 key）"""
+    return hashlib.sha256(image).hexdigest()
+
+
+class OCRPipeline:
+    """OCR 流水线：缓存 + 有界进程池"""
+
+    def __init__(
+        self,
+        engine: OCREngine,
+        dpi: int = 300,
+        executor: Executor | None = None,
+        max_in_flight: int = 4,
+        cache: BlobStore | None = None,
+    ):
+        """
+        Args:
+            engine: OCR 引擎
+            dpi: 页面渲染分辨率
+            executor: 进程池，为 None 时在当前进程内串行识别
+            max_in_flight: 同时在途（已渲染未完成）的页面数上限
+            cache: 识别结果缓存，为 None 时不缓存
+        """
+        self.engine = engine
+        self.dpi = dpi
+        self.executor = executor
+        self.max_in_flight = max(1, max_in_flight)
+        self.cache = cache
+
+    def _cache_key(self, image_hash: str) -> str:
+        return f"{CACHE_PREFIX}/{self.engine.name}/{self.dpi}/{image_hash}.json"
+
+    def _cache_get(self, key: str) -> list[dict[str, Any]] | None:
+        if self.cache is None:
+            return None
+        try:
+            return get_json(self.cache, key)
+        except BlobNotFoundError:
+            return None
+
+    def _cache_put(self, key: str, blocks: list[dict[str, Any]]) -> None:
+        if self.cache is not None:
+            put_json(self.cache, key, blocks)
+
+    def run(
+        self,
+        pages: Iterable[tuple[int, bytes]],
+        total: int,
+        on_page: Callable[[int, int], None] | None = None,
+    ) -> dict[int, list[dict[str, Any]]]:
+        """
+        识别页面
+
+        Args:
+            pages: (页码, PNG 图片) 迭代器，按需渲染，最多预取 max_in_flight 页
+            total: 页面总数（用于进度）
+            on_page: 每完成一页的回调 (已完成页数, 总页数)
+
+        Returns:
+            {页码: 文本块列表}（PDF 坐标）
+        """
+        scale = POINTS_PER_INCH / self.dpi
+        results: dict[int, list[dict[str, Any]]] = {}
+        pending: dict[Future, tuple[int, str]] = {}
+
+        def finish(page_number: int, blocks: list[dict[str, Any]]) -> None:
+            results[page_number] = blocks
+            if on_page is not None:
+                on_page(len(results), total)
+
+        def drain(block_until_one: bool) -> None:
+            if not pending:
+                return
+            done, _ = wait(
+                pending, return_when=FIRST_COMPLETED if block_until_one else ALL_COMPLETED
+            )
+            for future in done:
+                page_number, key = pending.pop(future)
+                blocks = future.result()
+                self._cache_put(key, blocks)
+                finish(page_number, blocks)
+
+        for page_number, image in pages:
+            key = self._cache_key(page_image_hash(image))
+            cached = self._cache_get(key)
+            if cached is not None:
+                finish(page_number, cached)
+                continue
+
+            if self.executor is None:
+                blocks = _recognize_page(self.engine, image, scale)
+                self._cache_put(key, blocks)
+                finish(page_number, blocks)
+                continue
+
+            pending[self.executor.submit(_recognize_page, self.engine, image, scale)] = (
+                page_number, key
+            )
+            # 在途页数达到上限时先等一页完成，再渲染下一页
+            if len(pending) >= self.max_in_flight:
+                drain(block_until_one=True)
+
+        drain(block_until_one=False)
+        return results
+
+
+def _build_engine() -> OCREngine | None:
+    if settings.ocr_engine == "tesseract":
+        try:
+            return TesseractEngine(settings.ocr_languages)
+        except Exception as e:
+            print(f"⚠️ Tesseract 不可用，扫描页将不做 OCR: {e}")
+            return None
+    raise ValueError(f"Unsupported OCR engine: {settings.ocr_engine}")
+
+
+# 单例（进程池在 Worker 进程内复用，避免每个任务重新拉起子进程）
+_ocr_pipeline: OCRPipeline | None = None
+_ocr_pipeline_ready = False
+
+
+def get_ocr_pipeline() -> OCRPipeline | None:
+    """获取 OCR 流水线单例，未启用或引擎不可用时返回 None"""
+    global _ocr_pipeline, _ocr_pipeline_ready
+    if not _ocr_pipeline_ready:
+        _ocr_pipeline_ready = True
+        engine = _build_engine() if settings.ocr_enabled else None
+        if engine is not None:
+            executor = None
+            if settings.ocr_workers > 0:
+                executor = ProcessPoolExecutor(max_workers=settings.ocr_workers)
+            _ocr_pipeline = OCRPipeline(
+                engine,
+                dpi=settings.ocr_dpi,
+                executor=executor,
+                max_in_flight=2 * max(1, settings.ocr_workers),
+                cache=get_blob_store(),
+            )
+    return _ocr_pipeline
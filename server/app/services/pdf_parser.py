@@ -3,12 +3,41 @@
 使用 pymupdf (fitz) 进行 PDF 解析，提取文本、版式元素和结构信息
 """
 
+import hashlib
+import math
 import re
+from collections import defaultdict
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Literal
 
 import fitz  # pymupdf
 
+from app.config import get_settings
+from app.services.ocr import OCRPipeline, get_ocr_pipeline
+from app.services.tokenizer import Tokenizer, get_tokenizer, truncate_tokens
+from app.services.tracing import set_span_attributes, traced
+
+settings = get_settings()
+
+# greedy：按长度贪心拼接（带重叠）；section：按标题树分节，节内按句子拆分
+ChunkMode = Literal["greedy", "section"]
+
+# 参与层级划分的标题字号档数，更小的标题归入最深一级
+MAX_HEADING_DEPTH = 3
+
+# 整节略超目标长度时仍保持完整（允许超出的比例），避免把一节切出很小的尾块
+SECTION_SLACK = 0.25
+
+# 页眉页脚 / 水印识别：同一位置、同一文本出现在多少页以上视为重复块
+REPEAT_MIN_PAGES = 3
+REPEAT_PAGE_RATIO = 0.3  # 非页边区域（如水印）需出现在至少该比例的页面上
+REPEAT_POSITION_TOLERANCE = 4.0  # 纵坐标量化粒度（pt）
+REPEAT_MAX_GAP = 2  # 页边块视为「连续出现」时相邻出现页的最大页码间隔（兼容奇偶页页眉）
+REPEAT_LARGE_FONT = 1.2  # 字号超过正文字号该倍数的块视为标题，不做数字替换
+
+
+_LIST_ITEM = re.compile(r"^\s*[\d\-•·]\s+")
+
 
 class PageBlock:
     """页面块"""
@@ -34,17 +63,97 @@ class PageBlock:
         }
 
 
+_INDIRECT_REF = re.compile(rb"(\d+) \d+ R")
+
+
+def _page_resources(doc: fitz.Document, page: fitz.Page) -> tuple[str, str]:
+    """页面的 /Resources（未直接定义时沿 /Parent 继承）"""
+    xref = page.xref
+    for _ in range(32):
+        kind, value = doc.xref_get_key(xref, "Resources")
+        if kind != "null":
+            return kind, value
+        kind, parent = doc.xref_get_key(xref, "Parent")
+        if kind != "xref":
+            break
+        xref = int(parent.split()[0])
+    return "null", ""
+
+
+def _hash_object(doc: fitz.Document, source: bytes, digest: Any, seen: set[int]) -> None:
+    """
+    递归哈希对象引用的所有间接对象（字典 + 原始流字节）
+
+    对象编号在新旧 PDF 中可能不同，哈希前把引用替换为占位符，
+    子对象按引用出现顺序依次哈希，结构相同、内容相同即哈希相同。
+    """
+    digest.update(_INDIRECT_REF.sub(b"R", source))
+    for match in _INDIRECT_REF.finditer(source):
+        xref = int(match.group(1))
+        if xref in seen or not 0 < xref < doc.xref_length():
+            continue
+        seen.add(xref)
+        _hash_object(doc, doc.xref_object(xref, compressed=True).encode(), digest, seen)
+        if doc.xref_is_stream(xref):
+            digest.update(doc.xref_stream_raw(xref) or b"")
+
+
+def page_content_hash(doc: fitz.Document, page: fitz.Page) -> str:
+    """
+    页面内容哈希
+
+    只读取页面尺寸、内容流和 /Resources 递归引用的对象（图片、嵌套的 Form XObject、
+    字体及字体文件）的原始（未解压）字节，不做文本提取或渲染，比解析一页便宜得多；
+    同一页面在新旧两个 PDF 中哈希相同即视为未修改。
+    """
+    digest = hashlib.sha256()
+    digest.update(repr(tuple(page.rect)).encode())
+    for xref in page.get_contents():
+        digest.update(doc.xref_stream_raw(xref) or b"")
+
+    kind, value = _page_resources(doc, page)
+    if kind != "null":
+        _hash_object(doc, value.encode(), digest, set())
+    return digest.hexdigest()
+
+
+def _missing_ocr(page: dict[str, Any]) -> bool:
+    """扫描页但没有 OCR 结果（早期版本没有 scanned 字段，按无文本块判断）"""
+    scanned = page.get("scanned", not page.get("blocks"))
+    return scanned and not page.get("ocr")
+
+
 class PDFParser:
     """PDF 解析器"""
 
-    def __init__(self):
+    def __init__(self, ocr: OCRPipeline | None = None):
         # 标题识别阈值（字体大小）
         self.heading_font_threshold = 14.0
+        # 为 None 时在遇到扫描页后才初始化全局 OCR 流水线（文本型 PDF 不付出任何代价）
+        self._ocr = ocr
 
-    def parse_pdf(self, file_path: Path) -> dict[str, Any]:
+    @traced("pdf.parse")
+    def parse_pdf(
+        self,
+        file_path: Path,
+        on_page: Callable[[int, int], None] | None = None,
+        on_ocr_page: Callable[[int, int], None] | None = None,
+        previous_pages: list[dict[str, Any]] | None = None,
+    ) -> dict[str, Any]:
         """
         解析 PDF 文件
 
+        先逐页提取文本层，同时检测无文本的扫描页；全部页面提取完后再只对扫描页做 OCR。
+        传入上一版本的页面数据时，内容哈希相同的页面直接复用上次的解析结果（含 OCR），
+        页面插入或删除导致页码变化时同样可以命中；上次未做 OCR 的扫描页（OCR 未启用或
+        Tesseract 不可用）不复用，以便 OCR 可用后重新识别。
+
+        Args:
+            file_path: PDF 文件路径
+            on_page: 每解析完一页的回调 (已解析页数, 总页数)，用于上报进度
+            on_ocr_page: 每识别完一个扫描页的回调 (已识别页数, 待识别页数)
+            previous_pages: 上一版本解析结果中的 pages（需带 hash）
+
         Returns:
             {
                 "filename": str,
@@ -52,20 +161,79 @@ class PDFParser:
                 "pages": [
                     {
                         "page_number": 1,
+                        "height": 842.0,
+                        "hash": "9f86d0...",  # 页面内容哈希（增量重新摄取时比对）
+                        "scanned": False,  # 是否为需要 OCR 的扫描页
+                        "ocr": False,  # 文本块是否来自 OCR
                         "blocks": [
                             {"type": "heading", "text": "...", "bbox": [...], "font_size": 16},
                             {"type": "paragraph", "text": "...", "bbox": [...], "font_size": 12}
                         ]
                     }
-                ]
+                ],
+                "reused_pages": int  # 复用上一版本解析结果的页数
             }
         """
+        reusable = {
+            page["hash"]: page
+            for page in previous_pages or []
+            if page.get("hash") and not _missing_ocr(page)
+        }
         doc = fitz.open(file_path)
+        total_pages = doc.page_count
         pages = []
+        scanned_pages = []
+
+        reused = 0
 
         for page_num, page in enumerate(doc, 1):
-            blocks = self._extract_blocks(page)
-            pages.append({"page_number": page_num, "blocks": [b.to_dict() for b in blocks]})
+            content_hash = page_content_hash(doc, page)
+            previous = reusable.get(content_hash)
+            if previous is not None:
+                reused += 1
+                pages.append({**previous, "page_number": page_num})
+            else:
+                blocks = self._extract_blocks(page)
+                scanned = self._needs_ocr(page, blocks)
+                if scanned:
+                    scanned_pages.append(page_num)
+                pages.append({
+                    "page_number": page_num,
+                    "height": page.rect.height,
+                    "hash": content_hash,
+                    "scanned": scanned,
+                    "ocr": False,
+                    "blocks": [b.to_dict() for b in blocks],
+                })
+            if on_page is not None:
+                on_page(page_num, total_pages)
+
+        ocr = (self._ocr or get_ocr_pipeline()) if scanned_pages else None
+        if ocr is not None:
+            # 按需渲染，OCR 流水线控制在途页数
+            images = (
+                (page_num, doc[page_num - 1].get_pixmap(dpi=ocr.dpi).tobytes("png"))
+                for page_num in scanned_pages
+            )
+            recognized = ocr.run(images, total=len(scanned_pages), on_page=on_ocr_page)
+            for page_num, ocr_blocks in recognized.items():
+                page_data = pages[page_num - 1]
+                page_data["ocr"] = True
+                page_data["blocks"] = [
+                    PageBlock(
+                        block_type=self._classify_block(block["text"], block["font_size"]),
+                        text=block["text"],
+                        bbox=tuple(block["bbox"]),
+                        font_size=block["font_size"],
+                    ).to_dict()
+                    for block in ocr_blocks
+                ]
+        set_span_attributes(**{
+            "pdf.total_pages": total_pages,
+            "pdf.scanned_pages": len(scanned_pages),
+            "pdf.ocr_pages": len(scanned_pages) if ocr is not None else 0,
+            "pdf.reused_pages": reused,
+        })
 
         doc.close()
 
@@ -73,6 +241,7 @@ class PDFParser:
             "filename": file_path.name,
             "total_pages": len(pages),
             "pages": pages,
+            "reused_pages": reused,
         }
 
     def _extract_blocks(self, page: fitz.Page) -> list[PageBlock]:
@@ -118,6 +287,21 @@ class PDFParser:
         
         return blocks
 
+    @staticmethod
+    def _needs_ocr(page: fitz.Page, blocks: list[PageBlock]) -> bool:
+        """检测扫描页：文本层几乎为空，且页面大部分被图片覆盖"""
+        if sum(len(block.text) for block in blocks) >= settings.ocr_min_text_chars:
+            return False
+
+        page_area = page.rect.get_area()
+        if page_area <= 0:
+            return False
+        covered = sum(
+            fitz.Rect(info["bbox"]).intersect(page.rect).get_area()
+            for info in page.get_image_info()
+        )
+        return covered / page_area >= settings.ocr_min_image_coverage
+
     def _classify_block(self, text: str, font_size: float) -> str:
         """分类块类型"""
         # 根据字体大小判断是否为标题
@@ -125,7 +309,7 @@ class PDFParser:
             return "heading"
         
         # 判断是否为列表
-        if re.match(r"^\s*[\d\-•·]\s+", text):
+        if _LIST_ITEM.match(text):
             return "list"
         
         return "paragraph"
@@ -134,21 +318,56 @@ class PDFParser:
 class TextCleaner:
     """文本清洗器"""
 
+    # 预编译的清洗规则（clean_text 与 clean_batch 共用，保证两者结果一致）
+    # 以字面量开头的模式可走正则引擎的前缀快速查找，比以断言开头的模式快数倍
+    _WHITESPACE = re.compile(r"\s+")
+    # 空白已折叠为单个空格，故只需匹配夹在两个汉字之间的空格
+    _CJK_GAP = re.compile(r" (?<=[\u4e00-\u9fff] )(?=[\u4e00-\u9fff])")
+    _PAGE_NUMBER = re.compile(r"^\d+\s*$")
+    _PAGE_LABEL = re.compile(r"^第\s*\d+\s*页")
+    _DIGITS_ONLY = re.compile(r"^\d+$")
+
+    # 批量模式：以 \x00 分隔各块拼接成一个缓冲区，行首 / 行尾锚点改为分隔符
+    _SEPARATOR = "\x00"
+    _BATCH_PAGE_NUMBER = re.compile(r"\x00\d+\s*(?=\x00)")
+    _BATCH_PAGE_LABEL = re.compile(r"\x00第\s*\d+\s*页")
+
     @staticmethod
     def clean_text(text: str) -> str:
         """清洗文本"""
         # 去除多余空白
-        text = re.sub(r"\s+", " ", text)
+        text = TextCleaner._WHITESPACE.sub(" ", text)
         
         # 合并断行（中文）
-        text = re.sub(r"(?<=[\u4e00-\u9fff])\s+(?=[\u4e00-\u9fff])", "", text)
+        text = TextCleaner._CJK_GAP.sub("", text)
         
         # 去除页眉页脚常见模式
-        text = re.sub(r"^\d+\s*$", "", text)  # 单独的页码
-        text = re.sub(r"^第\s*\d+\s*页", "", text)  # "第X页"
+        text = TextCleaner._PAGE_NUMBER.sub("", text)  # 单独的页码
+        text = TextCleaner._PAGE_LABEL.sub("", text)  # "第X页"
         
         return text.strip()
 
+    @classmethod
+    def clean_batch(cls, texts: list[str]) -> list[str]:
+        """
+        批量清洗，结果与逐个调用 clean_text 相同
+
+        所有文本以分隔符拼接后每条规则只执行一次，省去逐块调用的开销；
+        分隔符不是空白也不是汉字，规则不会跨块匹配，清洗后按分隔符切回各块。
+        """
+        if not texts:
+            return []
+        sep = cls._SEPARATOR
+        if any(sep in text for text in texts):
+            return [cls.clean_text(text) for text in texts]
+
+        buffer = sep + sep.join(texts) + sep
+        buffer = cls._WHITESPACE.sub(" ", buffer)
+        buffer = cls._CJK_GAP.sub("", buffer)
+        buffer = cls._BATCH_PAGE_NUMBER.sub(sep, buffer)
+        buffer = cls._BATCH_PAGE_LABEL.sub(sep, buffer)
+        return [text.strip() for text in buffer[1:-1].split(sep)]
+
     @staticmethod
     def is_header_footer(text: str, page_height: float, bbox: tuple) -> bool:
         """判断是否为页眉页脚"""
@@ -161,82 +380,186 @@ class TextCleaner:
             return True
         
         # 单独的页码
-        if re.match(r"^\d+$", text.strip()):
+        if TextCleaner._DIGITS_ONLY.match(text.strip()):
             return True
         
         return False
 
 
+_DIGITS = re.compile(r"\d+")
+
+
+def _repeat_key(block: dict[str, Any], body_font_size: float = 0.0) -> tuple[int, int, str]:
+    """
+    位置哈希键：(量化后的上下边界, 规范化文本)
+
+    不含横坐标，以兼容奇偶页左右对齐不同的页眉；页码类短文本中的数字统一替换，
+    使「— 12 —」「第 3 页」在各页得到相同的键。标题和大字号块不做替换，
+    避免「第1章」「第2章」等章首标题被当成同一个键。
+    """
+    bbox = block.get("bbox") or (0, 0, 0, 0)
+    text = "".join(block["text"].split())
+    font_size = block.get("font_size") or 0
+    is_title = block.get("type") == "heading" or (
+        body_font_size > 0 and font_size > body_font_size * REPEAT_LARGE_FONT
+    )
+    if len(text) <= 16 and not is_title:  # 只有短文本可能是页码，长段落跳过数字替换
+        without_digits = _DIGITS.sub("#", text)
+        if len(without_digits.replace("#", "")) <= 4:
+            text = without_digits
+    return (
+        round(bbox[1] / REPEAT_POSITION_TOLERANCE),
+        round(bbox[3] / REPEAT_POSITION_TOLERANCE),
+        text,
+    )
+
+
+def _body_font_size(pages_data: list[dict[str, Any]]) -> float:
+    """正文字号：所有块字号的中位数（无字号信息时为 0）"""
+    sizes = sorted(
+        block["font_size"]
+        for page in pages_data
+        for block in page.get("blocks", [])
+        if block.get("font_size")
+    )
+    return sizes[len(sizes) // 2] if sizes else 0.0
+
+
+def _longest_run(pages: set[int]) -> int:
+    """出现页中最长的连续段长度（相邻出现页间隔不超过 REPEAT_MAX_GAP）"""
+    longest = run = 0
+    previous = None
+    for number in sorted(pages):
+        run = run + 1 if previous is not None and number - previous <= REPEAT_MAX_GAP else 1
+        longest = max(longest, run)
+        previous = number
+    return longest
+
+
+def strip_repeated_blocks(pages_data: list[dict[str, Any]]) -> tuple[list[dict[str, Any]], int]:
+    """
+    去除跨页重复的页眉、页脚、页码和水印
+
+    第一遍按位置哈希键统计每个键出现的页数，第二遍线性过滤。
+    位于页边区域（TextCleaner.is_header_footer）的块在 REPEAT_MIN_PAGES 个连续页上出现
+    即视为重复（可识别随章节变化的页眉），分散出现的（如各章首页的章标题）不算；
+    其余情况需达到 REPEAT_PAGE_RATIO 的页面比例。
+
+    Returns:
+        (去重后的页面数据, 去除的块数)
+    """
+    total_pages = len(pages_data)
+    if total_pages < REPEAT_MIN_PAGES:
+        return pages_data, 0
+
+    body_font_size = _body_font_size(pages_data)
+    keyed_pages = []
+    pages_by_key: dict[tuple, set[int]] = defaultdict(set)
+    for page in pages_data:
+        keys = [_repeat_key(block, body_font_size) for block in page.get("blocks", [])]
+        keyed_pages.append(keys)
+        for key in keys:
+            pages_by_key[key].add(page["page_number"])
+
+    body_threshold = max(REPEAT_MIN_PAGES, math.ceil(total_pages * REPEAT_PAGE_RATIO))
+    candidates = {key for key, pages in pages_by_key.items() if len(pages) >= REPEAT_MIN_PAGES}
+    if not candidates:
+        return pages_data, 0
+    consecutive = {key for key in candidates if _longest_run(pages_by_key[key]) >= REPEAT_MIN_PAGES}
+
+    removed = 0
+    stripped = []
+    for page, keys in zip(pages_data, keyed_pages):
+        height = page.get("height")
+        kept = []
+        for block, key in zip(page.get("blocks", []), keys):
+            if key in candidates:
+                in_margin = height is not None and TextCleaner.is_header_footer(
+                    block["text"], height, tuple(block["bbox"])
+                )
+                if (in_margin and key in consecutive) or len(pages_by_key[key]) >= body_threshold:
+                    removed += 1
+                    continue
+            kept.append(block)
+        stripped.append({**page, "blocks": kept})
+    return stripped, removed
+
+
+@traced("pdf.chunk")
 async def clean_and_chunk(
     pages_data: list[dict[str, Any]],
     target_tokens: int = 400,
     overlap: int = 50,
+    tokenizer: Tokenizer | None = None,
+    mode: ChunkMode | None = None,
+    strip_repeated: bool = True,
 ) -> list[dict[str, Any]]:
     """
     清洗和分块
 
     Args:
         pages_data: 页面数据
-        target_tokens: 目标 token 数（约等于字符数的 60%）
-        overlap: 重叠 token 数
+        target_tokens: 目标 token 数（按 tokenizer 计数）
+        overlap: 重叠 token 数（仅 greedy 模式）
+        tokenizer: 默认使用全局 tokenizer
+        mode: 分块模式，默认取 settings.chunking_mode
+        strip_repeated: 是否先去除跨页重复的页眉页脚和水印
 
     Returns:
-        分块后的文本列表
+        分块后的文本列表（section 模式额外带 section_path / section_title）
     """
-    cleaner = TextCleaner()
+    tokenizer = tokenizer or get_tokenizer()
+    mode = mode or settings.chunking_mode
+    if strip_repeated:
+        pages_data, _ = strip_repeated_blocks(pages_data)
+    all_blocks = _collect_blocks(pages_data, tokenizer, keep_headings=mode == "section")
+
+    if mode == "section":
+        return _section_chunk(all_blocks, target_tokens, tokenizer)
+
     chunks = []
     current_chunk = []
     current_length = 0
     chunk_id = 0
     
-    # 提取所有文本块
-    all_blocks = []
-    for page in pages_data:
-        page_number = page["page_number"]
-        for block in page.get("blocks", []):
-            # 清洗文本
-            text = cleaner.clean_text(block["text"])
-            if not text:
-                continue
-            
-            # 跳过页眉页脚（简化判断）
-            if len(text) < 5:
-                continue
-            
-            all_blocks.append({
-                "text": text,
-                "type": block["type"],
-                "page": page_number,
-            })
-    
     # 分块
     for block in all_blocks:
         text = block["text"]
-        block_length = len(text)
+        block_length = block["tokens"]
         
         # 如果当前块太大，直接作为独立 chunk
         if block_length > target_tokens * 2:
             if current_chunk:
-                chunks.append(_create_chunk(chunk_id, current_chunk))
+                chunks.append(_create_chunk(chunk_id, current_chunk, tokenizer))
                 chunk_id += 1
                 current_chunk = []
                 current_length = 0
             
             # 大块拆分
-            chunks.extend(_split_large_block(text, block["page"], chunk_id, target_tokens))
+            chunks.extend(
+                _split_large_block(text, block["page"], chunk_id, target_tokens, tokenizer)
+            )
             chunk_id = len(chunks)
             continue
         
         # 如果加入当前块会超过目标长度
         if current_length + block_length > target_tokens and current_chunk:
-            chunks.append(_create_chunk(chunk_id, current_chunk))
+            chunks.append(_create_chunk(chunk_id, current_chunk, tokenizer))
             chunk_id += 1
             
             # 保留重叠部分
             if overlap > 0 and current_chunk:
-                overlap_text = current_chunk[-1]["text"][-overlap:]
-                current_chunk = [{"text": overlap_text, "type": "paragraph", "page": block["page"]}]
-                current_length = len(overlap_text)
+                overlap_text = truncate_tokens(
+                    current_chunk[-1]["text"], overlap, from_end=True, tokenizer=tokenizer
+                )
+                overlap_tokens = tokenizer.count(overlap_text)
+                current_chunk = [{
+                    "text": overlap_text,
+                    "type": "paragraph",
+                    "page": block["page"],
+                    "tokens": overlap_tokens,
+                }]
+                current_length = overlap_tokens
             else:
                 current_chunk = []
                 current_length = 0
@@ -247,27 +570,233 @@ async def clean_and_chunk(
     
     # 处理最后一个 chunk
     if current_chunk:
-        chunks.append(_create_chunk(chunk_id, current_chunk))
+        chunks.append(_create_chunk(chunk_id, current_chunk, tokenizer))
     
     return chunks
 
 
-def _create_chunk(chunk_id: int, blocks: list[dict]) -> dict[str, Any]:
-    """创建 chunk"""
+def _collect_blocks(
+    pages_data: list[dict[str, Any]],
+    tokenizer: Tokenizer,
+    keep_headings: bool = False,
+) -> list[dict[str, Any]]:
+    """清洗并提取所有文本块（附带 token 数）"""
+    raw_blocks = [
+        (page["page_number"], block) for page in pages_data for block in page.get("blocks", [])
+    ]
+    # 整个文档一次批量清洗
+    cleaned = TextCleaner.clean_batch([block["text"] for _, block in raw_blocks])
+
+    all_blocks = []
+    for (page_number, block), text in zip(raw_blocks, cleaned):
+        if not text:
+            continue
+        
+        # 跳过页眉页脚（简化判断）；分节模式下短标题仍需保留
+        if len(text) < 5 and not (keep_headings and block["type"] == "heading"):
+            continue
+        
+        all_blocks.append({
+            "text": text,
+            "type": block["type"],
+            "page": page_number,
+            "font_size": block.get("font_size", 0),
+            "tokens": tokenizer.count(text),
+        })
+    return all_blocks
+
+
+class _Section:
+    """标题树节点（根节点 title 为 None）"""
+
+    def __init__(self, title: str | None, level: int, path: list[str]):
+        self.title = title
+        self.level = level
+        self.path = path
+        self.blocks: list[dict[str, Any]] = []  # 标题块 + 下一个标题之前的正文
+        self.children: list["_Section"] = []
+        self.total_tokens = 0
+
+    def all_blocks(self) -> list[dict[str, Any]]:
+        blocks = list(self.blocks)
+        for child in self.children:
+            blocks.extend(child.all_blocks())
+        return blocks
+
+    def compute_tokens(self) -> int:
+        self.total_tokens = sum(b["tokens"] for b in self.blocks) + sum(
+            child.compute_tokens() for child in self.children
+        )
+        return self.total_tokens
+
+
+def _heading_levels(blocks: list[dict[str, Any]]) -> dict[int, int]:
+    """按标题字号从大到小映射为层级 1..MAX_HEADING_DEPTH"""
+    sizes = sorted({round(b["font_size"]) for b in blocks if b["type"] == "heading"}, reverse=True)
+    return {size: min(i + 1, MAX_HEADING_DEPTH) for i, size in enumerate(sizes)}
+
+
+def _build_section_tree(blocks: list[dict[str, Any]]) -> _Section:
+    """根据标题块构建标题树"""
+    levels = _heading_levels(blocks)
+    root = _Section(title=None, level=0, path=[])
+    stack = [root]
+
+    for block in blocks:
+        if block["type"] != "heading":
+            stack[-1].blocks.append(block)
+            continue
+
+        level = levels.get(round(block["font_size"]), 1)
+        while stack[-1].level >= level:
+            stack.pop()
+        section = _Section(title=block["text"], level=level, path=stack[-1].path + [block["text"]])
+        section.blocks.append(block)
+        stack[-1].children.append(section)
+        stack.append(section)
+
+    root.compute_tokens()
+    return root
+
+
+def _pack_blocks(
+    blocks: list[dict[str, Any]],
+    target_tokens: int,
+    tokenizer: Tokenizer,
+) -> list[list[dict]]:
+    """节内按整块贪心打包，超长块按句子拆分"""
+    groups = []
+    current: list[dict] = []
+    current_tokens = 0
+
+    for block in blocks:
+        if block["tokens"] > target_tokens:
+            pieces = [
+                {**block, "text": piece["text"], "tokens": piece["tokens"]}
+                for piece in _split_large_block(
+                    block["text"], block["page"], 0, target_tokens, tokenizer
+                )
+            ]
+        else:
+            pieces = [block]
+
+        for piece in pieces:
+            # 标题不单独成块，总是与其后的第一段正文放在一起
+            only_headings = all(b["type"] == "heading" for b in current)
+            if current_tokens + piece["tokens"] > target_tokens and current and not only_headings:
+                groups.append(current)
+                current = []
+                current_tokens = 0
+            current.append(piece)
+            current_tokens += piece["tokens"]
+
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _emit_section(
+    section: _Section,
+    target_tokens: int,
+    tokenizer: Tokenizer,
+    out: list[tuple[list[str], list[dict]]],
+    prefix: list[dict] | None = None,
+) -> None:
+    """
+    输出一个节的分块
+
+    整节（含子节）放得下时作为一个分块；否则正文单独打包，
+    相邻的小子节合并到同一分块（路径取父节），超大的子节递归处理。
+    只有标题、尚无正文的待输出内容不单独成块，而是作为 prefix 并入下一个分块。
+    """
+    prefix = prefix or []
+    if section.total_tokens <= target_tokens * (1 + SECTION_SLACK):
+        out.append((section.path, prefix + section.all_blocks()))
+        return
+
+    group_blocks: list[dict] = []
+    group_tokens = 0
+    group_members: list[_Section] = []
+
+    body = prefix + section.blocks
+    body_tokens = sum(b["tokens"] for b in body)
+    if body_tokens <= target_tokens:
+        # 正文较短时与后续小子节合并，避免产生过碎的分块
+        group_blocks = body
+        group_tokens = body_tokens
+    else:
+        for blocks in _pack_blocks(body, target_tokens, tokenizer):
+            out.append((section.path, blocks))
+
+    def headings_only() -> bool:
+        return bool(group_blocks) and all(b["type"] == "heading" for b in group_blocks)
+
+    def flush() -> None:
+        nonlocal group_blocks, group_tokens, group_members
+        if group_blocks:
+            only_child = len(group_members) == 1 and group_blocks[0] is group_members[0].blocks[0]
+            out.append((group_members[0].path if only_child else section.path, group_blocks))
+        group_blocks, group_tokens, group_members = [], 0, []
+
+    for child in section.children:
+        if child.total_tokens > target_tokens * (1 + SECTION_SLACK):
+            carried = group_blocks if headings_only() else []
+            if carried:
+                group_blocks, group_tokens, group_members = [], 0, []
+            flush()
+            _emit_section(child, target_tokens, tokenizer, out, prefix=carried)
+            continue
+        if group_tokens + child.total_tokens > target_tokens and not headings_only():
+            flush()
+        group_blocks.extend(child.all_blocks())
+        group_tokens += child.total_tokens
+        group_members.append(child)
+    flush()
+
+
+def _section_chunk(
+    blocks: list[dict[str, Any]],
+    target_tokens: int,
+    tokenizer: Tokenizer,
+) -> list[dict[str, Any]]:
+    """按标题树分块，分块不跨越节边界（小节合并除外）"""
+    if not blocks:
+        return []
+
+    groups: list[tuple[list[str], list[dict]]] = []
+    _emit_section(_build_section_tree(blocks), target_tokens, tokenizer, groups)
+
+    chunks = []
+    for chunk_id, (path, group) in enumerate(groups):
+        chunk = _create_chunk(chunk_id, group, tokenizer)
+        chunk["section_path"] = path
+        chunk["section_title"] = path[-1] if path else None
+        chunks.append(chunk)
+    return chunks
+
+
+def _create_chunk(chunk_id: int, blocks: list[dict], tokenizer: Tokenizer) -> dict[str, Any]:
+    """创建 chunk（tokens 为合并后文本的实际计数，供下游提示词预算直接使用）"""
     text = "\n".join(b["text"] for b in blocks)
     pages = list(set(b["page"] for b in blocks))
     
     return {
         "chunk_id": f"chunk_{chunk_id:04d}",
         "text": text,
-        "tokens": len(text),  # 简化：使用字符数
+        "tokens": tokenizer.count(text),
         "pages": sorted(pages),
         "block_types": [b["type"] for b in blocks],
     }
 
 
-def _split_large_block(text: str, page: int, start_id: int, target_size: int) -> list[dict]:
-    """拆分大块"""
+def _split_large_block(
+    text: str,
+    page: int,
+    start_id: int,
+    target_size: int,
+    tokenizer: Tokenizer,
+) -> list[dict]:
+    """按句子拆分大块（target_size 为 token 数）"""
     chunks = []
     sentences = re.split(r"[。！？\n]", text)
     
@@ -278,7 +807,8 @@ def _split_large_block(text: str, page: int, start_id: int, target_size: int) ->
         if not sent.strip():
             continue
         
-        if current_len + len(sent) > target_size and current:
+        sent_tokens = tokenizer.count(sent + "。")
+        if current_len + sent_tokens > target_size and current:
             chunks.append({
                 "chunk_id": f"chunk_{start_id + len(chunks):04d}",
                 "text": "".join(current),
@@ -290,7 +820,7 @@ def _split_large_block(text: str, page: int, start_id: int, target_size: int) ->
             current_len = 0
         
         current.append(sent + "。")
-        current_len += len(sent) + 1
+        current_len += sent_tokens
     
     if current:
         chunks.append({
@@ -3,11 +3,14 @@
 负责将原始文本改写到目标阅读等级，并融入用户兴趣
 """
 
-from typing import Dict, List
+from typing import Callable, Dict, List
 
 from app.config import get_settings
+from app.prompts import registry
+from app.services.compressor import compress_for_prompt
 from app.services.llm_provider import get_llm_provider
 from app.services.readability_service import get_readability_service
+from app.services.tracing import traced
 
 settings = get_settings()
 
@@ -37,53 +40,25 @@ class PersonalizeService:
             must_keep_terms: 必须保留的术语列表
             
         Returns:
-            消息列表（用于 LLM Chat API）
+            消息列表（用于 LLM Chat API），附带 prompt_id
         """
-        terms_instruction = ""
-        if must_keep_terms:
-            terms_instruction = f"\n\n**必须保留的术语**（不可替换或简化）：\n{', '.join(must_keep_terms)}"
-        
-        interests_text = "、".join(interests) if interests else "日常生活"
-        
-        system_prompt = f"""你是一位优秀的教育内容改编专家，擅长将学习材料调整到适合不同年级学生的阅读水平。
-
-你的任务是：
-1. 将原始文本改写到适合 **{grade} 年级** 学生的阅读水平
-2. 在例子和类比中融入学生的兴趣领域：**{interests_text}**
-3. 保持学科范畴和核心概念不变
-4. 确保事实准确性，不编造内容
-5. 保持原文的逻辑结构和关键信息
-
-**改写原则**：
-- 使用 {grade} 年级学生能理解的词汇和句式
-- 将抽象概念用具体例子解释（最好来自学生的兴趣领域）
-- 句子长度适中，避免复杂的从句
-- 保留所有关键术语和概念{terms_instruction}
-
-**禁止事项**：
-- 不得删除或遗漏重要信息
-- 不得过度简化而丧失准确性
-- 不得编造事实或数据
-- 不得改变学科范畴"""
-
-        user_prompt = f"""请将以下文本改写到适合 {grade} 年级学生的阅读水平，并在适当的地方融入与「{interests_text}」相关的例子或类比。
-
-**原始文本**：
-{original_text}
-
-**改写后的文本**（请直接输出改写结果，不要添加额外说明）："""
-
-        return [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ]
+        return registry.render(
+            "personalize",
+            grade=grade,
+            interests="、".join(interests) if interests else "日常生活",
+            must_keep_terms=", ".join(must_keep_terms) if must_keep_terms else "无",
+            original_text=original_text,
+        )
     
+    @traced("personalize.rewrite")
     async def personalize_text(
         self,
         original_text: str,
         grade: int,
         interests: List[str],
         must_keep_terms: List[str] | None = None,
+        on_token: Callable[[int], None] | None = None,
+        compress: bool | None = None,
     ) -> Dict:
         """
         个性化改写文本
@@ -93,6 +68,8 @@ class PersonalizeService:
             grade: 目标年级
             interests: 用户兴趣列表
             must_keep_terms: 必须保留的术语列表
+            on_token: 流式生成时的回调（已生成 token 数），为 None 时不使用流式
+            compress: 是否压缩送入提示词的原文，为 None 时按 PROMPT_COMPRESSION_ENABLED
             
         Returns:
             {
@@ -107,13 +84,23 @@ class PersonalizeService:
             original_text, grade
         )
         
-        # 构建提示词
+        # 构建提示词（可选压缩原文，保留必须保留的术语）
         messages = self.build_personalize_prompt(
-            original_text, grade, interests, must_keep_terms
+            compress_for_prompt(original_text, must_keep_terms, enabled=compress),
+            grade,
+            interests,
+            must_keep_terms,
         )
         
-        # 调用 LLM 进行改写
-        personalized_text = await self.llm_provider.chat(messages, temperature=0.7)
+        # 调用 LLM 进行改写（需要上报进度时使用流式接口）
+        if on_token is None:
+            personalized_text = await self.llm_provider.chat(messages, temperature=0.7)
+        else:
+            parts = []
+            async for delta in self.llm_provider.stream_chat(messages, temperature=0.7):
+                parts.append(delta)
+                on_token(len(parts))
+            personalized_text = "".join(parts)
         
         # 分析改写后的可读性
         personalized_readability = self.readability_service.analyze_readability(
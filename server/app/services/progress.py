@@ -0,0 +1,259 @@
+"""任务进度事件通道
+
+Worker 侧：任务通过 ProgressPublisher 将细粒度进度（已解析页数、已向量化分块数、
+已生成 token 数等）发布到 Redis pub/sub，同时保存最近一次状态供后来的订阅者补齐。
+
+API 侧：ProgressHub 在每个进程内只维护一个 Redis 订阅连接（psubscribe），
+再将事件分发给本进程内的所有 SSE / WebSocket 订阅者，客户端无需轮询。
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+from typing import Any
+
+import orjson
+import redis
+
+from app.config import get_settings
+
+settings = get_settings()
+
+CHANNEL_PREFIX = "progress:"
+LAST_STATE_PREFIX = "progress:last:"
+
+# 终止状态：收到后订阅结束
+TERMINAL_STATUSES = ("success", "failure")
+
+# 订阅连接断开后的重连间隔（秒，指数退避）
+LISTENER_RETRY_MIN = 0.5
+LISTENER_RETRY_MAX = 30.0
+
+
+def progress_channel(task_id: str) -> str:
+    """任务进度频道名"""
+    return f"{CHANNEL_PREFIX}{task_id}"
+
+
+def last_state_key(task_id: str) -> str:
+    """任务最近一次进度的存储 key"""
+    return f"{LAST_STATE_PREFIX}{task_id}"
+
+
+class ProgressPublisher:
+    """任务进度发布器（Worker 侧，同步）
+
+    同一阶段内的进度事件按 min_interval 节流；阶段变化和终止状态总是立即发布。
+    Redis 不可用时静默降级，不影响任务本身。
+    """
+
+    def __init__(
+        self,
+        task_id: str,
+        client: Any = None,
+        min_interval: float | None = None,
+    ):
+        self.task_id = task_id
+        self.client = client if client is not None else redis.from_url(
+            settings.redis_url, socket_connect_timeout=1
+        )
+        self.min_interval = (
+            settings.progress_min_interval if min_interval is None else min_interval
+        )
+        self._last_stage: str | None = None
+        self._last_sent = 0.0
+
+    def publish(
+        self,
+        stage: str,
+        progress: int,
+        status: str = "started",
+        **detail: Any,
+    ) -> bool:
+        """
+        发布进度事件
+
+        Args:
+            stage: 阶段名（parsing / chunking / embedding ...）
+            progress: 总体进度 0-100
+            status: started / success / failure
+            **detail: 细粒度进度，如 pages_parsed=12, total_pages=300
+
+        Returns:
+            是否实际发布（被节流时返回 False）
+        """
+        now = time.monotonic()
+        is_forced = stage != self._last_stage or status in TERMINAL_STATUSES
+        if not is_forced and now - self._last_sent < self.min_interval:
+            return False
+
+        event = {
+            "task_id": self.task_id,
+            "status": status,
+            "stage": stage,
+            "progress": max(0, min(100, int(progress))),
+            "detail": detail,
+            "ts": time.time(),
+        }
+        payload = orjson.dumps(event)
+
+        try:
+            pipe = self.client.pipeline()
+            pipe.set(last_state_key(self.task_id), payload, ex=settings.celery_result_expires)
+            pipe.publish(progress_channel(self.task_id), payload)
+            pipe.execute()
+        except redis.RedisError as e:
+            print(f"⚠️ 进度事件发布失败: {e}")
+            return False
+
+        self._last_stage = stage
+        self._last_sent = now
+        return True
+
+
+class ProgressHub:
+    """进度事件分发中心（API 侧，每进程一个 Redis 订阅连接）
+
+    订阅连接断开后按指数退避重连，重连成功后为现有订阅者补发最近状态
+    """
+
+    def __init__(self, redis_url: str | None = None, queue_size: int = 100, client: Any = None):
+        self.redis_url = redis_url or settings.redis_url
+        self.queue_size = queue_size
+        self._subscribers: dict[str, set[asyncio.Queue]] = defaultdict(set)
+        self._client: Any = client
+        self._listener: asyncio.Task | None = None
+        # 并发的首批订阅者只启动一个监听
+        self._lock = asyncio.Lock()
+
+    def _listening(self) -> bool:
+        return self._listener is not None and not self._listener.done()
+
+    async def _ensure_started(self) -> None:
+        """首个订阅者到来时启动监听；监听已退出时重新启动"""
+        if self._listening():
+            return
+        async with self._lock:
+            if self._listening():
+                return
+            if self._client is None:
+                import redis.asyncio as aioredis
+
+                self._client = aioredis.from_url(self.redis_url, socket_connect_timeout=1)
+            pubsub = await self._psubscribe()
+            self._listener = asyncio.create_task(self._listen(pubsub))
+
+    async def _psubscribe(self) -> Any:
+        pubsub = self._client.pubsub()
+        await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+        return pubsub
+
+    async def _listen(self, pubsub: Any) -> None:
+        """监听订阅连接，断开后重连"""
+        delay = LISTENER_RETRY_MIN
+        while True:
+            if pubsub is not None:
+                try:
+                    async for message in pubsub.listen():
+                        delay = LISTENER_RETRY_MIN
+                        if message.get("type") != "pmessage":
+                            continue
+                        channel = message["channel"]
+                        if isinstance(channel, bytes):
+                            channel = channel.decode()
+                        self.dispatch(channel[len(CHANNEL_PREFIX):], message["data"])
+                except Exception as e:
+                    print(f"⚠️ 进度订阅连接中断，{delay:.0f} 秒后重连: {e}")
+                finally:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, LISTENER_RETRY_MAX)
+            try:
+                pubsub = await self._psubscribe()
+            except (redis.RedisError, OSError) as e:
+                print(f"⚠️ 进度订阅重连失败: {e}")
+                pubsub = None
+                continue
+            await self._resync()
+
+    async def _resync(self) -> None:
+        """重连后补发最近状态（断开期间的事件已丢失）"""
+        for task_id in list(self._subscribers):
+            try:
+                last = await self._client.get(last_state_key(task_id))
+            except (redis.RedisError, OSError):
+                return
+            if last:
+                self.dispatch(task_id, last)
+
+    def dispatch(self, task_id: str, data: bytes | str) -> None:
+        """将事件分发给该任务的所有本地订阅者"""
+        queues = self._subscribers.get(task_id)
+        if not queues:
+            return
+
+        event = orjson.loads(data)
+        for queue in list(queues):
+            if queue.full():
+                # 慢消费者丢弃最旧事件，只保证最终状态送达
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def subscribe(self, task_id: str) -> asyncio.Queue:
+        """
+        订阅任务进度
+
+        先注册订阅再读取最近状态，保证不遗漏事件（可能收到一条重复事件）；
+        读取失败或被取消时撤销订阅，避免遗留无人消费的队列
+        """
+        await self._ensure_started()
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[task_id].add(queue)
+
+        try:
+            last = await self._client.get(last_state_key(task_id))
+        except BaseException:
+            self.unsubscribe(task_id, queue)
+            raise
+        if last:
+            queue.put_nowait(orjson.loads(last))
+        return queue
+
+    def unsubscribe(self, task_id: str, queue: asyncio.Queue) -> None:
+        """取消订阅"""
+        queues = self._subscribers.get(task_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[task_id]
+
+    async def close(self) -> None:
+        """关闭监听与连接"""
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# 单例
+_progress_hub: ProgressHub | None = None
+
+
+def get_progress_hub() -> ProgressHub:
+    """获取进度分发中心单例"""
+    global _progress_hub
+    if _progress_hub is None:
+        _progress_hub = ProgressHub()
+    return _progress_hub
@@ -0,0 +1,319 @@
+"""LLM Provider 池
+
+单个 API Key 的 RPM / TPM 限额决定了整体吞吐上限。Provider 池把请求分摊到配置的
+多个端点（base_url、api_key、model、权重、rpm / tpm 限额），可混用多个 Key 与自建服务：
+
+- 每个端点记录最近 60 秒的请求数与 token 数、进行中的请求数，并根据响应头
+  （x-ratelimit-remaining-*，429 的 Retry-After）实时修正剩余额度
+- 每次请求选择有剩余额度且负载最低的端点：(进行中 + 1) / (权重 × 剩余额度比例)
+- 端点限流（429）、服务端错误（5xx）、超时或连接失败时换一个端点重试，
+  后三者还会短暂停用该端点；其他 4xx 是请求本身的问题，直接抛出
+- 所有端点都没有额度时等待最早释放的额度
+
+rpm / tpm 按进程统计（get_llm_provider 为单例，进程内所有服务共用一个池），
+多进程部署时应按进程数折算；响应头反映的是上游的真实余量，不受影响。
+"""
+
+import asyncio
+import re
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable
+from urllib.parse import urlparse
+
+import httpx
+
+from app.config import LLMEndpoint, get_settings
+from app.services.llm_provider import OpenAICompatibleProvider, classify_error
+from app.services.metrics import LLM_POOL_REQUESTS
+from app.services.tokenizer import ContextOverflowError, count_message_tokens, count_tokens
+
+settings = get_settings()
+
+# 限额统计窗口（秒）
+WINDOW = 60.0
+
+# 服务端错误、超时或连接失败后暂停使用该端点的时间（秒）
+ERROR_COOLDOWN = 5.0
+
+# 视为端点故障（可换端点重试）的传输层错误
+_DURATION_PART = re.compile(r"([\d.]+)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class PoolExhaustedError(RuntimeError):
+    """等待超时仍没有端点有剩余额度"""
+
+
+def parse_duration(value: str | None) -> float | None:
+    """解析限流重置时间：秒数，或 '1s'、'6m0s'、'20ms' 形式"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in _DURATION_PART.findall(value))
+    return total or None
+
+
+class Endpoint:
+    """池中的一个端点及其额度状态"""
+
+    def __init__(
+        self,
+        name: str,
+        provider: Any,
+        weight: float = 1.0,
+        rpm: int = 0,
+        tpm: int = 0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.provider = provider
+        self.weight = weight
+        self.rpm = rpm
+        self.tpm = tpm
+        self._clock = clock
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self._requests: deque[float] = deque()
+        self._tokens: deque[tuple[float, int]] = deque()
+        self._token_total = 0
+        # 响应头给出的剩余比例，在上游的重置时间之前有效
+        self._header_ratio = 1.0
+        self._header_until = 0.0
+
+    def _expire(self, now: float) -> None:
+        while self._requests and self._requests[0] <= now - WINDOW:
+            self._requests.popleft()
+        while self._tokens and self._tokens[0][0] <= now - WINDOW:
+            self._token_total -= self._tokens.popleft()[1]
+
+    def headroom(self, tokens: int = 0) -> float:
+        """发出 tokens 规模的请求后剩余额度的比例，0 表示当前不可用"""
+        now = self._clock()
+        self._expire(now)
+        if now < self.blocked_until:
+            return 0.0
+        ratios = [self._header_ratio if now < self._header_until else 1.0]
+        if self.rpm:
+            ratios.append((self.rpm - len(self._requests)) / self.rpm)
+        if self.tpm:
+            ratios.append((self.tpm - self._token_total - tokens) / self.tpm)
+        return max(0.0, min(ratios))
+
+    def available_at(self) -> float:
+        """预计恢复额度的时间"""
+        now = self._clock()
+        times = [self.blocked_until]
+        if self.rpm and len(self._requests) >= self.rpm:
+            times.append(self._requests[0] + WINDOW)
+        if self.tpm and self._tokens and self._token_total >= self.tpm:
+            times.append(self._tokens[0][0] + WINDOW)
+        return max(now, max(times))
+
+    def acquire(self, tokens: int) -> None:
+        """占用一次请求额度"""
+        now = self._clock()
+        self.in_flight += 1
+        self._requests.append(now)
+        self.add_tokens(tokens)
+
+    def release(self) -> None:
+        self.in_flight -= 1
+
+    def add_tokens(self, tokens: int) -> None:
+        if tokens > 0:
+            self._tokens.append((self._clock(), tokens))
+            self._token_total += tokens
+
+    def observe_response(self, response: httpx.Response) -> None:
+        """根据响应头修正剩余额度"""
+        now = self._clock()
+        headers = response.headers
+        if response.status_code == 429:
+            self.blocked_until = now + (parse_duration(headers.get("retry-after")) or 1.0)
+            return
+
+        ratios, resets = [], []
+        for kind in ("requests", "tokens"):
+            limit = headers.get(f"x-ratelimit-limit-{kind}")
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if not limit or remaining is None:
+                continue
+            try:
+                ratios.append(max(0.0, float(remaining) / float(limit)))
+            except (ValueError, ZeroDivisionError):
+                continue
+            resets.append(parse_duration(headers.get(f"x-ratelimit-reset-{kind}")) or WINDOW)
+        if not ratios:
+            return
+        self._header_ratio = min(ratios)
+        self._header_until = now + max(resets)
+        if self._header_ratio == 0:
+            self.blocked_until = self._header_until
+
+    def fail(self) -> None:
+        """服务端错误、超时或连接失败：短暂停用"""
+        self.blocked_until = max(self.blocked_until, self._clock() + ERROR_COOLDOWN)
+
+
+class ProviderPool:
+    """多端点 Provider 池（实现 LLMProvider 接口）"""
+
+    provider_name = "pool"
+
+    def __init__(
+        self,
+        endpoints: list[Endpoint],
+        max_wait: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not endpoints:
+            raise ValueError("Provider 池至少需要一个端点")
+        self.endpoints = endpoints
+        self.max_wait = settings.llm_pool_max_wait if max_wait is None else max_wait
+        self._clock = clock
+
+    @property
+    def model(self) -> str:
+        return self.endpoints[0].provider.model
+
+    def select(self, tokens: int = 0, exclude: set[str] = frozenset()) -> Endpoint | None:
+        """选择有剩余额度且负载最低的端点"""
+        best, best_score = None, float("inf")
+        for endpoint in self.endpoints:
+            if endpoint.name in exclude:
+                continue
+            headroom = endpoint.headroom(tokens)
+            if headroom <= 0:
+                continue
+            score = (endpoint.in_flight + 1) / (endpoint.weight * headroom)
+            if score < best_score:
+                best, best_score = endpoint, score
+        return best
+
+    async def _acquire(self, tokens: int, exclude: set[str]) -> Endpoint:
+        """占用一个端点的额度，没有可用端点时等待"""
+        deadline = self._clock() + self.max_wait
+        while True:
+            endpoint = self.select(tokens, exclude)
+            if endpoint is not None:
+                endpoint.acquire(tokens)
+                return endpoint
+
+            now = self._clock()
+            candidates = [e for e in self.endpoints if e.name not in exclude]
+            if now >= deadline or not candidates:
+                raise PoolExhaustedError(f"{self.max_wait:.0f} 秒内没有端点有剩余额度")
+            wait = min(e.available_at() for e in candidates) - now
+            await asyncio.sleep(min(max(wait, 0.05), deadline - now))
+
+    def _failed(self, endpoint: Endpoint, error: httpx.HTTPError) -> bool:
+        """记录端点失败，返回是否可换端点重试"""
+        outcome = classify_error(error)
+        LLM_POOL_REQUESTS.labels(endpoint=endpoint.name, outcome=outcome).inc()
+        if outcome == "client_error":
+            return False
+        if outcome == "error":
+            endpoint.fail()
+        print(f"⚠️ 端点 {endpoint.name} 请求失败，换用其他端点: {error}")
+        return True
+
+    async def complete(self, prompt: str, **kwargs) -> str:
+        """文本补全"""
+        return await self.chat([{"role": "user", "content": prompt}], **kwargs)
+
+    async def chat(self, messages: list[dict[str, str]], **kwargs) -> str:
+        """
+        对话补全（端点限流或故障时换一个端点，每个端点最多尝试一次）
+
+        Raises:
+            ContextOverflowError: 提示词超出上下文窗口
+            PoolExhaustedError: 等待超时仍没有可用端点
+            httpx.HTTPStatusError: 请求本身有误（429 以外的 4xx），不换端点重试
+        """
+        tokens = count_message_tokens(messages)
+        tried: set[str] = set()
+        error: Exception | None = None
+        for _ in self.endpoints:
+            endpoint = await self._acquire(tokens, tried)
+            try:
+                result = await endpoint.provider.chat(messages, **kwargs)
+            except ContextOverflowError:
+                raise
+            except httpx.HTTPError as e:
+                if not self._failed(endpoint, e):
+                    raise
+                tried.add(endpoint.name)
+                error = e
+                continue
+            finally:
+                endpoint.release()
+            endpoint.add_tokens(count_tokens(result))
+            LLM_POOL_REQUESTS.labels(endpoint=endpoint.name, outcome="success").inc()
+            return result
+        raise error
+
+    async def stream_chat(self, messages: list[dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """流式对话补全（尚未产出内容时才换端点重试）"""
+        tokens = count_message_tokens(messages)
+        tried: set[str] = set()
+        error: Exception | None = None
+        for _ in self.endpoints:
+            endpoint = await self._acquire(tokens, tried)
+            deltas = 0
+            try:
+                async for delta in endpoint.provider.stream_chat(messages, **kwargs):
+                    deltas += 1
+                    yield delta
+            except httpx.HTTPError as e:
+                if not self._failed(endpoint, e) or deltas:
+                    raise
+                tried.add(endpoint.name)
+                error = e
+                continue
+            finally:
+                endpoint.release()
+                endpoint.add_tokens(deltas)
+            LLM_POOL_REQUESTS.labels(endpoint=endpoint.name, outcome="success").inc()
+            return
+        raise error
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        """
+        文本嵌入（只按额度选择端点，不换端点重试）
+
+        OpenAICompatibleProvider.embed 出错时返回占位向量而不是抛出异常，池无法感知失败；
+        另外各端点的嵌入模型可能不同，换端点会混入另一个向量空间的向量。
+        """
+        endpoint = await self._acquire(sum(count_tokens(text) for text in texts), set())
+        try:
+            return await endpoint.provider.embed(texts)
+        finally:
+            endpoint.release()
+
+    async def close(self) -> None:
+        """关闭所有端点的连接"""
+        for endpoint in self.endpoints:
+            await endpoint.provider.close()
+
+
+def build_provider_pool(configs: list[LLMEndpoint]) -> ProviderPool:
+    """按配置创建 Provider 池"""
+    endpoints = []
+    for i, config in enumerate(configs):
+        # 指标标签不能包含 API Key
+        name = config.name or f"{urlparse(config.base_url).netloc}#{i}"
+        endpoint = Endpoint(name, None, weight=config.weight, rpm=config.rpm, tpm=config.tpm)
+        endpoint.provider = OpenAICompatibleProvider(
+            api_key=config.api_key or settings.openai_api_key,
+            model=config.model or settings.llm_model,
+            base_url=config.base_url,
+            provider_name=name,
+            max_attempts=1,  # 由池换端点重试
+            on_response=endpoint.observe_response,
+        )
+        endpoints.append(endpoint)
+    return ProviderPool(endpoints)
@@ -6,6 +6,8 @@
 import re
 from typing import Dict, List, Tuple
 
+from app.services.tracing import traced
+
 
 class ReadabilityService:
     """阅读等级评估服务"""
@@ -150,6 +152,7 @@ class ReadabilityService:
         
         return coverage
     
+    @traced("readability.analyze")
     def analyze_readability(self, text: str, target_grade: int) -> Dict:
         """
         综合分析文本可读性
@@ -0,0 +1,94 @@
+"""增量重新摄取
+
+教师上传同一教材的修订版时，只有少数页面变化：
+
+- 解析：页面内容哈希与上一版本相同的页面直接复用解析结果（见 PDFParser.parse_pdf）
+- 分块：在复用后的页面数据上重新分块（纯 CPU、毫秒级），未变化区域产出的分块文本不变
+- ID 与向量：文本与上一版本某个分块相同的新分块沿用其 chunk_id 和向量，
+  只有真正变化的分块分配新 ID 并重新向量化；嵌入模型变化或旧向量是占位向量时只沿用 ID
+
+因此按 chunk_id 保存的个性化改写、素材等在未变化的区域仍然有效。
+"""
+
+import re
+from collections import defaultdict, deque
+from typing import Any
+
+from app.services.blob_store import BlobNotFoundError
+from app.services.chunk_store import ChunkStore
+from app.services.embedder import is_placeholder_vector
+
+_CHUNK_NUMBER = re.compile(r"^chunk_(\d+)$")
+
+
+class PreviousVersion:
+    """上一版本的页面与分块"""
+
+    def __init__(
+        self,
+        pages: list[dict[str, Any]] | None,
+        chunks: list[dict[str, Any]],
+        model: str | None = None,
+    ):
+        self.pages = pages
+        self.chunks = chunks
+        self.model = model  # 向量矩阵清单记录的嵌入模型，未记录时为 None
+
+
+def load_previous_version(store: ChunkStore, document_id: str) -> PreviousVersion | None:
+    """读取文档上一版本，不存在时返回 None"""
+    if not store.exists(document_id):
+        return None
+    try:
+        model = store.open_matrix(document_id).model
+    except (BlobNotFoundError, ValueError):
+        model = None
+    return PreviousVersion(store.load_pages(document_id), store.load_all(document_id), model)
+
+
+def reuse_chunk_ids(
+    chunks: list[dict[str, Any]],
+    previous_chunks: list[dict[str, Any]],
+    model: str | None = None,
+    previous_model: str | None = None,
+) -> dict[str, int]:
+    """
+    为新分块沿用上一版本的 chunk_id 与向量（原地修改）
+
+    按文本精确匹配；同一文本出现多次时按出现顺序一一对应。
+    未匹配的分块分配上一版本最大编号之后的新 ID，不会复用已删除分块的 ID。
+    只有 model 与上一版本的嵌入模型 previous_model 相同时才沿用向量（未记录模型时不沿用），
+    全零占位向量也不沿用，这些分块之后重新向量化。
+
+    Returns:
+        {"reused": 沿用 ID 的分块数, "added": 新分块数, "removed": 不再存在的旧分块数}
+    """
+    by_text: dict[str, deque[dict[str, Any]]] = defaultdict(deque)
+    next_number = 0
+    for old in previous_chunks:
+        by_text[old["text"]].append(old)
+        match = _CHUNK_NUMBER.match(old["chunk_id"])
+        if match:
+            next_number = max(next_number, int(match.group(1)) + 1)
+
+    reuse_embeddings = model is not None and model == previous_model
+    reused = 0
+    for chunk in chunks:
+        candidates = by_text.get(chunk["text"])
+        if candidates:
+            old = candidates.popleft()
+            chunk["chunk_id"] = old["chunk_id"]
+            embedding = old.get("embedding") if reuse_embeddings else None
+            if embedding and not is_placeholder_vector(embedding):
+                chunk["embedding"] = embedding
+                chunk["embedding_dim"] = len(embedding)
+            reused += 1
+        else:
+            chunk["chunk_id"] = f"chunk_{next_number:04d}"
+            next_number += 1
+
+    return {
+        "reused": reused,
+        "added": len(chunks) - reused,
+        "removed": len(previous_chunks) - reused,
+    }
@@ -0,0 +1,88 @@
+"""上游调用的延迟统计与熔断
+
+- LatencyTracker：滑动窗口内最近的成功调用延迟，用于计算对冲请求的触发时间（如 p95）
+- CircuitBreaker：连续失败达到阈值后熔断一段时间，期间直接路由到备用 Provider；
+  冷却结束后放行一个探测请求，成功则恢复，失败则继续熔断
+"""
+
+import math
+import time
+from collections import deque
+from typing import Callable, Literal
+
+BreakerState = Literal["closed", "open", "half_open"]
+
+
+class LatencyTracker:
+    """滑动窗口延迟统计"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def add(self, seconds: float) -> None:
+        """记录一次成功调用的耗时"""
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> float | None:
+        """最近秩分位数，样本不足时返回 None"""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+class CircuitBreaker:
+    """熔断器（单进程内有效）"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> BreakerState:
+        if self._opened_at is None:
+            return "closed"
+        if self._probing or self._clock() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """是否放行请求（半开状态下同一时刻只放行一个探测请求）"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            print(f"✅ {self.name} 已恢复，关闭熔断")
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._probing or self._failures >= self.failure_threshold:
+            if not self._probing:
+                print(f"⚠️ {self.name} 连续失败 {self._failures} 次，熔断 {self.reset_timeout:.0f} 秒")
+            self._opened_at = self._clock()
+            self._probing = False
+
+    def release(self) -> None:
+        """请求被取消或失败与上游无关时，归还探测名额，不计入成败"""
+        self._probing = False
@@ -0,0 +1,85 @@
+"""有界、可过期的结果存储
+
+用于保存同步模式（无 Redis）下的任务结果：条目数量有上限（LRU 淘汰），
+并在超过 TTL 后过期，避免进程内存随请求数无限增长。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+class TTLResultStore:
+    """有界 LRU + TTL 结果存储（线程安全）"""
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: float = 3600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def set(self, key: str, value: Any) -> None:
+        """写入结果（覆盖同名条目）"""
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            self._evict()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """读取结果，不存在或已过期时返回 default"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        """移除并返回结果"""
+        with self._lock:
+            entry = self._data.pop(key, None)
+        if entry is None or entry[0] <= self._clock():
+            return default
+        return entry[1]
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._evict()
+            return len(self._data)
+
+    def _evict(self) -> None:
+        """淘汰过期条目和超出容量的最久未使用条目（调用方持有锁）"""
+        now = self._clock()
+        expired = [key for key, (expires_at, _) in self._data.items() if expires_at <= now]
+        for key in expired:
+            del self._data[key]
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+
+_MISSING = object()
+
+
+# 同步模式任务结果（摄取等）
+sync_results = TTLResultStore(
+    max_entries=settings.sync_result_max_entries,
+    ttl_seconds=settings.sync_result_ttl,
+)
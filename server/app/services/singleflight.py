@@ -0,0 +1,186 @@
+"""相同请求合并（singleflight）
+
+老师把某个分块分享给全班后，几十名学生会在同一时刻以相同的分块和等价的画像
+请求改写 / 测验。结果缓存要等第一次调用完成才能写入，在此之前每个请求都会各自
+调用一次 LLM。这里让同一时刻的相同请求只调用一次上游：
+
+- 进程内：同一事件循环中的相同 key 共享同一个执行任务
+- 跨进程：通过 Redis 锁（SET NX PX）选出唯一的执行者，执行者把结果写入
+  短期 key 后释放锁；其他进程轮询结果，执行者失败（锁消失但没有结果）时
+  由等待者接手重新执行
+
+Redis 不可用时退化为仅进程内合并。
+"""
+
+import asyncio
+import hashlib
+import time
+import uuid
+import weakref
+from typing import Any, Awaitable, Callable
+
+import orjson
+import redis
+
+from app.config import get_settings
+from app.services.metrics import record_cache
+
+settings = get_settings()
+
+LOCK_PREFIX = "sf:lock:"
+RESULT_PREFIX = "sf:result:"
+
+# Redis 出错后暂停访问的时间（秒）
+RETRY_AFTER = 30.0
+
+
+def flight_key(*parts: Any) -> str:
+    """由请求参数计算合并 key（参数需可 JSON 序列化，dict 按键排序）"""
+    return hashlib.sha256(orjson.dumps(parts, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+class SingleFlight:
+    """相同请求合并器，结果为文本"""
+
+    def __init__(
+        self,
+        client: Any = None,
+        lock_ttl: float | None = None,
+        result_ttl: float | None = None,
+        poll_interval: float = 0.05,
+    ):
+        """
+        Args:
+            client: redis.asyncio 客户端；为 None 时按事件循环惰性创建
+            lock_ttl: 锁的过期时间（秒），应大于单次上游调用的最长耗时
+            result_ttl: 执行者写入的结果保留时间（秒），只需覆盖等待者的轮询间隔
+            poll_interval: 其他进程等待结果时的轮询间隔（秒）
+        """
+        self._client = client
+        self.lock_ttl = settings.llm_singleflight_lock_ttl if lock_ttl is None else lock_ttl
+        self.result_ttl = settings.llm_singleflight_result_ttl if result_ttl is None else result_ttl
+        self.poll_interval = poll_interval
+        # Celery 任务每次 asyncio.run 都是新的事件循环，Future 与连接都按循环隔离
+        self._inflight: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._retry_at = 0.0
+        self.executed = 0
+        self.shared = 0
+
+    def _redis(self) -> Any:
+        if self._client is not None:
+            return self._client
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            import redis.asyncio as aioredis
+
+            client = aioredis.from_url(settings.redis_url, socket_connect_timeout=1)
+            self._clients[loop] = client
+        return client
+
+    def _fail(self, error: Exception) -> None:
+        print(f"⚠️ 请求合并锁不可用，仅在进程内合并: {error}")
+        self._retry_at = time.monotonic() + RETRY_AFTER
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[str]]) -> str:
+        """
+        执行 fn，同一时刻相同 key 的调用只执行一次并共享结果
+
+        上游调用在独立的任务中执行，所有调用方（包括发起者）都通过 shield 等待：
+        任一调用方被取消不影响其他调用方；全部调用方都取消后才取消上游调用。
+        执行失败时，本进程内正在等待的调用收到同一个异常
+        """
+        inflight = self._inflight.setdefault(asyncio.get_running_loop(), {})
+        flight = inflight.get(key)
+        if flight is None:
+            task = asyncio.ensure_future(self._run_once(key, fn))
+            flight = inflight[key] = [task, 0]
+
+            def done(t: asyncio.Task) -> None:
+                if inflight.get(key) is flight:
+                    del inflight[key]
+                # 没有等待者时也标记异常已读取，避免 "exception was never retrieved"
+                t.cancelled() or t.exception()
+
+            task.add_done_callback(done)
+        else:
+            self._share()
+
+        task = flight[0]
+        flight[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and flight[1] == 1:
+                task.cancel()
+            raise
+        finally:
+            flight[1] -= 1
+
+    async def _run_once(self, key: str, fn: Callable[[], Awaitable[str]]) -> str:
+        """跨进程只执行一次"""
+        if time.monotonic() < self._retry_at:
+            return await self._execute(fn)
+
+        lock_key, result_key = f"{LOCK_PREFIX}{key}", f"{RESULT_PREFIX}{key}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_ttl
+        try:
+            client = self._redis()
+            while time.monotonic() < deadline:
+                if await client.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000)):
+                    break
+                # 其他进程正在执行：等待结果，锁消失且没有结果时重新竞争
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(self.poll_interval)
+                    value, holder = await client.mget([result_key, lock_key])
+                    if value is not None:
+                        self._share()
+                        return value.decode("utf-8")
+                    if holder is None:
+                        break
+            else:
+                # 执行者迟迟没有结果（可能已崩溃），不再等待
+                return await self._execute(fn)
+        except redis.RedisError as e:
+            self._fail(e)
+            return await self._execute(fn)
+
+        try:
+            result = await self._execute(fn)
+            try:
+                await client.set(
+                    result_key, result.encode("utf-8"), px=int(self.result_ttl * 1000)
+                )
+            except redis.RedisError as e:
+                self._fail(e)
+            return result
+        finally:
+            try:
+                # 锁的有效期远大于上游调用耗时，先比对再删除的竞态可以忽略
+                if await client.get(lock_key) == token.encode():
+                    await client.delete(lock_key)
+            except redis.RedisError:
+                pass
+
+    async def _execute(self, fn: Callable[[], Awaitable[str]]) -> str:
+        self.executed += 1
+        record_cache("llm_singleflight", misses=1)
+        return await fn()
+
+    def _share(self) -> None:
+        self.shared += 1
+        record_cache("llm_singleflight", hits=1)
+
+
+# 单例
+_singleflight: SingleFlight | None = None
+
+
+def get_singleflight() -> SingleFlight:
+    """获取请求合并器单例"""
+    global _singleflight
+    if _singleflight is None:
+        _singleflight = SingleFlight()
+    return _singleflight
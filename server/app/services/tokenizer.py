@@ -0,0 +1,179 @@
+"""Tokenizer 抽象层
+
+分块、提示词预算和 max_tokens 选择统一使用同一个 tokenizer 计数，避免按字符数估算
+导致中文文本的 token 数偏差过大（分块超出上下文或浪费上下文）。
+
+- TiktokenTokenizer：本地 BPE（需安装 tiktoken），精确计数
+- CJKEstimator：无依赖的估算器，按汉字 / 拉丁单词 / 数字 / 符号分别折算
+
+TOKENIZER=auto 时优先使用 tiktoken，不可用则退回估算器。计数结果按文本 LRU 缓存。
+"""
+
+import math
+import re
+from functools import lru_cache
+from typing import Protocol
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+class ContextOverflowError(ValueError):
+    """提示词超出模型上下文窗口"""
+
+
+class Tokenizer(Protocol):
+    """Tokenizer 接口"""
+
+    name: str
+
+    def count(self, text: str) -> int:
+        """计算文本的 token 数"""
+        ...
+
+
+class CJKEstimator:
+    """CJK 感知的 token 估算器"""
+
+    name = "estimate"
+
+    _CJK = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+    _WORD = re.compile(r"[A-Za-z]+|\d+")
+
+    def __init__(self, cjk_ratio: float = 0.75):
+        self.cjk_ratio = cjk_ratio
+
+    def count(self, text: str) -> int:
+        # 先整体剔除汉字（C 层实现，比逐字符匹配快一个数量级）
+        rest = self._CJK.sub("", text)
+        cjk = len(text) - len(rest)
+
+        tokens = 0
+        consumed = 0
+        for match in self._WORD.finditer(rest):
+            piece = match.group()
+            # 英文约 4 字符 / token，数字约 3 位 / token
+            tokens += math.ceil(len(piece) / (3 if piece[0].isdigit() else 4))
+            consumed += len(piece)
+
+        # 其余非空白字符（标点、符号）各算 1 个
+        symbols = len("".join(rest.split())) - consumed
+        return math.ceil(cjk * self.cjk_ratio) + tokens + symbols
+
+
+class TiktokenTokenizer:
+    """基于 tiktoken 的本地 BPE tokenizer"""
+
+    def __init__(self, encoding: str = "cl100k_base"):
+        import tiktoken
+
+        self._encoding = tiktoken.get_encoding(encoding)
+        self.name = f"tiktoken:{encoding}"
+
+    def count(self, text: str) -> int:
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+
+class CachedTokenizer:
+    """为 tokenizer 增加按文本的 LRU 计数缓存"""
+
+    def __init__(self, tokenizer: Tokenizer, maxsize: int = 8192):
+        self.tokenizer = tokenizer
+        self.name = tokenizer.name
+        self.count = lru_cache(maxsize=maxsize)(tokenizer.count)
+
+
+def _build_tokenizer() -> Tokenizer:
+    if settings.tokenizer in ("auto", "tiktoken"):
+        try:
+            return TiktokenTokenizer(settings.tokenizer_encoding)
+        except Exception as e:
+            if settings.tokenizer == "tiktoken":
+                raise
+            print(f"⚠️ tiktoken 不可用，使用 CJK 估算器: {e}")
+    return CJKEstimator(settings.tokenizer_cjk_ratio)
+
+
+_tokenizer: CachedTokenizer | None = None
+
+
+def get_tokenizer() -> CachedTokenizer:
+    """获取 tokenizer 单例"""
+    global _tokenizer
+    if _tokenizer is None:
+        _tokenizer = CachedTokenizer(_build_tokenizer())
+    return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    """计算文本 token 数"""
+    return get_tokenizer().count(text)
+
+
+def truncate_tokens(
+    text: str,
+    max_tokens: int,
+    from_end: bool = False,
+    tokenizer: Tokenizer | None = None,
+) -> str:
+    """
+    截断文本使其不超过 max_tokens
+
+    Args:
+        from_end: 为 True 时保留末尾（用于分块重叠）
+    """
+    tokenizer = tokenizer or get_tokenizer()
+    if max_tokens <= 0:
+        return ""
+    if tokenizer.count(text) <= max_tokens:
+        return text
+
+    # 二分查找满足预算的最长前缀 / 后缀；单个 token 很少超过 8 个字符，据此收窄搜索范围
+    lo, hi = 0, min(len(text), max_tokens * 8)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        piece = text[-mid:] if from_end else text[:mid]
+        if tokenizer.count(piece) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    if lo == 0:
+        return ""
+    return text[-lo:] if from_end else text[:lo]
+
+
+# OpenAI chat 格式每条消息的额外开销（role、分隔符等）
+_MESSAGE_OVERHEAD = 4
+_REPLY_PRIMING = 2
+
+
+def count_message_tokens(messages: list[dict[str, str]]) -> int:
+    """计算 chat 消息列表的提示词 token 数"""
+    return _REPLY_PRIMING + sum(
+        count_tokens(message.get("content", "")) + _MESSAGE_OVERHEAD for message in messages
+    )
+
+
+def fit_max_tokens(messages: list[dict[str, str]], requested: int | None = None) -> int:
+    """
+    根据上下文窗口选择 max_tokens
+
+    Args:
+        messages: 提示词消息
+        requested: 期望的最大输出，默认 settings.max_tokens
+
+    Returns:
+        不超过上下文剩余空间的 max_tokens
+
+    Raises:
+        ContextOverflowError: 剩余空间不足 settings.min_output_tokens
+    """
+    requested = requested or settings.max_tokens
+    prompt_tokens = count_message_tokens(messages)
+    available = settings.llm_context_window - prompt_tokens - settings.context_safety_margin
+    if available < settings.min_output_tokens:
+        raise ContextOverflowError(
+            f"提示词约 {prompt_tokens} tokens，超出上下文窗口 {settings.llm_context_window}"
+        )
+    return min(requested, available)
@@ -0,0 +1,271 @@
+"""分布式追踪（OpenTelemetry）
+
+一个 /personalize 请求会经过 FastAPI → Redis → Celery Worker → 各服务 → LLM，
+本模块把这些环节串成一条 trace：
+- HTTP 请求：从 traceparent 请求头继续上游 trace，生成 SERVER span
+- Celery：发布任务时把上下文注入消息头，Worker 执行前取出并继续
+- 服务内部：通过 start_span / traced 包装 LLM 调用、PDF 解析、分块等
+
+导出器：console（标准输出）、file（JSON Lines 文件，无需 collector 即可本地查看）、
+otlp（需安装 opentelemetry-exporter-otlp）。未安装 opentelemetry 或未启用时全部为空操作。
+"""
+
+import functools
+import inspect
+import json
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Iterator, Sequence
+
+from app.config import get_settings
+
+settings = get_settings()
+
+try:
+    from opentelemetry import context as otel_context
+    from opentelemetry import propagate, trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor,
+        ConsoleSpanExporter,
+        SpanExporter,
+        SpanExportResult,
+    )
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+
+    OTEL_AVAILABLE = True
+except ImportError:
+    OTEL_AVAILABLE = False
+
+_tracer: Any = None
+_init_lock = threading.Lock()
+
+
+if OTEL_AVAILABLE:
+
+    class JsonLinesFileExporter(SpanExporter):
+        """将 span 以 JSON Lines 格式追加写入本地文件"""
+
+        def __init__(self, path: str):
+            self.path = path
+            self._lock = threading.Lock()
+
+        def export(self, spans: Sequence[Any]) -> "SpanExportResult":
+            lines = [json.dumps(json.loads(span.to_json()), ensure_ascii=False) for span in spans]
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self) -> None:
+            pass
+
+
+def _build_exporter() -> Any:
+    if settings.tracing_exporter == "file":
+        return JsonLinesFileExporter(settings.tracing_file)
+    if settings.tracing_exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter()
+    return ConsoleSpanExporter()
+
+
+def init_tracing(service_name: str) -> bool:
+    """
+    初始化追踪（每个进程调用一次，重复调用无副作用）
+
+    Returns:
+        是否启用追踪
+    """
+    global _tracer
+    if not settings.tracing_enabled or not OTEL_AVAILABLE:
+        return False
+
+    with _init_lock:
+        if _tracer is not None:
+            return True
+
+        provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+        provider.add_span_processor(BatchSpanProcessor(_build_exporter()))
+        trace.set_tracer_provider(provider)
+        _tracer = trace.get_tracer("learnyourway")
+    return True
+
+
+def start_span(name: str, kind: Any = None, context: Any = None, **attributes: Any):
+    """
+    开启一个 span（上下文管理器）；未启用追踪时为空操作
+
+    Example:
+        with start_span("pdf.parse", pages=10):
+            ...
+    """
+    if _tracer is None:
+        return nullcontext()
+    return _start_span(name, kind, context, attributes)
+
+
+@contextmanager
+def _start_span(name: str, kind: Any, context: Any, attributes: dict[str, Any]) -> Iterator[Any]:
+    with _tracer.start_as_current_span(
+        name,
+        kind=kind or SpanKind.INTERNAL,
+        context=context,
+        attributes={k: v for k, v in attributes.items() if v is not None},
+    ) as span:
+        yield span
+
+
+@contextmanager
+def detached_span(name: str, **attributes: Any) -> Iterator[Any]:
+    """
+    开启一个不设为当前上下文的 span
+
+    用于异步生成器等跨 yield 的场景（在不同上下文中恢复执行时无法安全 detach）
+    """
+    if _tracer is None:
+        yield None
+        return
+
+    span = _tracer.start_span(
+        name, attributes={k: v for k, v in attributes.items() if v is not None}
+    )
+    try:
+        yield span
+    except BaseException as e:
+        span.record_exception(e)
+        span.set_status(Status(StatusCode.ERROR))
+        raise
+    finally:
+        span.end()
+
+
+def set_span_attributes(**attributes: Any) -> None:
+    """给当前 span 追加属性"""
+    if _tracer is None:
+        return
+    span = trace.get_current_span()
+    for key, value in attributes.items():
+        if value is not None:
+            span.set_attribute(key, value)
+
+
+def traced(name: str) -> Callable:
+    """为同步 / 异步函数包一层 span 的装饰器"""
+
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with start_span(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with start_span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def inject_context(carrier: dict[str, Any]) -> None:
+    """把当前 trace 上下文写入 carrier（HTTP 头 / Celery 消息头）"""
+    if _tracer is not None:
+        propagate.inject(carrier)
+
+
+def extract_context(carrier: Any) -> Any:
+    """从 carrier 中取出 trace 上下文"""
+    if _tracer is None:
+        return None
+    return propagate.extract(carrier)
+
+
+# ============ FastAPI ============
+
+
+async def trace_http_request(request: Any, call_next: Callable) -> Any:
+    """FastAPI 中间件：为每个请求生成 SERVER span，并继续上游 traceparent"""
+    if _tracer is None:
+        return await call_next(request)
+
+    with start_span(
+        f"{request.method} {request.url.path}",
+        kind=SpanKind.SERVER,
+        context=extract_context(dict(request.headers)),
+        **{"http.method": request.method, "http.target": request.url.path},
+    ) as span:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        if route is not None:
+            # 路由匹配后用模板重命名，便于聚合
+            span.update_name(f"{request.method} {route.path}")
+            span.set_attribute("http.route", route.path)
+        span.set_attribute("http.status_code", response.status_code)
+        if response.status_code >= 500:
+            span.set_status(Status(StatusCode.ERROR))
+        return response
+
+
+# ============ Celery ============
+
+
+class _CeleryRequestGetter:
+    """从 Celery task.request 读取传播字段（自定义消息头会成为 request 属性）"""
+
+    def get(self, carrier: Any, key: str) -> list[str] | None:
+        value = getattr(carrier, key, None)
+        if value is None and isinstance(getattr(carrier, "headers", None), dict):
+            value = carrier.headers.get(key)
+        return [value] if value is not None else None
+
+    def keys(self, carrier: Any) -> list[str]:
+        return []
+
+
+_celery_spans: dict[str, tuple[Any, Any]] = {}
+
+
+def instrument_celery() -> None:
+    """注册 Celery 信号：发布时注入上下文，执行时继续 trace"""
+    from celery.signals import before_task_publish, task_postrun, task_prerun
+
+    @before_task_publish.connect(weak=False)
+    def _inject(headers: dict | None = None, sender: Any = None, **kwargs):
+        if _tracer is None or headers is None:
+            return
+        with start_span(f"celery.publish {sender}", kind=SpanKind.PRODUCER):
+            inject_context(headers)
+
+    @task_prerun.connect(weak=False)
+    def _start(task_id: str | None = None, task: Any = None, **kwargs):
+        if _tracer is None or task is None:
+            return
+        parent = propagate.extract(task.request, getter=_CeleryRequestGetter())
+        span = _tracer.start_span(
+            f"celery.run {task.name}",
+            context=parent,
+            kind=SpanKind.CONSUMER,
+            attributes={"celery.task_id": task_id or ""},
+        )
+        token = otel_context.attach(trace.set_span_in_context(span))
+        _celery_spans[task_id] = (span, token)
+
+    @task_postrun.connect(weak=False)
+    def _end(task_id: str | None = None, state: str | None = None, **kwargs):
+        entry = _celery_spans.pop(task_id, None)
+        if entry is None:
+            return
+        span, token = entry
+        if state is not None:
+            span.set_attribute("celery.state", state)
+            if state == "FAILURE":
+                span.set_status(Status(StatusCode.ERROR))
+        span.end()
+        otel_context.detach(token)
@@ -1,90 +1,192 @@
 """PDF 摄取任务
 
-完整的 PDF 解析流程：上传 -> 解析 -> 清洗分块 -> 向量化 -> 存储
+完整的 PDF 解析流程：上传 -> 解析（扫描页 OCR）-> 清洗分块 -> 向量化 -> 存储
 """
 
 import asyncio
 from pathlib import Path
+from typing import Any
 
+from app.services.chunk_store import get_chunk_store
+from app.services.dedup import (
+    copy_local_embeddings,
+    is_local_duplicate,
+    link_near_duplicates,
+    reuse_canonical_embeddings,
+)
 from app.services.embedder import Embedder
+from app.services.metrics import observe_stage
 from app.services.pdf_parser import PDFParser, clean_and_chunk
+from app.services.progress import ProgressPublisher
+from app.services.reingest import load_previous_version, reuse_chunk_ids
 from app.tasks.worker import celery_app
 
+# 结果中返回的预览分块数量（完整分块写入 Blob 存储）
+PREVIEW_CHUNKS = 5
+
+
+def preview_chunks(chunks: list[dict[str, Any]], limit: int = PREVIEW_CHUNKS) -> list[dict[str, Any]]:
+    """生成分块预览（截断文本，只取前几个）"""
+    return [
+        {
+            "chunk_id": chunk["chunk_id"],
+            "text": chunk["text"][:100] + "..." if len(chunk["text"]) > 100 else chunk["text"],
+            "pages": chunk["pages"],
+            "tokens": chunk["tokens"],
+            "section_path": chunk.get("section_path"),
+            "canonical": chunk.get("canonical"),
+        }
+        for chunk in chunks[:limit]
+    ]
+
 
 @celery_app.task(bind=True, name="ingest_pdf")
-def ingest_pdf_task(self, file_path: str):
+def ingest_pdf_task(self, file_path: str, document_id: str | None = None):
     """
     PDF 摄取任务
     
+    细粒度进度（已解析页数、已向量化分块数）通过 Redis pub/sub 推送，
+    update_state 只在阶段切换时写入结果后端（兼容轮询接口）
+    
+    指定已存在的 document_id 时为增量重新摄取：未变化的页面不重新解析，
+    未变化的分块沿用原 chunk_id 和向量，只对变化的分块向量化。
+    
     Args:
         file_path: PDF 文件路径
+        document_id: 文档 ID，默认取文件名；传入已有文档 ID 时覆盖该文档
         
     Returns:
         {
-            "chunks": [...],
-            "metadata": {...}
+            "document_id": str,
+            "filename": str,
+            "total_pages": int,
+            "ocr_pages": int,  # 经 OCR 识别的扫描页数
+            "reused_pages": int,  # 复用上一版本解析结果的页数
+            "chunk_changes": {"reused": int, "added": int, "removed": int} | None,
+            "embedding_cache": {"hits": int, "misses": int, "hit_rate": float},
+            "near_duplicates": {...} | None,  # 近重复检测报告（数量、跨文档数、节省的 token 与向量）
+            "chunks_count": int,
+            "chunks": [...],  # 前几个分块的预览
+            "artifacts": {"chunks": {...}, "embeddings": {...}}  # Blob 存储引用
         }
     """
+    document_id = document_id or Path(file_path).stem
+    store = get_chunk_store()
+    publisher = ProgressPublisher(self.request.id)
+    
+    def enter_stage(stage: str, progress: int, **detail):
+        self.update_state(state="STARTED", meta={"stage": stage, "progress": progress})
+        publisher.publish(stage, progress, **detail)
+    
     try:
-        # 阶段 1: 解析 PDF (10%)
-        self.update_state(
-            state="STARTED",
-            meta={"stage": "parsing", "progress": 10},
-        )
+        # 阶段 1: 解析 PDF 文本层 (0-20%)，扫描页 OCR (20-40%)
+        enter_stage("parsing", 0)
+        
+        def on_page(pages_parsed: int, total_pages: int):
+            publisher.publish(
+                "parsing",
+                20 * pages_parsed // total_pages,
+                pages_parsed=pages_parsed,
+                total_pages=total_pages,
+            )
+        
+        def on_ocr_page(pages_recognized: int, ocr_pages: int):
+            if pages_recognized == 1:
+                self.update_state(state="STARTED", meta={"stage": "ocr", "progress": 20})
+            publisher.publish(
+                "ocr",
+                20 + 20 * pages_recognized // ocr_pages,
+                pages_recognized=pages_recognized,
+                ocr_pages=ocr_pages,
+            )
+        
+        previous = load_previous_version(store, document_id)
         
         parser = PDFParser()
-        result = parser.parse_pdf(Path(file_path))
+        with observe_stage("parse"):
+            result = parser.parse_pdf(
+                Path(file_path),
+                on_page=on_page,
+                on_ocr_page=on_ocr_page,
+                previous_pages=previous.pages if previous else None,
+            )
         
-        # 阶段 2: 清洗与分块 (50%)
-        self.update_state(
-            state="STARTED",
-            meta={"stage": "chunking", "progress": 50},
-        )
+        # 阶段 2: 清洗与分块 (40%)
+        enter_stage("chunking", 40, total_pages=result["total_pages"])
         
         # 使用 asyncio.run 运行异步函数
-        chunks = asyncio.run(clean_and_chunk(result["pages"]))
-        
-        # 阶段 3: 向量化 (80%)
-        self.update_state(
-            state="STARTED",
-            meta={"stage": "embedding", "progress": 80},
+        with observe_stage("chunk"):
+            chunks = asyncio.run(clean_and_chunk(result["pages"]))
+        embedder = Embedder()
+        chunk_changes = (
+            reuse_chunk_ids(chunks, previous.chunks, embedder.model_name, previous.model)
+            if previous else None
         )
         
-        embedder = Embedder()
-        chunks_with_embeddings = asyncio.run(embedder.embed_chunks(chunks))
+        # 近重复分块沿用规范分块的向量（文档内的重复在规范分块向量化后复制）
+        with observe_stage("dedup"):
+            near_duplicates = link_near_duplicates(document_id, chunks)
+            if near_duplicates is not None:
+                near_duplicates["embeddings_reused"] = reuse_canonical_embeddings(
+                    store, document_id, chunks, embedder.model_name
+                )
         
-        # 阶段 4: 存储（暂时跳过，直接返回）(95%)
-        self.update_state(
-            state="STARTED",
-            meta={"stage": "indexing", "progress": 95},
-        )
+        # 阶段 3: 向量化 (50-90%)，只处理新增或变化的分块
+        to_embed = [
+            chunk for chunk in chunks
+            if "embedding" not in chunk and not is_local_duplicate(chunk, document_id)
+        ]
+        enter_stage("embedding", 50, chunks_embedded=0, total_chunks=len(to_embed))
+        
+        def on_embedded(chunks_embedded: int, total_chunks: int):
+            publisher.publish(
+                "embedding",
+                50 + 40 * chunks_embedded // total_chunks,
+                chunks_embedded=chunks_embedded,
+                total_chunks=total_chunks,
+            )
+        
+        with observe_stage("embed"):
+            asyncio.run(embedder.embed_chunks(to_embed, on_progress=on_embedded))
+        if near_duplicates is not None:
+            near_duplicates["embeddings_reused"] += copy_local_embeddings(document_id, chunks)
         
+        # 阶段 4: 存储 (95%)
+        enter_stage("indexing", 95)
+        
+        # 完整分块与向量写入 Blob 存储，结果中只保留引用和预览
         # TODO: 将 chunks 存储到向量数据库
+        with observe_stage("index"):
+            artifacts = store.save(document_id, chunks, model=embedder.model_name)
+            artifacts["pages"] = store.save_pages(document_id, result["pages"])
+        
+        publisher.publish(
+            "completed", 100, status="success", document_id=document_id,
+            chunks_count=len(chunks),
+            embedding_cache=embedder.cache_stats,
+            near_duplicates=near_duplicates,
+        )
         
         # 完成
         return {
+            "document_id": document_id,
             "filename": result["filename"],
             "total_pages": result["total_pages"],
-            "chunks_count": len(chunks_with_embeddings),
-            "chunks": [
-                {
-                    "chunk_id": chunk["chunk_id"],
-                    "text": chunk["text"][:100] + "..." if len(chunk["text"]) > 100 else chunk["text"],
-                    "pages": chunk["pages"],
-                    "tokens": chunk["tokens"],
-                }
-                for chunk in chunks_with_embeddings[:5]  # 只返回前5个用于预览
-            ],
+            "ocr_pages": sum(1 for page in result["pages"] if page.get("ocr")),
+            "reused_pages": result["reused_pages"],
+            "chunk_changes": chunk_changes,
+            "embedding_cache": embedder.cache_stats,
+            "near_duplicates": near_duplicates,
+            "chunks_count": len(chunks),
+            "chunks": preview_chunks(chunks),
+            "artifacts": artifacts,
         }
     except FileNotFoundError:
-        self.update_state(
-            state="FAILURE",
-            meta={"error": f"文件不存在: {file_path}"},
-        )
+        error = f"文件不存在: {file_path}"
+        self.update_state(state="FAILURE", meta={"error": error})
+        publisher.publish("failed", 0, status="failure", error=error)
         raise
     except Exception as e:
-        self.update_state(
-            state="FAILURE",
-            meta={"error": str(e)},
-        )
-        raise
\ No newline at end of file
+        self.update_state(state="FAILURE", meta={"error": str(e)})
+        publisher.publish("failed", 0, status="failure", error=str(e))
+        raise
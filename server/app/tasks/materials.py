@@ -1,5 +1,6 @@
 """学习素材生成任务"""
 
+from app.services.blob_store import put_task_artifact
 from app.tasks.worker import celery_app
 
 
@@ -14,7 +15,7 @@ def generate_quiz_task(self, chunk_id: str, profile_id: str, count: int = 10):
         
         # TODO: 调用 LLM 生成测验题
         
-        return {
+        result = {
             "questions": [
                 {
                     "id": "q1",
@@ -27,6 +28,11 @@ def generate_quiz_task(self, chunk_id: str, profile_id: str, count: int = 10):
                 }
             ]
         }
+        
+        return {
+            "count": len(result["questions"]),
+            "artifact": put_task_artifact("materials/quiz", self.request.id, result),
+        }
     except Exception as e:
         self.update_state(state="FAILURE", meta={"error": str(e)})
         raise
@@ -43,7 +49,7 @@ def generate_mindmap_task(self, chunk_id: str, profile_id: str):
         
         # TODO: 调用 LLM 生成思维导图
         
-        return {
+        result = {
             "nodes": [
                 {"id": "n1", "label": "中心概念", "type": "root"},
                 {"id": "n2", "label": "子概念1", "type": "concept"},
@@ -52,6 +58,12 @@ def generate_mindmap_task(self, chunk_id: str, profile_id: str):
                 {"source": "n1", "target": "n2", "label": "关系"},
             ],
         }
+        
+        return {
+            "nodes_count": len(result["nodes"]),
+            "edges_count": len(result["edges"]),
+            "artifact": put_task_artifact("materials/mindmap", self.request.id, result),
+        }
     except Exception as e:
         self.update_state(state="FAILURE", meta={"error": str(e)})
         raise
@@ -68,7 +80,7 @@ def generate_immersive_task(self, chunk_id: str, profile_id: str):
         
         # TODO: 调用 LLM 生成沉浸式文本
         
-        return {
+        result = {
             "sections": [
                 {
                     "title": "第一节",
@@ -79,6 +91,11 @@ def generate_immersive_task(self, chunk_id: str, profile_id: str):
                 }
             ]
         }
+        
+        return {
+            "sections_count": len(result["sections"]),
+            "artifact": put_task_artifact("materials/immersive", self.request.id, result),
+        }
     except Exception as e:
         self.update_state(state="FAILURE", meta={"error": str(e)})
         raise
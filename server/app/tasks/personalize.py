@@ -2,11 +2,19 @@
 
 import asyncio
 
+from app.services.blob_store import put_task_artifact
+from app.services.progress import ProgressPublisher
 from app.tasks.worker import celery_app
 
 
 @celery_app.task(bind=True, name="personalize_text")
-def personalize_text_task(self, chunk_id: str, profile_id: str, original_text: str):
+def personalize_text_task(
+    self,
+    chunk_id: str,
+    profile_id: str,
+    original_text: str,
+    must_keep_terms: list[str] | None = None,
+):
     """
     个性化改写任务
     
@@ -14,6 +22,7 @@ def personalize_text_task(self, chunk_id: str, profile_id: str, original_text: s
         chunk_id: 文本块 ID
         profile_id: 用户画像 ID
         original_text: 原始文本
+        must_keep_terms: 必须保留的术语（改写与提示词压缩时都会保留）
         
     Returns:
         {
@@ -24,11 +33,14 @@ def personalize_text_task(self, chunk_id: str, profile_id: str, original_text: s
             "evaluation": Dict
         }
     """
+    publisher = ProgressPublisher(self.request.id)
+    
+    def enter_stage(stage: str, progress: int, **detail):
+        self.update_state(state="STARTED", meta={"stage": stage, "progress": progress})
+        publisher.publish(stage, progress, **detail)
+    
     try:
-        self.update_state(
-            state="STARTED",
-            meta={"stage": "loading_profile", "progress": 10},
-        )
+        enter_stage("loading_profile", 10)
         
         # 加载用户画像（这里模拟从数据库加载）
         # TODO: 从实际数据库加载
@@ -41,39 +53,41 @@ def personalize_text_task(self, chunk_id: str, profile_id: str, original_text: s
         grade = profile["grade"]
         interests = profile["interests"]
         
-        self.update_state(
-            state="STARTED",
-            meta={"stage": "analyzing_readability", "progress": 20},
-        )
+        enter_stage("analyzing_readability", 20)
         
         # 分析原文可读性
         from app.services.readability_service import get_readability_service
         readability_service = get_readability_service()
         original_readability = readability_service.analyze_readability(original_text, grade)
         
-        self.update_state(
-            state="STARTED",
-            meta={"stage": "personalizing", "progress": 40},
-        )
+        enter_stage("personalizing", 40)
         
         # 调用个性化服务进行改写
         from app.services.personalize_service import get_personalize_service
         personalize_service = get_personalize_service()
         
+        # 按原文长度粗略估计生成 token 数，用于折算 40%-70% 区间的进度
+        expected_tokens = max(1, len(original_text))
+        
+        def on_token(tokens_generated: int):
+            publisher.publish(
+                "personalizing",
+                40 + 30 * min(tokens_generated, expected_tokens) // expected_tokens,
+                tokens_generated=tokens_generated,
+            )
+        
         # 由于 Celery 任务是同步的，需要使用 asyncio.run
         result = asyncio.run(
             personalize_service.personalize_text(
                 original_text=original_text,
                 grade=grade,
                 interests=interests,
-                must_keep_terms=None,  # TODO: 从配置或参数中获取
+                must_keep_terms=must_keep_terms,
+                on_token=on_token,
             )
         )
         
-        self.update_state(
-            state="STARTED",
-            meta={"stage": "evaluating", "progress": 70},
-        )
+        enter_stage("evaluating", 70)
         
         # 评测改写质量
         from app.services.evaluation_service import get_evaluation_service
@@ -93,7 +107,7 @@ def personalize_text_task(self, chunk_id: str, profile_id: str, original_text: s
             meta={"stage": "completed", "progress": 100},
         )
         
-        return {
+        full_result = {
             "chunk_id": chunk_id,
             "profile_id": profile_id,
             "personalized_text": result["personalized_text"],
@@ -103,9 +117,24 @@ def personalize_text_task(self, chunk_id: str, profile_id: str, original_text: s
             "evaluation": evaluation,
         }
         
+        # 完整结果写入 Blob 存储，Celery 结果只保留摘要和引用
+        personalized_text = result["personalized_text"]
+        artifact = put_task_artifact("personalize", self.request.id, full_result)
+        publisher.publish("completed", 100, status="success", artifact=artifact)
+        
+        return {
+            "chunk_id": chunk_id,
+            "profile_id": profile_id,
+            "preview": personalized_text[:200] + "..." if len(personalized_text) > 200 else personalized_text,
+            "overall_score": evaluation.get("overall_score"),
+            "improvement": result["improvement"],
+            "artifact": artifact,
+        }
+        
     except Exception as e:
         self.update_state(
             state="FAILURE",
             meta={"error": str(e)},
         )
+        publisher.publish("failed", 0, status="failure", error=str(e))
         raise
@@ -1,8 +1,10 @@
 """Celery Worker 实例配置"""
 
 from celery import Celery
+from celery.signals import worker_init, worker_process_init
 
 from app.config import get_settings
+from app.services.tracing import init_tracing, instrument_celery
 
 settings = get_settings()
 
@@ -18,6 +20,7 @@ celery_app.conf.update(
     task_serializer="json",
     accept_content=["json"],
     result_serializer="json",
+    result_expires=settings.celery_result_expires,  # 大对象写入 Blob 存储，结果只保留引用
     timezone="UTC",
     enable_utc=True,
     task_track_started=True,
@@ -27,6 +30,9 @@ celery_app.conf.update(
     worker_max_tasks_per_child=1000,
 )
 
+# 发布任务时注入 trace 上下文，执行时继续
+instrument_celery()
+
 # 自动发现任务
 celery_app.autodiscover_tasks(
     [
@@ -36,3 +42,18 @@ celery_app.autodiscover_tasks(
         "app.tasks.scoring",
     ]
 )
+
+
+@worker_init.connect
+def start_metrics_server(**kwargs):
+    """Worker 启动时暴露 Prometheus 指标（METRICS_WORKER_PORT=0 时不启用）"""
+    if settings.metrics_worker_port:
+        from app.services.metrics import start_worker_metrics_server
+
+        start_worker_metrics_server(settings.metrics_worker_port)
+
+
+@worker_process_init.connect
+def start_tracing(**kwargs):
+    """在每个 Worker 子进程中初始化追踪（导出线程需在 fork 之后启动）"""
+    init_tracing(f"{settings.app_name}-worker")
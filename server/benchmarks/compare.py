@@ -0,0 +1,103 @@
+"""基准结果对比：将 pytest-benchmark 的 JSON 输出与基线比较
+
+用法（在 server/ 目录下）：
+    pytest benchmarks --no-cov --benchmark-json=.benchmarks/current.json
+    python -m benchmarks.compare .benchmarks/current.json            # 超过阈值则退出码为 1
+    python -m benchmarks.compare .benchmarks/current.json --update   # 用本次结果更新基线
+
+以中位数比较（对偶发抖动不敏感），阈值按 group 配置在 thresholds.json。
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+DEFAULT_BASELINE = BENCH_DIR / "baselines" / "baseline.json"
+THRESHOLDS = BENCH_DIR / "thresholds.json"
+
+
+def summarize(report: dict) -> dict:
+    """从 pytest-benchmark 报告中提取基线需要的字段"""
+    machine = report.get("machine_info", {})
+    return {
+        "machine": {
+            "python": machine.get("python_version"),
+            "cpu": machine.get("cpu", {}).get("brand_raw"),
+            "system": machine.get("system"),
+        },
+        "benchmarks": {
+            bench["fullname"]: {
+                "group": bench.get("group"),
+                "median": bench["stats"]["median"],
+                "mean": bench["stats"]["mean"],
+                "rounds": bench["stats"]["rounds"],
+                "extra_info": bench.get("extra_info", {}),
+            }
+            for bench in report["benchmarks"]
+        },
+    }
+
+
+def compare(baseline: dict, current: dict, thresholds: dict) -> list[dict]:
+    """逐项比较中位数，返回每个基准的对比结果"""
+    rows = []
+    for name, bench in current["benchmarks"].items():
+        base = baseline["benchmarks"].get(name)
+        limit = thresholds["groups"].get(bench["group"], thresholds["default"])
+        if base is None:
+            rows.append({"name": name, "status": "new", "current": bench["median"]})
+            continue
+        change = bench["median"] / base["median"] - 1
+        rows.append({
+            "name": name,
+            "status": "regressed" if change > limit else "ok",
+            "baseline": base["median"],
+            "current": bench["median"],
+            "change": change,
+            "limit": limit,
+        })
+    return rows
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="对比基准结果与基线")
+    parser.add_argument("current", type=Path, help="pytest --benchmark-json 输出文件")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--update", action="store_true", help="用本次结果覆盖基线")
+    args = parser.parse_args(argv)
+
+    current = summarize(json.loads(args.current.read_text(encoding="utf-8")))
+
+    if args.update:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(
+            json.dumps(current, ensure_ascii=False, indent=2) + "\n", encoding="utf-8"
+        )
+        print(f"✅ 基线已更新: {args.baseline}")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    thresholds = json.loads(THRESHOLDS.read_text(encoding="utf-8"))
+    rows = compare(baseline, current, thresholds)
+
+    for row in rows:
+        if row["status"] == "new":
+            print(f"🆕 {row['name']}: {row['current'] * 1000:.3f} ms（基线中不存在）")
+            continue
+        icon = "❌" if row["status"] == "regressed" else "✅"
+        print(
+            f"{icon} {row['name']}: {row['baseline'] * 1000:.3f} ms → {row['current'] * 1000:.3f} ms "
+            f"({row['change']:+.1%}, 阈值 +{row['limit']:.0%})"
+        )
+
+    regressed = [row for row in rows if row["status"] == "regressed"]
+    if regressed:
+        print(f"\n❌ {len(regressed)} 项基准超过回归阈值")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""提示词压缩评测：比较压缩前后的改写质量与 token 节省
+
+调用 EvaluationService.evaluate_compression，对每个文本分别用原文和压缩文本改写，
+再对照原文评测。需要可用的 LLM（真实 API 或 mock_llm，见 README）。
+
+用法（在 server/ 目录下）：
+    python -m benchmarks.compression lesson1.txt lesson2.txt --grade 5 --interests 足球,恐龙
+    python -m benchmarks.compression lesson.txt --terms 光合作用,叶绿体 --ratio 0.5 \\
+        --json .benchmarks/compression.json --max-overall-drop 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from app.services.evaluation_service import get_evaluation_service
+
+
+def _split(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    service = get_evaluation_service()
+    reports = []
+    for path in args.texts:
+        report = await service.evaluate_compression(
+            Path(path).read_text(encoding="utf-8"),
+            args.grade,
+            _split(args.interests),
+            _split(args.terms) or None,
+            ratio=args.ratio,
+        )
+        report["file"] = str(path)
+        reports.append(report)
+        print(
+            f"{path}: {report['original_tokens']} -> {report['compressed_tokens']} tokens "
+            f"(节省 {report['saved_tokens']}), overall Δ {report['overall_delta']:+.3f}, "
+            f"术语覆盖 Δ {report['term_coverage_delta']:+.3f}"
+        )
+    return reports
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="评测提示词压缩对改写质量的影响")
+    parser.add_argument("texts", nargs="+", help="UTF-8 文本文件")
+    parser.add_argument("--grade", type=int, default=5)
+    parser.add_argument("--interests", default="日常生活", help="逗号分隔")
+    parser.add_argument("--terms", default="", help="必须保留的术语，逗号分隔")
+    parser.add_argument("--ratio", type=float, default=None, help="默认取 PROMPT_COMPRESSION_RATIO")
+    parser.add_argument("--json", type=Path, default=None, help="把完整报告写入该文件")
+    parser.add_argument(
+        "--max-overall-drop", type=float, default=None,
+        help="平均 overall 得分下降超过该值时退出码为 1",
+    )
+    args = parser.parse_args()
+
+    reports = asyncio.run(run(args))
+    original = sum(r["original_tokens"] for r in reports)
+    saved = sum(r["saved_tokens"] for r in reports)
+    mean_delta = sum(r["overall_delta"] for r in reports) / len(reports)
+    print(f"\n合计节省 {saved}/{original} tokens（{saved / max(original, 1):.1%}），"
+          f"平均 overall Δ {mean_delta:+.3f}")
+
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        args.json.write_text(json.dumps(reports, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    if args.max_overall_drop is not None and mean_delta < -args.max_overall_drop:
+        print(f"❌ 压缩后平均得分下降超过 {args.max_overall_drop}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
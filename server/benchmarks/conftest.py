@@ -0,0 +1,37 @@
+"""基准测试公共 fixture
+
+所有输入都由固定随机种子合成，保证不同机器、不同次运行之间可复现。
+"""
+
+from pathlib import Path
+
+import httpx
+import pytest
+
+from app.services.llm_provider import OpenAICompatibleProvider
+from benchmarks.synthetic import build_pdf
+from mock_llm import MockLLMSettings, create_app
+
+
+@pytest.fixture(scope="session")
+def pdf_factory(tmp_path_factory):
+    """按页数（及是否为教材版式）生成并缓存合成 PDF"""
+    cache: dict[tuple[int, bool], Path] = {}
+
+    def factory(pages: int, textbook: bool = False) -> Path:
+        key = (pages, textbook)
+        if key not in cache:
+            name = f"synthetic_{pages}{'_textbook' if textbook else ''}.pdf"
+            cache[key] = build_pdf(tmp_path_factory.mktemp("pdf") / name, pages, textbook=textbook)
+        return cache[key]
+
+    return factory
+
+
+@pytest.fixture
+def mock_llm_provider():
+    """接入 mock LLM 服务（零延迟，进程内 ASGI 直连）的 Provider"""
+    app = create_app(MockLLMSettings(latency_ms=0, tokens_per_second=0, completion_tokens=150))
+    provider = OpenAICompatibleProvider(api_key="bench", model="bench-model", base_url="http://mock/v1")
+    provider.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+    return provider
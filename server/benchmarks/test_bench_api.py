@@ -0,0 +1,49 @@
+"""API 端到端延迟基准（LLM 使用零延迟的 mock_llm，排除网络与模型耗时）"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.evaluation_service import get_evaluation_service
+from app.services.personalize_service import get_personalize_service
+
+from benchmarks.synthetic import synthetic_text
+
+
+@pytest.fixture
+def client(monkeypatch, mock_llm_provider):
+    monkeypatch.setattr(get_personalize_service(), "llm_provider", mock_llm_provider)
+    monkeypatch.setattr(get_evaluation_service(), "llm_provider", mock_llm_provider)
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def profile_id(client):
+    client.post("/profiles", json={"user_id": "bench", "grade": 5, "interests": ["足球"]})
+    return "bench"
+
+
+def test_personalize_sync_latency(benchmark, client, profile_id):
+    """POST /personalize/sync：可读性分析 + 改写 + 评测"""
+    payload = {
+        "chunk_id": "bench",
+        "profile_id": profile_id,
+        "original_text": synthetic_text(800),
+    }
+    benchmark.group = "api"
+
+    response = benchmark(client.post, "/personalize/sync", json=payload)
+
+    assert response.status_code == 200
+
+
+def test_analyze_latency(benchmark, client):
+    """POST /personalize/analyze：纯 CPU 路径"""
+    benchmark.group = "api"
+
+    response = benchmark(
+        client.post, "/personalize/analyze", params={"text": synthetic_text(2000), "target_grade": 5}
+    )
+
+    assert response.status_code == 200
@@ -0,0 +1,59 @@
+"""分块存储读取与检索基准"""
+
+import random
+
+import pytest
+
+from app.services.blob_store import LocalBlobStore
+from app.services.chunk_store import ChunkStore
+
+N_CHUNKS = 5_000
+DIM = 1536
+
+
+@pytest.fixture(scope="module")
+def saved_store(tmp_path_factory):
+    """写入 N_CHUNKS 个带 1536 维向量的分块（固定种子）"""
+    rng = random.Random(42)
+    store = ChunkStore(LocalBlobStore(tmp_path_factory.mktemp("blobs")))
+    chunks = [
+        {
+            "chunk_id": f"chunk_{i:04d}",
+            "text": f"第{i}段合成正文，用于检索基准。" * 8,
+            "tokens": 100,
+            "pages": [i // 5 + 1],
+            "embedding": [rng.gauss(0, 1) for _ in range(DIM)],
+        }
+        for i in range(N_CHUNKS)
+    ]
+    store.save("bench", chunks)
+    return store, chunks[123]["embedding"]
+
+
+def test_search_load_all(benchmark, saved_store):
+    """旧路径：反序列化全部分块为 Python 对象后逐个计算相似度"""
+    store, query = saved_store
+    benchmark.group = "chunk_search"
+
+    def search():
+        chunks = store.load_all("bench")
+        q_norm = sum(v * v for v in query) ** 0.5
+        scores = [
+            sum(a * b for a, b in zip(chunk["embedding"], query))
+            / ((sum(v * v for v in chunk["embedding"]) ** 0.5) * q_norm)
+            for chunk in chunks
+        ]
+        return max(range(len(scores)), key=scores.__getitem__)
+
+    assert benchmark.pedantic(search, rounds=3) == 123
+
+
+def test_search_matrix(benchmark, saved_store):
+    """列式路径：内存映射向量矩阵 + NumPy 暴力检索"""
+    store, query = saved_store
+    benchmark.group = "chunk_search"
+
+    def search():
+        return store.open_matrix("bench").search(query, top_k=5)[0][0]
+
+    assert benchmark.pedantic(search, rounds=10) == 123
@@ -0,0 +1,73 @@
+"""PDF 解析与分块基准"""
+
+import asyncio
+
+import pytest
+
+from app.services.pdf_parser import PDFParser, TextCleaner, clean_and_chunk, strip_repeated_blocks
+
+
+@pytest.mark.parametrize("pages", [10, 100, 1000])
+def test_parse_pdf(benchmark, pdf_factory, pages):
+    """PDFParser.parse_pdf 在 10 / 100 / 1000 页合成 PDF 上的耗时"""
+    path = pdf_factory(pages)
+    parser = PDFParser()
+    benchmark.group = "parse_pdf"
+    benchmark.extra_info["pages"] = pages
+
+    result = benchmark.pedantic(parser.parse_pdf, args=(path,), rounds=3 if pages >= 1000 else 5)
+
+    assert result["total_pages"] == pages
+
+
+@pytest.mark.parametrize("mode", ["greedy", "section"])
+@pytest.mark.parametrize("pages", [100, 1000])
+def test_clean_and_chunk(benchmark, pdf_factory, pages, mode):
+    """clean_and_chunk 吞吐（extra_info 记录每秒处理的块数和产出分块数）"""
+    pages_data = PDFParser().parse_pdf(pdf_factory(pages))["pages"]
+    blocks = sum(len(page["blocks"]) for page in pages_data)
+    benchmark.group = "clean_and_chunk"
+    benchmark.extra_info.update(pages=pages, blocks=blocks, mode=mode)
+
+    chunks = benchmark(lambda: asyncio.run(clean_and_chunk(pages_data, mode=mode)))
+
+    benchmark.extra_info["blocks_per_second"] = round(blocks / benchmark.stats.stats.mean)
+    benchmark.extra_info["chunks"] = len(chunks)
+    assert chunks
+
+
+def test_strip_repeated_blocks(benchmark, pdf_factory):
+    """500 页教材版式 PDF 去页眉页脚 / 水印的耗时，以及分块数与 token 数的减少"""
+    pages_data = PDFParser().parse_pdf(pdf_factory(500, textbook=True))["pages"]
+    benchmark.group = "strip_repeated_blocks"
+
+    _, removed = benchmark(strip_repeated_blocks, pages_data)
+
+    raw = asyncio.run(clean_and_chunk(pages_data, strip_repeated=False))
+    stripped = asyncio.run(clean_and_chunk(pages_data))
+    benchmark.extra_info.update(
+        pages=500,
+        removed_blocks=removed,
+        chunks_before=len(raw),
+        chunks_after=len(stripped),
+        tokens_before=sum(chunk["tokens"] for chunk in raw),
+        tokens_after=sum(chunk["tokens"] for chunk in stripped),
+    )
+    assert removed >= 3 * 500
+    assert len(stripped) < len(raw)
+
+
+@pytest.mark.parametrize("method", ["per_block", "batch"])
+def test_clean_text(benchmark, pdf_factory, method):
+    """1000 页文档全部块的文本清洗：逐块 clean_text 与 clean_batch 对比"""
+    pages_data = PDFParser().parse_pdf(pdf_factory(1000))["pages"]
+    texts = [block["text"] for page in pages_data for block in page["blocks"]] * 10
+    benchmark.group = "clean_text"
+    benchmark.extra_info["blocks"] = len(texts)
+
+    if method == "batch":
+        cleaned = benchmark(TextCleaner.clean_batch, texts)
+    else:
+        cleaned = benchmark(lambda: [TextCleaner.clean_text(text) for text in texts])
+
+    assert len(cleaned) == len(texts)
@@ -0,0 +1,22 @@
+"""可读性分析基准"""
+
+import pytest
+
+from app.services.readability_service import ReadabilityService
+
+from benchmarks.synthetic import synthetic_text
+
+
+@pytest.mark.parametrize("n_chars", [1_000, 10_000, 100_000, 1_000_000])
+def test_analyze_readability(benchmark, n_chars):
+    """ReadabilityService.analyze_readability 在 1k–1M 字符上的耗时"""
+    text = synthetic_text(n_chars)
+    service = ReadabilityService()
+    benchmark.group = "analyze_readability"
+    benchmark.extra_info["chars"] = n_chars
+
+    result = benchmark.pedantic(
+        service.analyze_readability, args=(text, 5), rounds=3 if n_chars >= 1_000_000 else 10
+    )
+
+    assert 1 <= result["estimated_grade"] <= 12
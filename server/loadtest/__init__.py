@@ -0,0 +1 @@
+"""FastAPI + Celery 全链路压测（asyncio + httpx）"""
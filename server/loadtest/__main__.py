@@ -0,0 +1,78 @@
+"""压测入口
+
+用法（在 server/ 目录下，先启动 mock_llm、API 与 Celery Worker）：
+    python -m loadtest --scenario mixed --concurrency 8 --duration 60
+    python -m loadtest --ramp 1,2,4,8,16,32 --duration 30 --json .benchmarks/load.json
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import httpx
+
+from loadtest.harness import SCENARIOS, Stats, Workload, find_saturation, format_level, level_totals, run_level
+
+
+async def run(args: argparse.Namespace) -> int:
+    levels_to_run = [int(c) for c in args.ramp.split(",")] if args.ramp else [args.concurrency]
+    limits = httpx.Limits(max_connections=max(levels_to_run) * 4)
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        workload = Workload(
+            client,
+            Stats(),
+            pdf_pages=args.pdf_pages,
+            burst_size=args.burst_size,
+            poll=not args.no_poll,
+        )
+        await workload.setup()
+
+        levels = []
+        for concurrency in levels_to_run:
+            level = await run_level(workload, args.scenario, concurrency, args.duration, seed=args.seed)
+            levels.append(level)
+            print(format_level(level) + "\n")
+
+    saturation = find_saturation(levels, args.slo_p95_ms, args.slo_error_rate)
+    if args.ramp:
+        print(f"📈 饱和点：并发 {saturation['concurrency']}（{saturation['reason']}）")
+
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        args.json.write_text(
+            json.dumps({"levels": levels, "saturation": saturation}, ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+
+    # 单级运行时按 SLO 给出退出码，便于在 CI 中把关
+    if not args.ramp:
+        totals = level_totals(levels[0])
+        if totals["p95_ms"] > args.slo_p95_ms or totals["error_rate"] > args.slo_error_rate:
+            print(f"❌ 未达到 SLO：p95 {totals['p95_ms']:.0f}ms，错误率 {totals['error_rate']:.2%}")
+            return 1
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="LearnYourWay 压测工具")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--concurrency", type=int, default=4, help="虚拟用户数")
+    parser.add_argument("--ramp", help="阶梯加压的并发序列，如 1,2,4,8,16")
+    parser.add_argument("--duration", type=float, default=30.0, help="每级持续秒数")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单个请求超时")
+    parser.add_argument("--pdf-pages", type=int, default=10)
+    parser.add_argument("--burst-size", type=int, default=5, help="每次个性化突发的任务数")
+    parser.add_argument("--no-poll", action="store_true", help="只测提交接口，不轮询任务结果")
+    parser.add_argument("--slo-p95-ms", type=float, default=2000.0)
+    parser.add_argument("--slo-error-rate", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", type=Path, help="将结果写入 JSON 文件")
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""压测工具
+
+以虚拟用户（协程）驱动混合负载：
+- upload：上传合成 PDF，并轮询摄取任务直到结束
+- personalize：一次突发提交多个个性化任务，并轮询结果
+- materials：并发请求测验题 / 思维导图 / 沉浸式文本一整套素材
+
+按端点统计吞吐、p50/p95/p99 延迟和错误率；异步任务额外记录「提交到完成」的端到端耗时
+（task:*），用于衡量 Celery 池的排队与处理能力。阶梯加压时逐级提高并发，
+吞吐不再增长或违反 SLO 即视为到达饱和点。
+"""
+
+import asyncio
+import math
+import random
+import re
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+import httpx
+
+from benchmarks.synthetic import build_pdf_bytes, synthetic_text
+
+TERMINAL_STATUSES = {"success", "failure"}
+
+
+def percentile(values: list[float], q: float) -> float:
+    """最近秩法百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+@dataclass
+class Stats:
+    """按端点汇总的延迟与错误"""
+
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    def record(self, name: str, latency: float, ok: bool) -> None:
+        self.latencies[name].append(latency)
+        if not ok:
+            self.errors[name] += 1
+
+    def summary(self, elapsed: float) -> dict[str, dict[str, float]]:
+        result = {}
+        for name, values in sorted(self.latencies.items()):
+            count = len(values)
+            result[name] = {
+                "count": count,
+                "rps": round(count / elapsed, 2) if elapsed else 0.0,
+                "error_rate": round(self.errors[name] / count, 4),
+                "p50_ms": round(percentile(values, 50) * 1000, 1),
+                "p95_ms": round(percentile(values, 95) * 1000, 1),
+                "p99_ms": round(percentile(values, 99) * 1000, 1),
+            }
+        return result
+
+
+class Workload:
+    """压测动作集合"""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        stats: Stats,
+        pdf_pages: int = 10,
+        burst_size: int = 5,
+        poll: bool = True,
+        poll_interval: float = 0.5,
+        task_timeout: float = 300.0,
+        profile_id: str = "loadtest",
+    ):
+        self.client = client
+        self.stats = stats
+        self.pdf_bytes = build_pdf_bytes(pdf_pages)
+        self.text = synthetic_text(800)
+        self.burst_size = burst_size
+        self.poll = poll
+        self.poll_interval = poll_interval
+        self.task_timeout = task_timeout
+        self.profile_id = profile_id
+
+    async def request(self, name: str, method: str, url: str, **kwargs) -> httpx.Response | None:
+        """发送请求并记录延迟；网络异常计为错误"""
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.stats.record(name, time.perf_counter() - start, ok=False)
+            return None
+        self.stats.record(name, time.perf_counter() - start, ok=response.status_code < 400)
+        return response
+
+    async def setup(self) -> None:
+        """创建压测用画像"""
+        await self.client.post(
+            "/profiles", json={"user_id": self.profile_id, "grade": 5, "interests": ["足球"]}
+        )
+
+    async def wait_task(self, name: str, status_url: str, submitted: float) -> None:
+        """轮询任务直到结束，记录提交到完成的耗时"""
+        deadline = submitted + self.task_timeout
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            response = await self.request(f"GET {name} status", "GET", status_url)
+            if response is None or response.status_code >= 400:
+                continue
+            status = response.json()["data"]["status"]
+            if status in TERMINAL_STATUSES:
+                self.stats.record(f"task:{name}", time.perf_counter() - submitted, ok=status == "success")
+                return
+        self.stats.record(f"task:{name}", time.perf_counter() - submitted, ok=False)
+
+    async def upload(self) -> None:
+        submitted = time.perf_counter()
+        response = await self.request(
+            "POST /ingest/pdf", "POST", "/ingest/pdf",
+            files={"file": ("loadtest.pdf", self.pdf_bytes, "application/pdf")},
+        )
+        if self.poll and response is not None and response.status_code < 400:
+            task_id = response.json()["data"]["task_id"]
+            await self.wait_task("ingest", f"/ingest/tasks/{task_id}", submitted)
+
+    async def personalize_burst(self) -> None:
+        async def one() -> None:
+            submitted = time.perf_counter()
+            response = await self.request("POST /personalize", "POST", "/personalize", json={
+                "chunk_id": uuid.uuid4().hex[:12],  # task_id 由 chunk_id 派生，需保证唯一
+                "profile_id": self.profile_id,
+                "original_text": self.text,
+            })
+            if self.poll and response is not None and response.status_code < 400:
+                task_id = response.json()["data"]["task_id"]
+                await self.wait_task("personalize", f"/personalize/tasks/{task_id}", submitted)
+
+        await asyncio.gather(*(one() for _ in range(self.burst_size)))
+
+    async def material_bundle(self) -> None:
+        start = time.perf_counter()
+        payload = {"chunk_id": "loadtest", "profile_id": self.profile_id, "content": self.text}
+        responses = await asyncio.gather(
+            self.request("POST /materials/quiz", "POST", "/materials/quiz", json={**payload, "count": 5}),
+            self.request("POST /materials/mindmap", "POST", "/materials/mindmap", json=payload),
+            self.request("POST /materials/immersive", "POST", "/materials/immersive", json=payload),
+        )
+        ok = all(r is not None and r.status_code < 400 for r in responses)
+        self.stats.record("bundle:materials", time.perf_counter() - start, ok=ok)
+
+
+# 场景：动作名 → 权重
+SCENARIOS: dict[str, dict[str, int]] = {
+    "mixed": {"upload": 1, "personalize": 2, "materials": 2},
+    "upload": {"upload": 1},
+    "personalize": {"personalize": 1},
+    "materials": {"materials": 1},
+}
+
+
+def _actions(workload: Workload) -> dict[str, Callable[[], Awaitable[None]]]:
+    return {
+        "upload": workload.upload,
+        "personalize": workload.personalize_burst,
+        "materials": workload.material_bundle,
+    }
+
+
+async def run_level(
+    workload: Workload,
+    scenario: str,
+    concurrency: int,
+    duration: float,
+    seed: int = 42,
+) -> dict[str, Any]:
+    """以固定并发运行一段时间，返回该级别的汇总"""
+    weights = SCENARIOS[scenario]
+    actions = _actions(workload)
+    names = list(weights)
+    deadline = time.perf_counter() + duration
+
+    async def user(index: int) -> None:
+        rng = random.Random(seed + index)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights=[weights[n] for n in names])[0]
+            await actions[name]()
+
+    workload.stats = Stats()
+    start = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "elapsed": round(elapsed, 2),
+        "queue_length": await scrape_queue_length(workload.client),
+        "endpoints": workload.stats.summary(elapsed),
+    }
+
+
+async def scrape_queue_length(client: httpx.AsyncClient) -> int | None:
+    """从 /metrics 读取 Celery 队列长度（未暴露时返回 None）"""
+    try:
+        response = await client.get("/metrics")
+    except httpx.HTTPError:
+        return None
+    match = re.search(r'^celery_queue_length\{queue="celery"\} (\S+)$', response.text, re.MULTILINE)
+    return int(float(match.group(1))) if match else None
+
+
+def level_totals(level: dict[str, Any]) -> dict[str, float]:
+    """汇总一个级别中直接请求（排除 task:* / bundle:* 聚合项）的吞吐、错误率和 p95"""
+    endpoints = {k: v for k, v in level["endpoints"].items() if ":" not in k}
+    count = sum(e["count"] for e in endpoints.values())
+    errors = sum(e["count"] * e["error_rate"] for e in endpoints.values())
+    return {
+        "rps": sum(e["rps"] for e in endpoints.values()),
+        "error_rate": errors / count if count else 0.0,
+        "p95_ms": max((e["p95_ms"] for e in endpoints.values()), default=0.0),
+    }
+
+
+def find_saturation(
+    levels: list[dict[str, Any]],
+    slo_p95_ms: float,
+    slo_error_rate: float,
+    min_gain: float = 0.1,
+) -> dict[str, Any]:
+    """
+    找出饱和点：吞吐增幅低于 min_gain，或 p95 / 错误率违反 SLO 的前一级
+
+    Returns:
+        {"concurrency": 最后一个健康级别的并发（None 表示第一级即不达标）, "reason": str}
+    """
+    previous = None
+    for level in levels:
+        totals = level_totals(level)
+        if totals["error_rate"] > slo_error_rate:
+            reason = f"错误率 {totals['error_rate']:.2%} 超过 SLO"
+        elif totals["p95_ms"] > slo_p95_ms:
+            reason = f"p95 {totals['p95_ms']:.0f}ms 超过 SLO"
+        elif previous is not None and totals["rps"] < previous[1] * (1 + min_gain):
+            reason = f"吞吐增幅低于 {min_gain:.0%}"
+        else:
+            previous = (level["concurrency"], totals["rps"])
+            continue
+        return {
+            "concurrency": previous[0] if previous else None,
+            "reason": f"并发 {level['concurrency']} 时{reason}",
+        }
+    return {"concurrency": previous[0] if previous else None, "reason": "未达到饱和"}
+
+
+def format_level(level: dict[str, Any]) -> str:
+    """将级别汇总格式化为表格文本"""
+    lines = [
+        f"并发 {level['concurrency']}（{level['elapsed']}s，队列长度 {level['queue_length']}）",
+        f"{'端点':<32}{'次数':>8}{'RPS':>9}{'错误率':>9}{'p50':>10}{'p95':>10}{'p99':>10}",
+    ]
+    for name, e in level["endpoints"].items():
+        lines.append(
+            f"{name:<32}{e['count']:>8}{e['rps']:>9.2f}{e['error_rate']:>9.2%}"
+            f"{e['p50_ms']:>10.1f}{e['p95_ms']:>10.1f}{e['p99_ms']:>10.1f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,5 @@
+"""OpenAI 兼容的本地 mock LLM 服务（离线压测 / 基准测试用）"""
+
+from mock_llm.server import MockLLMSettings, create_app
+
+__all__ = ["MockLLMSettings", "create_app"]
@@ -0,0 +1,21 @@
+"""启动 mock LLM 服务：python -m mock_llm --port 9100"""
+
+import argparse
+
+import uvicorn
+
+from mock_llm.server import create_app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="OpenAI 兼容的本地 mock LLM 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    args = parser.parse_args()
+
+    print(f"🤖 Mock LLM on http://{args.host}:{args.port}/v1")
+    uvicorn.run(create_app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""OpenAI 兼容的 mock LLM 服务
+
+实现 /v1/chat/completions（流式与非流式）、/v1/embeddings、/v1/models，
+以及 Anthropic Messages API（/v1/messages，含流式与提示词缓存的 usage 字段），
+可配置延迟分布、生成速率、错误 / 429 注入，输出可复现：
+- 提示词中带 ```json 示例（测验题、思维导图、沉浸式文本、评测）时返回该示例，
+  结构与真实模型输出一致，生成器不会走降级分支
+- 可通过 canned 文件按关键词返回固定内容
+- 其余请求按消息内容哈希生成伪文本；随机数由 seed 决定
+
+通过 LLM_BASE_URL=http://localhost:9100/v1 接入，所有配置以 MOCK_LLM_ 为前缀读取环境变量。
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Literal
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+_JSON_EXAMPLE = re.compile(r"```json\s*(.*?)\s*```", re.DOTALL)
+
+# 伪文本字表
+_CHARS = "光合作用是植物利用阳光把水和二氧化碳变成养分的过程就像足球队员需要能量才能在球场上奔跑叶子里的叶绿体负责吸收光线"
+
+
+class MockLLMSettings(BaseSettings):
+    """mock LLM 配置"""
+
+    model_config = SettingsConfigDict(env_prefix="MOCK_LLM_", env_file=".env", extra="ignore")
+
+    seed: int = 42
+
+    # 首 token 延迟（毫秒）
+    latency_dist: Literal["fixed", "uniform", "normal", "lognormal"] = "fixed"
+    latency_ms: float = 200.0  # 均值 / 中位数
+    latency_jitter_ms: float = 50.0  # uniform 半宽 / normal 标准差 / lognormal 的对数标准差 × 100
+
+    # 生成速率：每秒输出的 token 数，0 表示立即返回
+    tokens_per_second: float = 50.0
+    completion_tokens: int = 200  # 自由文本的输出长度
+
+    # 故障注入（按请求概率）
+    error_rate: float = 0.0  # 返回 500
+    rate_limit_rate: float = 0.0  # 返回 429
+    retry_after: int = 1
+
+    embedding_dim: int = 1536
+
+    # 固定响应：[{"match": "关键词", "response": "文本或 JSON 对象"}]
+    canned_file: str = ""
+
+
+def _tokenize(text: str) -> list[str]:
+    """按 2 个字符切分为近似 token"""
+    return [text[i:i + 2] for i in range(0, len(text), 2)] or [""]
+
+
+class MockLLM:
+    """mock LLM 的行为模型（与 HTTP 层解耦，便于单独测试）"""
+
+    def __init__(self, settings: MockLLMSettings):
+        self.settings = settings
+        self.rng = random.Random(settings.seed)
+        self.canned = self._load_canned(settings.canned_file)
+        self.prompt_cache: set[str] = set()
+
+    @staticmethod
+    def _load_canned(path: str) -> list[dict[str, Any]]:
+        if not path:
+            return []
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+
+    def cache_prompt(self, prefix: str) -> bool:
+        """模拟提供方的提示词缓存：返回前缀是否已缓存（未缓存时写入）"""
+        key = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        if key in self.prompt_cache:
+            return True
+        self.prompt_cache.add(key)
+        return False
+
+    def sample_latency(self) -> float:
+        """按配置的分布采样首 token 延迟（秒）"""
+        s = self.settings
+        if s.latency_dist == "uniform":
+            ms = self.rng.uniform(s.latency_ms - s.latency_jitter_ms, s.latency_ms + s.latency_jitter_ms)
+        elif s.latency_dist == "normal":
+            ms = self.rng.gauss(s.latency_ms, s.latency_jitter_ms)
+        elif s.latency_dist == "lognormal":
+            ms = s.latency_ms * self.rng.lognormvariate(0, s.latency_jitter_ms / 100)
+        else:
+            ms = s.latency_ms
+        return max(ms, 0.0) / 1000
+
+    def sample_fault(self) -> int | None:
+        """按概率返回注入的错误状态码"""
+        roll = self.rng.random()
+        if roll < self.settings.rate_limit_rate:
+            return 429
+        if roll < self.settings.rate_limit_rate + self.settings.error_rate:
+            return 500
+        return None
+
+    def completion(self, messages: list[dict[str, str]]) -> str:
+        """生成回复内容（确定性）"""
+        prompt = "\n".join(m.get("content", "") for m in messages)
+
+        for entry in self.canned:
+            if entry["match"] in prompt:
+                response = entry["response"]
+                return response if isinstance(response, str) else json.dumps(response, ensure_ascii=False)
+
+        # 输出格式示例可能在 system 或 user 中，取最靠后的一个
+        for message in reversed(messages):
+            example = _JSON_EXAMPLE.search(message.get("content", ""))
+            if example:
+                return f"```json\n{example.group(1)}\n```"
+
+        digest = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+        text_rng = random.Random(digest)
+        n_chars = self.settings.completion_tokens * 2
+        return "".join(text_rng.choice(_CHARS) for _ in range(n_chars))
+
+    def embedding(self, text: str) -> list[float]:
+        """按文本哈希生成单位长度的伪向量"""
+        digest = int(hashlib.sha256(text.encode("utf-8")).hexdigest(), 16)
+        vec_rng = random.Random(digest)
+        vec = [vec_rng.gauss(0, 1) for _ in range(self.settings.embedding_dim)]
+        norm = sum(v * v for v in vec) ** 0.5 or 1.0
+        return [v / norm for v in vec]
+
+    def token_interval(self) -> float:
+        tps = self.settings.tokens_per_second
+        return 1 / tps if tps > 0 else 0.0
+
+
+def _usage(prompt: str, completion: str) -> dict[str, int]:
+    prompt_tokens = len(_tokenize(prompt))
+    completion_tokens = len(_tokenize(completion))
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def _block_text(content: str | list[dict[str, Any]]) -> str:
+    """Anthropic 消息内容（字符串或内容块列表）中的文本"""
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content)
+
+
+def _anthropic_usage(llm: MockLLM, body: dict[str, Any], completion: str) -> dict[str, int]:
+    """按 cache_control 断点计算缓存写入 / 读取的 token 数"""
+    system = body.get("system") or []
+    if isinstance(system, str):
+        system = [{"type": "text", "text": system}]
+
+    cached_prefix, prefix = "", ""
+    for block in system:
+        prefix += block.get("text", "")
+        if block.get("cache_control"):
+            cached_prefix = prefix
+    rest = prefix[len(cached_prefix):] + "".join(
+        _block_text(m.get("content", "")) for m in body.get("messages", [])
+    )
+
+    usage = {
+        "input_tokens": len(_tokenize(rest)),
+        "output_tokens": len(_tokenize(completion)),
+        "cache_creation_input_tokens": 0,
+        "cache_read_input_tokens": 0,
+    }
+    if cached_prefix:
+        kind = "cache_read_input_tokens" if llm.cache_prompt(cached_prefix) else "cache_creation_input_tokens"
+        usage[kind] = len(_tokenize(cached_prefix))
+    return usage
+
+
+def _sse(event: str, data: dict[str, Any]) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+def _fault_response(status: int, llm: MockLLM) -> JSONResponse:
+    if status == 429:
+        return JSONResponse(
+            {"error": {"message": "Rate limit exceeded (mock)", "type": "rate_limit_error"}},
+            status_code=429,
+            headers={"Retry-After": str(llm.settings.retry_after)},
+        )
+    return JSONResponse(
+        {"error": {"message": "Internal error (mock)", "type": "server_error"}}, status_code=500
+    )
+
+
+def create_app(settings: MockLLMSettings | None = None) -> FastAPI:
+    """创建 mock LLM 应用"""
+    llm = MockLLM(settings or MockLLMSettings())
+    app = FastAPI(title="Mock LLM", description="OpenAI 兼容的本地 mock LLM 服务")
+    app.state.llm = llm
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "mock-model", "object": "model", "owned_by": "mock"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        fault = llm.sample_fault()
+        if fault is not None:
+            return _fault_response(fault, llm)
+
+        messages = body.get("messages", [])
+        model = body.get("model", "mock-model")
+        content = llm.completion(messages)
+        tokens = _tokenize(content)
+        latency = llm.sample_latency()
+        interval = llm.token_interval()
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        if body.get("stream"):
+            async def events() -> AsyncIterator[bytes]:
+                await asyncio.sleep(latency)
+                for token in tokens:
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                    }
+                    yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8")
+                    if interval:
+                        await asyncio.sleep(interval)
+                done = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                }
+                yield f"data: {json.dumps(done)}\n\n".encode("utf-8")
+                yield b"data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        # 非流式：模拟首 token 延迟 + 完整生成耗时
+        await asyncio.sleep(latency + interval * len(tokens))
+        prompt = "\n".join(m.get("content", "") for m in messages)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": _usage(prompt, content),
+        }
+
+    @app.post("/v1/messages")
+    async def messages(request: Request):
+        body = await request.json()
+        fault = llm.sample_fault()
+        if fault is not None:
+            return _fault_response(fault, llm)
+
+        system = body.get("system") or ""
+        chat = [{"role": "system", "content": _block_text(system)}] if system else []
+        chat += [
+            {"role": m["role"], "content": _block_text(m.get("content", ""))}
+            for m in body.get("messages", [])
+        ]
+        model = body.get("model", "mock-model")
+        content = llm.completion(chat)
+        tokens = _tokenize(content)
+        usage = _anthropic_usage(llm, body, content)
+        latency = llm.sample_latency()
+        interval = llm.token_interval()
+        message = {
+            "id": f"msg_{uuid.uuid4().hex[:12]}",
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": [],
+            "stop_reason": None,
+            "usage": {**usage, "output_tokens": 0},
+        }
+
+        if body.get("stream"):
+            async def events() -> AsyncIterator[bytes]:
+                await asyncio.sleep(latency)
+                yield _sse("message_start", {"type": "message_start", "message": message})
+                yield _sse("content_block_start", {
+                    "type": "content_block_start", "index": 0,
+                    "content_block": {"type": "text", "text": ""},
+                })
+                for token in tokens:
+                    yield _sse("content_block_delta", {
+                        "type": "content_block_delta", "index": 0,
+                        "delta": {"type": "text_delta", "text": token},
+                    })
+                    if interval:
+                        await asyncio.sleep(interval)
+                yield _sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+                yield _sse("message_delta", {
+                    "type": "message_delta",
+                    "delta": {"stop_reason": "end_turn"},
+                    "usage": {"output_tokens": usage["output_tokens"]},
+                })
+                yield _sse("message_stop", {"type": "message_stop"})
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(latency + interval * len(tokens))
+        return {
+            **message,
+            "content": [{"type": "text", "text": content}],
+            "stop_reason": "end_turn",
+            "usage": usage,
+        }
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        fault = llm.sample_fault()
+        if fault is not None:
+            return _fault_response(fault, llm)
+
+        texts = body.get("input", [])
+        if isinstance(texts, str):
+            texts = [texts]
+        await asyncio.sleep(llm.sample_latency())
+        prompt_tokens = sum(len(_tokenize(t)) for t in texts)
+        return {
+            "object": "list",
+            "model": body.get("model", "mock-embedding"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": llm.embedding(text)}
+                for i, text in enumerate(texts)
+            ],
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+        }
+
+    return app
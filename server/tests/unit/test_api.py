@@ -60,3 +60,15 @@ def test_get_nonexistent_profile():
     """测试获取不存在的用户画像"""
     response = client.get("/profiles/nonexistent")
     assert response.status_code == 404
+
+
+def test_metrics_endpoint():
+    """测试 Prometheus 指标端点"""
+    client.get("/profiles/nonexistent")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/profiles/{user_id}",status="404"}' in body
+    assert "llm_request_duration_seconds" in body
@@ -0,0 +1,116 @@
+"""Blob 存储与大对象 API 单元测试"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.artifacts import parse_range
+from app.services import blob_store
+from app.services.blob_store import (
+    BlobNotFoundError,
+    LocalBlobStore,
+    put_jsonl,
+    read_jsonl,
+)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """使用临时目录的本地存储替换全局单例"""
+    local_store = LocalBlobStore(tmp_path)
+    monkeypatch.setattr(blob_store, "_blob_store", local_store)
+    return local_store
+
+
+def test_local_blob_store_roundtrip(store):
+    """测试写入与区间读取"""
+    size = store.put_bytes("a/b.bin", b"0123456789")
+
+    assert size == 10
+    assert store.exists("a/b.bin")
+    assert store.size("a/b.bin") == 10
+    assert store.get_bytes("a/b.bin") == b"0123456789"
+    assert store.get_bytes("a/b.bin", 2, 5) == b"234"
+
+    store.delete("a/b.bin")
+    assert not store.exists("a/b.bin")
+    with pytest.raises(BlobNotFoundError):
+        store.get_bytes("a/b.bin")
+
+
+def test_local_blob_store_rejects_traversal(store):
+    """测试禁止跳出根目录"""
+    with pytest.raises(ValueError):
+        store.put_bytes("../escape.bin", b"x")
+
+
+def test_jsonl_pagination(store):
+    """测试 JSON Lines 分页读取"""
+    put_jsonl(store, "items.jsonl", ({"i": i} for i in range(10)))
+
+    items, total = read_jsonl(store, "items.jsonl", offset=3, limit=4)
+
+    assert total == 10
+    assert [item["i"] for item in items] == [3, 4, 5, 6]
+
+
+def test_jsonl_pagination_reads_only_page_range(store, monkeypatch):
+    """按行偏移索引只读取当前页的字节区间；没有索引的早期对象读取整个对象"""
+    put_jsonl(store, "items.jsonl", ({"i": i} for i in range(10)))
+    assert store.exists("items.idx")
+
+    reads = []
+    get_bytes = store.get_bytes
+
+    def recording_get_bytes(key, start=0, end=None):
+        reads.append((key, start, end))
+        return get_bytes(key, start, end)
+
+    monkeypatch.setattr(store, "get_bytes", recording_get_bytes)
+    items, total = read_jsonl(store, "items.jsonl", offset=8, limit=5)
+    assert (total, [item["i"] for item in items]) == (10, [8, 9])
+    line = len(b'{"i":0}\n')
+    assert reads[-1] == ("items.jsonl", 8 * line, 10 * line)
+    assert read_jsonl(store, "items.jsonl", offset=10, limit=5) == ([], 10)
+
+    store.delete("items.idx")
+    items, total = read_jsonl(store, "items.jsonl", offset=8, limit=5)
+    assert (total, [item["i"] for item in items]) == (10, [8, 9])
+
+
+def test_parse_range():
+    """测试 Range 头解析"""
+    assert parse_range("bytes=0-3", 10) == (0, 4)
+    assert parse_range("bytes=5-", 10) == (5, 10)
+    assert parse_range("bytes=-3", 10) == (7, 10)
+    assert parse_range("bytes=8-100", 10) == (8, 10)
+
+    with pytest.raises(ValueError):
+        parse_range("bytes=10-12", 10)
+    with pytest.raises(ValueError):
+        parse_range("items=0-1", 10)
+
+
+def test_artifact_api_range_and_items(store):
+    """测试大对象 API 的区间读取与分页"""
+    from app.main import app
+
+    client = TestClient(app)
+    put_jsonl(store, "documents/doc1/chunks.jsonl", ({"chunk_id": f"c{i}"} for i in range(5)))
+    size = store.size("documents/doc1/chunks.jsonl")
+
+    response = client.get("/artifacts/documents/doc1/chunks.jsonl", headers={"Range": "bytes=0-9"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 0-9/{size}"
+    assert len(response.content) == 10
+
+    response = client.get("/artifacts/documents/doc1/chunks.jsonl/items?offset=2&limit=2")
+    data = response.json()["data"]
+    assert [item["chunk_id"] for item in data["items"]] == ["c2", "c3"]
+    assert data["total"] == 5
+    assert data["next_offset"] == 4
+
+    response = client.get("/artifacts/documents/doc1/chunks.jsonl", headers={"Range": "bytes=999-"})
+    assert response.status_code == 416
+
+    response = client.get("/artifacts/missing.json")
+    assert response.status_code == 404
@@ -0,0 +1,130 @@
+"""分块存储、结果存储与文档分块 API 单元测试"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.documents import decode_cursor, encode_cursor
+from app.services import blob_store, chunk_store
+from app.services.blob_store import LocalBlobStore
+from app.services.chunk_store import ChunkStore
+from app.services.result_store import TTLResultStore
+
+
+def _make_chunks(n: int) -> list[dict]:
+    return [
+        {
+            "chunk_id": f"chunk_{i:04d}",
+            "text": f"第{i}段内容",
+            "tokens": 5,
+            "pages": [i + 1],
+            "embedding": [float(i)] * 4,
+        }
+        for i in range(n)
+    ]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """使用临时目录的分块存储替换全局单例"""
+    local_store = LocalBlobStore(tmp_path)
+    monkeypatch.setattr(blob_store, "_blob_store", local_store)
+    monkeypatch.setattr(chunk_store, "_chunk_store", ChunkStore(local_store))
+    return chunk_store.get_chunk_store()
+
+
+def test_chunk_store_save_and_read(store):
+    """测试保存后按区间读取与字段投影"""
+    artifacts = store.save("doc1", _make_chunks(10))
+
+    assert artifacts["chunks"]["count"] == 10
+    assert artifacts["embeddings"]["shape"] == [10, 4]
+    assert store.count("doc1") == 10
+
+    lines, total = store.read_raw("doc1", 3, 2)
+    assert total == 10
+    assert lines[0].startswith(b'{"chunk_id":"chunk_0003"')
+    assert b"embedding" not in lines[0]
+
+    items, _ = store.iter_page("doc1", 0, 1, fields="metadata")
+    assert b'"text"' not in next(items)
+
+
+def test_ttl_result_store_bounded_and_expiring():
+    """测试结果存储的容量上限与过期"""
+    now = [0.0]
+    results = TTLResultStore(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+
+    results.set("a", 1)
+    results.set("b", 2)
+    results.set("c", 3)
+    assert "a" not in results
+    assert len(results) == 2
+
+    now[0] = 11
+    assert results.get("b") is None
+    assert len(results) == 0
+
+
+def test_cursor_roundtrip():
+    """测试分页游标编码"""
+    assert decode_cursor(encode_cursor(42)) == 42
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_list_document_chunks(store):
+    """测试文档分块游标分页"""
+    from app.main import app
+
+    client = TestClient(app)
+    store.save("doc1", _make_chunks(5))
+
+    response = client.get("/documents/doc1/chunks?limit=2&fields=text")
+    data = response.json()["data"]
+    assert data["total"] == 5
+    assert data["items"] == [
+        {"chunk_id": "chunk_0000", "text": "第0段内容"},
+        {"chunk_id": "chunk_0001", "text": "第1段内容"},
+    ]
+
+    seen = [item["chunk_id"] for item in data["items"]]
+    cursor = data["next_cursor"]
+    while cursor:
+        data = client.get(f"/documents/doc1/chunks?limit=2&cursor={cursor}").json()["data"]
+        seen.extend(item["chunk_id"] for item in data["items"])
+        cursor = data["next_cursor"]
+    assert seen == [f"chunk_{i:04d}" for i in range(5)]
+
+    assert client.get("/documents/missing/chunks").status_code == 404
+    assert client.get("/documents/doc1/chunks?cursor=bad").status_code == 400
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_chunk_matrix_memmap_and_search(store, monkeypatch, dtype):
+    """测试列式正文与向量矩阵的内存映射读取和暴力检索"""
+    import numpy as np
+
+    monkeypatch.setattr(chunk_store.settings, "embedding_dtype", dtype)
+    chunks = _make_chunks(6)
+    for i, chunk in enumerate(chunks):
+        chunk["embedding"] = [1.0 if d == i % 4 else 0.0 for d in range(4)]
+    chunks[5]["embedding"] = [0.0] * 4  # 占位零向量
+    artifacts = store.save("doc1", chunks)
+    assert artifacts["embeddings"]["dtype"] == dtype
+
+    matrix = store.open_matrix("doc1")
+    assert isinstance(matrix.embeddings, np.memmap)
+    assert matrix.embeddings.shape == (6, 4)
+    assert matrix.text(3) == "第3段内容"
+    assert matrix.chunk_ids[3] == "chunk_0003"
+
+    results = matrix.search([0.0, 0.0, 1.0, 0.1], top_k=2)
+    assert results[0][0] == 2
+    assert results[0][1] == pytest.approx(0.995, abs=1e-3)
+    assert [i for i, _ in matrix.search([0.0, 1.0, 0.0, 0.0], top_k=6)][:1] == [1]
+
+    # 重新保存为不带向量的分块后，旧矩阵被删除
+    store.save("doc1", [{"chunk_id": "chunk_0000", "text": "新"}])
+    matrix = store.open_matrix("doc1")
+    assert matrix.embeddings is None and matrix.search([1.0, 0, 0, 0]) == []
+    assert matrix.text(0) == "新"
@@ -0,0 +1,98 @@
+"""提示词压缩单元测试"""
+
+import pytest
+
+from app.services import evaluation_service
+from app.services.compressor import PromptCompressor, clean_text
+from app.services.evaluation_service import EvaluationService
+from app.services.personalize_service import PersonalizeService
+
+TEXT = """光合作用是指绿色植物利用光能，把二氧化碳和水转化成有机物并释放氧气的过程。  光合作用   主要在叶绿体中进行。
+光合作用是指绿色植物利用光能，把二氧化碳和水转化成有机物并释放氧气的过程。
+
+叶绿体中含有叶绿素，叶绿素能够吸收光能。今天天气很好，我们去公园玩了很久很久。
+光合作用的产物是葡萄糖和氧气。The light reaction happens in the thylakoid. It produces ATP and NADPH.
+"""
+
+
+def test_clean_text_removes_whitespace_noise_and_repeated_phrases():
+    assert clean_text("光合 作用  需要　阳光\r\n\n\n非常非常非常重要 , ok  go") == (
+        "光合作用需要阳光\n非常重要 , ok go"
+    )
+
+
+def test_rule_cleanup_only_drops_duplicates():
+    """比例为 1 时只做规则清理：删除重复句子，其余句子全部保留"""
+    result = PromptCompressor(ratio=1.0, min_tokens=0).compress(TEXT)
+
+    assert result.text.count("光合作用是指") == 1
+    assert "今天天气很好" in result.text
+    assert result.dropped_sentences == 1
+    assert result.saved_tokens > 0
+
+
+def test_extractive_compression_respects_budget_and_terms():
+    """抽取式删句：不超过目标预算，保留含必须术语的句子与关键定义句"""
+    compressor = PromptCompressor(ratio=0.5, min_tokens=0)
+    result = compressor.compress(TEXT, must_keep_terms=["NADPH"])
+
+    assert result.compressed_tokens <= result.original_tokens * 0.5
+    assert "NADPH" in result.text
+    assert "光合作用是指" in result.text
+    assert "今天天气很好" not in result.text
+    # 同一分块的多个提示词复用压缩结果
+    assert compressor.compress(TEXT, must_keep_terms=["NADPH"]) is result
+
+
+def test_short_text_is_not_extracted():
+    result = PromptCompressor(ratio=0.3, min_tokens=10_000).compress(TEXT)
+    assert "今天天气很好" in result.text
+
+
+class RecordingProvider:
+    def __init__(self):
+        self.prompts = []
+
+    async def chat(self, messages, **kwargs):
+        self.prompts.append(messages[-1]["content"])
+        return "改写结果：光合作用让植物制造食物。"
+
+
+@pytest.mark.asyncio
+async def test_evaluate_compression_reports_savings_and_score_delta(monkeypatch):
+    provider = RecordingProvider()
+    personalize = PersonalizeService()
+    personalize.llm_provider = provider
+    monkeypatch.setattr(evaluation_service, "get_personalize_service", lambda: personalize)
+    compressor = PromptCompressor(min_tokens=0)
+    monkeypatch.setattr(evaluation_service, "get_prompt_compressor", lambda: compressor)
+    service = EvaluationService()
+    service.llm_provider = provider
+
+    report = await service.evaluate_compression(TEXT, 5, ["足球"], ["NADPH"], ratio=0.5)
+
+    assert report["saved_tokens"] == report["original_tokens"] - report["compressed_tokens"] > 0
+    assert set(report["score_delta"]) == set(EvaluationService.EVALUATION_DIMENSIONS)
+    assert "overall_delta" in report and "term_coverage_delta" in report
+    # 一次改写用原文、一次用压缩文本；评测都对照原文
+    rewrites = [p for p in provider.prompts if "**改写后的文本**" not in p]
+    assert sum("今天天气很好" in p for p in rewrites) == 1
+
+
+@pytest.mark.asyncio
+async def test_material_generators_pass_must_keep_terms_to_compressor(monkeypatch):
+    """素材生成时 must_keep_terms 传入压缩，包含术语的句子不被删除"""
+    from app.services import compressor
+    from app.services.material_generator import QuizGenerator
+
+    monkeypatch.setattr(compressor.settings, "prompt_compression_enabled", True)
+    monkeypatch.setattr(compressor, "_prompt_compressor", PromptCompressor(ratio=0.3, min_tokens=0))
+    generator = QuizGenerator()
+    generator.llm_provider = RecordingProvider()
+
+    await generator.generate(TEXT, {"grade": 5, "interests": []}, count=3)
+    await generator.generate(TEXT, {"grade": 5, "interests": []}, count=3, must_keep_terms=["NADPH"])
+
+    without_terms, with_terms = generator.llm_provider.prompts
+    assert "NADPH" not in without_terms
+    assert "NADPH" in with_terms
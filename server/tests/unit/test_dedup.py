@@ -0,0 +1,94 @@
+"""近重复分块检测单元测试"""
+
+from app.services.blob_store import LocalBlobStore
+from app.services.chunk_store import ChunkStore
+from app.services.dedup import (
+    MemoryLSHStore,
+    MinHasher,
+    NearDuplicateIndex,
+    copy_local_embeddings,
+    estimate_similarity,
+    is_local_duplicate,
+    reuse_canonical_embeddings,
+)
+
+PASSAGE = (
+    "光合作用是绿色植物利用光能，把二氧化碳和水转化成储存能量的有机物，并且释放出氧气的过程。"
+    "光合作用主要在叶绿体中进行，叶绿素能够吸收光能。"
+)
+REVISED = PASSAGE.replace("并且释放出氧气", "同时释放氧气")
+OTHER = "牛顿第一定律指出，一切物体在没有受到外力作用时，总保持静止状态或匀速直线运动状态。"
+
+
+def _chunks(texts: list[str]) -> list[dict]:
+    return [{"chunk_id": f"chunk_{i:04d}", "text": t, "tokens": len(t)} for i, t in enumerate(texts)]
+
+
+def test_minhash_estimates_jaccard():
+    """签名估计的相似度接近 shingle 集合的 Jaccard 相似度"""
+    hasher = MinHasher(num_perm=256)
+    a, b = hasher.shingles(PASSAGE), hasher.shingles(REVISED)
+    jaccard = len(a & b) / len(a | b)
+    estimate = estimate_similarity(hasher.signature(PASSAGE), hasher.signature(REVISED))
+    assert abs(estimate - jaccard) < 0.1
+    assert estimate_similarity(hasher.signature(PASSAGE), hasher.signature(OTHER)) < 0.1
+
+
+def test_link_maps_near_duplicates_to_canonical():
+    """跨文档与文档内的近重复分块指向规范分块；重新摄取不会与自身旧版本匹配"""
+    index = NearDuplicateIndex(MemoryLSHStore(), threshold=0.7)
+
+    report = index.link("book_a", _chunks([PASSAGE, OTHER]))
+    assert report == {"near_duplicates": 0, "cross_document": 0, "tokens_saved": 0}
+
+    chunks_b = _chunks(["全新的内容，与已有教材都不相同，讲的是地球的自转和公转。", REVISED, REVISED])
+    report = index.link("book_b", chunks_b)
+    assert report["near_duplicates"] == 2 and report["cross_document"] == 2
+    assert report["tokens_saved"] == 2 * len(REVISED)
+    assert chunks_b[1]["canonical"]["document_id"] == "book_a"
+    assert chunks_b[1]["canonical"]["chunk_id"] == "chunk_0000"
+    assert 0.7 <= chunks_b[1]["canonical"]["similarity"] < 1.0
+    assert "canonical" not in chunks_b[0]
+
+    # 重新摄取 book_a：先移除旧索引项，分块不会被判为自身的重复
+    chunks_a = _chunks([PASSAGE, OTHER, OTHER])
+    report = index.link("book_a", chunks_a)
+    assert report["near_duplicates"] == 1
+    assert "canonical" not in chunks_a[0] and "canonical" not in chunks_a[1]
+    assert is_local_duplicate(chunks_a[2], "book_a")
+    assert chunks_a[2]["canonical"]["chunk_id"] == "chunk_0001"
+
+
+def test_reuse_embeddings_from_canonical(tmp_path):
+    """跨文档从规范分块所在文档的向量矩阵读取；文档内在向量化后复制"""
+    store = ChunkStore(LocalBlobStore(tmp_path))
+    index = NearDuplicateIndex(MemoryLSHStore(), threshold=0.7)
+
+    chunks_a = _chunks([PASSAGE, OTHER])
+    index.link("book_a", chunks_a)
+    chunks_a[0]["embedding"] = [0.25, 0.5]
+    chunks_a[1]["embedding"] = [1.0, 0.0]
+    store.save("book_a", chunks_a, model="embed-v1")
+
+    chunks_b = _chunks([REVISED, "地球自转一周的时间大约是二十四小时，这就是一天。", "地球自转一周的时间大约是二十四小时，这就是一天！"])
+    index.link("book_b", chunks_b)
+    # 嵌入模型不同时不沿用（向量空间不同）
+    assert reuse_canonical_embeddings(store, "book_b", chunks_b, "embed-v2") == 0
+    assert "embedding" not in chunks_b[0]
+    assert reuse_canonical_embeddings(store, "book_b", chunks_b, "embed-v1") == 1
+    assert chunks_b[0]["embedding"] == [0.25, 0.5]
+
+    # 规范分块是全零占位向量时不沿用，留待重新向量化
+    chunks_a[0]["embedding"] = [0.0, 0.0]
+    store.save("book_a", chunks_a, model="embed-v1")
+    chunks_c = _chunks([REVISED])
+    index.link("book_c", chunks_c)
+    assert chunks_c[0]["canonical"]["document_id"] == "book_a"
+    assert reuse_canonical_embeddings(store, "book_c", chunks_c, "embed-v1") == 0
+    assert "embedding" not in chunks_c[0]
+
+    assert is_local_duplicate(chunks_b[2], "book_b")
+    chunks_b[1]["embedding"] = [0.0, 1.0]
+    chunks_b[1]["embedding_dim"] = 2
+    assert copy_local_embeddings("book_b", chunks_b) == 1
+    assert chunks_b[2]["embedding"] == [0.0, 1.0]
@@ -0,0 +1,91 @@
+"""向量缓存单元测试"""
+
+import asyncio
+
+import redis
+
+from app.services.embedder import Embedder
+from app.services.embedding_cache import EmbeddingCache, cache_key
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.ops = []
+
+    def set(self, key, value, ex=None):
+        self.ops.append((key, value))
+
+    def execute(self):
+        self.client.data.update(self.ops)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class BrokenRedis:
+    def __init__(self):
+        self.calls = 0
+
+    def mget(self, keys):
+        self.calls += 1
+        raise redis.ConnectionError("down")
+
+
+def _fake_embedder(cache: EmbeddingCache) -> tuple[Embedder, list[list[str]]]:
+    """嵌入接口替换为按文本长度生成向量，并记录每次请求的文本"""
+    embedder = Embedder(cache=cache)
+    requests: list[list[str]] = []
+
+    async def embed_uncached(texts):
+        requests.append(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    embedder._embed_uncached = embed_uncached
+    return embedder, requests
+
+
+def test_embed_texts_only_sends_misses():
+    """只请求未命中的文本（规范化后去重），结果按原顺序拼回"""
+    embedder, requests = _fake_embedder(EmbeddingCache(client=FakeRedis()))
+
+    first = asyncio.run(embedder.embed_texts(["光合作用", "ＡＢ  c", "AB c", "光合作用"]))
+    assert requests == [["光合作用", "ＡＢ  c"]]
+    assert first == [[4.0, 1.0], [5.0, 1.0], [5.0, 1.0], [4.0, 1.0]]
+    assert embedder.cache_stats == {"hits": 0, "misses": 4, "hit_rate": 0.0}
+
+    # 另一份文档中重复出现的段落直接命中
+    second = asyncio.run(embedder.embed_texts(["新段落", "AB c", "光合作用"]))
+    assert requests[1] == ["新段落"]
+    assert second == [[3.0, 1.0], [5.0, 1.0], [4.0, 1.0]]
+    assert embedder.cache_stats == {"hits": 2, "misses": 5, "hit_rate": 0.2857}
+
+
+def test_cache_skips_placeholder_vectors_and_separates_models():
+    """全零占位向量不入缓存；不同模型的 key 互不影响"""
+    client = FakeRedis()
+    cache = EmbeddingCache(client=client)
+    cache.set_many("m1", ["a", "b"], [[0.0, 0.0], [0.5, 0.25]])
+
+    assert cache.get_many("m1", ["a", "b"]) == [None, [0.5, 0.25]]
+    assert cache.get_many("m2", ["b"]) == [None]
+    assert cache_key("m1", " b\n") == cache_key("m1", "b")
+
+
+def test_cache_degrades_when_redis_unavailable():
+    """Redis 不可用时全部视为未命中，并暂停访问一段时间"""
+    client = BrokenRedis()
+    embedder, requests = _fake_embedder(EmbeddingCache(client=client))
+
+    assert asyncio.run(embedder.embed_texts(["x"])) == [[1.0, 1.0]]
+    assert asyncio.run(embedder.embed_texts(["y"])) == [[1.0, 1.0]]
+    assert client.calls == 1
+    assert embedder.cache_stats["misses"] == 2
@@ -0,0 +1,201 @@
+"""LLM Provider 单元测试（使用 httpx.MockTransport，不访问网络）"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.services.llm_provider import AnthropicProvider, HedgedProvider, OpenAICompatibleProvider
+from app.services.metrics import LLM_TOKENS
+from app.services.resilience import CircuitBreaker, LatencyTracker
+from mock_llm import MockLLMSettings, create_app
+
+
+def _provider(handler) -> OpenAICompatibleProvider:
+    provider = OpenAICompatibleProvider(api_key="test", model="test-model", base_url="http://mock/v1")
+    provider.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return provider
+
+
+@pytest.mark.asyncio
+async def test_stream_chat_parses_sse_deltas():
+    """测试流式对话解析 SSE 增量"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert json.loads(request.content)["stream"] is True
+        lines = [
+            'data: {"choices":[{"delta":{"role":"assistant"}}]}',
+            'data: {"choices":[{"delta":{"content":"光合"}}]}',
+            'data: {"choices":[{"delta":{"content":"作用"}}]}',
+            "data: [DONE]",
+        ]
+        return httpx.Response(200, text="\n\n".join(lines) + "\n\n")
+
+    provider = _provider(handler)
+    deltas = [delta async for delta in provider.stream_chat([{"role": "user", "content": "hi"}])]
+
+    assert deltas == ["光合", "作用"]
+
+
+class FakeProvider:
+    def __init__(self, name: str, delay: float = 0.0, fail: bool = False):
+        self.provider_name = name
+        self.model = f"{name}-model"
+        self.delay = delay
+        self.fail = fail
+        self.status = 0  # 非 0 时返回该 HTTP 状态码
+        self.calls = 0
+        self.cancelled = 0
+
+    async def chat(self, messages, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.status:
+            request = httpx.Request("POST", "http://mock/v1/chat/completions")
+            raise httpx.HTTPStatusError(
+                "error", request=request, response=httpx.Response(self.status, request=request)
+            )
+        if self.fail:
+            raise httpx.ConnectError("down")
+        return self.provider_name
+
+
+def _hedged(primary, secondary, **overrides) -> HedgedProvider:
+    options = {"hedge": True, "quantile": 0.95, "min_delay": 0.05, "initial_delay": 0.05}
+    return HedgedProvider(primary, secondary, **{**options, **overrides})
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_takes_first_result_and_cancels_loser():
+    """主 Provider 超过对冲延迟未返回：发往备用，取先返回的结果并取消主请求"""
+    primary, secondary = FakeProvider("primary", delay=5), FakeProvider("secondary", delay=0.01)
+    provider = _hedged(primary, secondary)
+
+    assert await provider.chat([{"role": "user", "content": "hi"}]) == "secondary"
+    await asyncio.sleep(0)
+    assert (primary.calls, secondary.calls, primary.cancelled) == (1, 1, 1)
+
+    # 主 Provider 在对冲延迟内返回时不发出对冲请求
+    primary.delay = 0
+    assert await provider.chat([{"role": "user", "content": "hi"}]) == "primary"
+    assert secondary.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_failover_and_circuit_breaker():
+    """主 Provider 失败时立即转到备用；连续失败后熔断，冷却结束放行一个探测请求"""
+    now = [0.0]
+    primary, secondary = FakeProvider("primary", fail=True), FakeProvider("secondary")
+    provider = _hedged(primary, secondary, hedge=False)
+    provider.breakers["primary"] = CircuitBreaker("primary", 2, 30, clock=lambda: now[0])
+
+    for _ in range(2):
+        assert await provider.chat([{"role": "user", "content": "hi"}]) == "secondary"
+    assert provider.breakers["primary"].state == "open"
+
+    # 熔断期间不再调用主 Provider
+    assert await provider.chat([{"role": "user", "content": "hi"}]) == "secondary"
+    assert primary.calls == 2
+
+    now[0] = 31
+    primary.fail = False
+    assert await provider.chat([{"role": "user", "content": "hi"}]) == "primary"
+    assert provider.breakers["primary"].state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_client_errors_do_not_fail_over():
+    """429 以外的 4xx 直接抛出，不转到备用也不计入熔断；5xx 与 429 转到备用"""
+    primary, secondary = FakeProvider("primary"), FakeProvider("secondary")
+    provider = _hedged(primary, secondary, hedge=False)
+    provider.breakers["primary"] = CircuitBreaker("primary", 1, 30)
+
+    primary.status = 400
+    with pytest.raises(httpx.HTTPStatusError):
+        await provider.chat([{"role": "user", "content": "hi"}])
+    assert secondary.calls == 0
+    assert provider.breakers["primary"].state == "closed"
+
+    for status in (429, 503):
+        primary.status = status
+        provider.breakers["primary"] = CircuitBreaker("primary", 1, 30)
+        assert await provider.chat([{"role": "user", "content": "hi"}]) == "secondary"
+        assert provider.breakers["primary"].state == "open"
+    assert secondary.calls == 2
+
+
+def test_circuit_breaker_allows_single_probe():
+    """半开状态同一时刻只放行一个探测请求，探测失败重新熔断"""
+    now = [0.0]
+    breaker = CircuitBreaker("x", failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    now[0] = 10
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    now[0] = 20
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_latency_tracker_quantile():
+    """样本不足时不给出分位数"""
+    tracker = LatencyTracker(window=100, min_samples=10)
+    for i in range(9):
+        tracker.add(i / 10)
+    assert tracker.quantile(0.95) is None
+    tracker.add(0.9)
+    assert tracker.quantile(0.95) == 0.9 and tracker.quantile(0.5) == 0.4
+
+
+def _anthropic(prompt_cache: bool = True) -> AnthropicProvider:
+    provider = AnthropicProvider(
+        api_key="mock", model="claude-mock", base_url="http://mock", prompt_cache=prompt_cache
+    )
+    provider.client = httpx.AsyncClient(transport=httpx.ASGITransport(
+        app=create_app(MockLLMSettings(latency_ms=0, tokens_per_second=0, completion_tokens=10))
+    ))
+    return provider
+
+
+def _cache_tokens(kind: str) -> float:
+    return LLM_TOKENS.labels(provider="anthropic", model="claude-mock", kind=kind)._value.get()
+
+
+@pytest.mark.asyncio
+async def test_anthropic_marks_system_prompt_cacheable_and_reports_cache_hits():
+    """system 提示词打缓存断点；重复调用命中提供方缓存并记入指标；流式内容与非流式一致"""
+    provider = _anthropic()
+    messages = [
+        {"role": "system", "content": "你是一位优秀的教育内容改编专家。" * 20},
+        {"role": "user", "content": "请改写：光合作用"},
+    ]
+    payload = provider.build_payload(messages, max_tokens=100)
+    assert payload["system"][-1]["cache_control"] == {"type": "ephemeral"}
+    assert [m["role"] for m in payload["messages"]] == ["user"]
+
+    read_before, write_before = _cache_tokens("cache_read"), _cache_tokens("cache_write")
+    first = await provider.chat(messages)
+    assert _cache_tokens("cache_write") > write_before
+    assert _cache_tokens("cache_read") == read_before
+
+    streamed = "".join([delta async for delta in provider.stream_chat(messages)])
+    assert streamed == first and len(first) == 20
+    assert _cache_tokens("cache_read") > read_before
+
+
+@pytest.mark.asyncio
+async def test_anthropic_prompt_cache_can_be_disabled():
+    """关闭提示词缓存时不打断点"""
+    payload = _anthropic(prompt_cache=False).build_payload(
+        [{"role": "system", "content": "s"}, {"role": "user", "content": "u"}]
+    )
+    assert "cache_control" not in payload["system"][0]
@@ -0,0 +1,64 @@
+"""压测工具单元测试"""
+
+import httpx
+import pytest
+
+from app.main import app
+from app.services.llm_provider import OpenAICompatibleProvider
+from app.services.material_generator import (
+    get_immersive_generator,
+    get_mindmap_generator,
+    get_quiz_generator,
+)
+from loadtest.harness import Stats, Workload, find_saturation, percentile, run_level
+from mock_llm import MockLLMSettings, create_app
+
+
+def _level(concurrency, rps, p95_ms=100.0, error_rate=0.0):
+    return {
+        "concurrency": concurrency,
+        "endpoints": {
+            "POST /x": {"count": 100, "rps": rps, "error_rate": error_rate, "p95_ms": p95_ms},
+            "task:x": {"count": 10, "rps": 1, "error_rate": 1.0, "p95_ms": 99999},
+        },
+    }
+
+
+def test_percentile_nearest_rank():
+    """测试最近秩百分位"""
+    values = [i / 100 for i in range(1, 101)]
+    assert percentile(values, 50) == 0.5
+    assert percentile(values, 99) == 0.99
+    assert percentile([], 95) == 0.0
+
+
+def test_find_saturation():
+    """测试吞吐停止增长与违反 SLO 时的饱和点判定（task:* 聚合项不参与）"""
+    plateau = [_level(1, 10), _level(2, 19), _level(4, 20), _level(8, 20)]
+    assert find_saturation(plateau, slo_p95_ms=500, slo_error_rate=0.01)["concurrency"] == 2
+
+    slow = [_level(1, 10), _level(2, 19, p95_ms=800)]
+    assert find_saturation(slow, slo_p95_ms=500, slo_error_rate=0.01)["concurrency"] == 1
+
+    healthy = [_level(1, 10), _level(2, 20)]
+    assert find_saturation(healthy, slo_p95_ms=500, slo_error_rate=0.01)["reason"] == "未达到饱和"
+
+
+@pytest.mark.asyncio
+async def test_materials_scenario_against_app(monkeypatch):
+    """测试素材场景直连应用（mock LLM）并产出各端点统计"""
+    provider = OpenAICompatibleProvider(api_key="mock", model="mock-model", base_url="http://mock/v1")
+    provider.client = httpx.AsyncClient(transport=httpx.ASGITransport(
+        app=create_app(MockLLMSettings(latency_ms=0, tokens_per_second=0))
+    ))
+    for generator in (get_quiz_generator(), get_mindmap_generator(), get_immersive_generator()):
+        monkeypatch.setattr(generator, "llm_provider", provider)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app") as client:
+        workload = Workload(client, Stats(), pdf_pages=1)
+        await workload.setup()
+        level = await run_level(workload, "materials", concurrency=2, duration=0.2)
+
+    endpoints = level["endpoints"]
+    assert {"POST /materials/quiz", "bundle:materials"} <= set(endpoints)
+    assert endpoints["bundle:materials"]["error_rate"] == 0
@@ -0,0 +1,176 @@
+"""本地 CPU 推理单元测试（注入假会话与分词器，不需要 onnxruntime 和模型文件）"""
+
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services.embedder import Embedder
+from app.services.local_models import (
+    EmbeddingBatcher,
+    LocalModelUnavailableError,
+    LocalProvider,
+    OnnxEmbeddingModel,
+)
+
+
+class FakeTokenizer:
+    """每个字符一个 token，id 为字符编码"""
+
+    def enable_truncation(self, max_length):
+        self.max_length = max_length
+
+    def encode_batch(self, texts):
+        return [
+            SimpleNamespace(
+                ids=[ord(c) for c in text[:self.max_length]],
+                attention_mask=[1] * len(text[:self.max_length]),
+                type_ids=[0] * len(text[:self.max_length]),
+            )
+            for text in texts
+        ]
+
+
+class FakeSession:
+    """last_hidden_state 的每个 token 向量为 [id, 1]，补齐位置为 [999, 999]"""
+
+    def __init__(self):
+        self.batch_shapes = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="input_ids"), SimpleNamespace(name="attention_mask")]
+
+    def run(self, outputs, feeds):
+        assert set(feeds) == {"input_ids", "attention_mask"}
+        ids, mask = feeds["input_ids"], feeds["attention_mask"]
+        self.batch_shapes.append(ids.shape)
+        hidden = np.stack([ids, np.ones_like(ids)], axis=-1).astype(np.float32)
+        hidden[mask == 0] = 999
+        return [hidden]
+
+
+def _model(**options) -> OnnxEmbeddingModel:
+    return OnnxEmbeddingModel(
+        "models/fake-e5", session=FakeSession(), tokenizer=FakeTokenizer(), **options
+    )
+
+
+def test_mean_pooling_ignores_padding_and_normalizes():
+    """按掩码平均（补齐位置不参与），输出单位向量；按长度分批补齐"""
+    model = _model(batch_size=2, max_length=8)
+    texts = ["ab", "a", "abcdefghij", "abc"]
+
+    vectors = model.encode(texts)
+
+    expected = np.array([97.5, 1.0]) / np.linalg.norm([97.5, 1.0])
+    np.testing.assert_allclose(vectors[0], expected, rtol=1e-6)
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-6)
+    # 排序后短文本一批、长文本一批，长文本截断到 max_length
+    assert model.session.batch_shapes == [(2, 2), (2, 8)]
+    np.testing.assert_allclose(model.encode(["ab"])[0], vectors[0], rtol=1e-6)
+
+
+def test_batcher_merges_concurrent_requests():
+    """并发请求合并为一次推理，结果按请求拆分回去"""
+    calls = []
+
+    def encode(texts):
+        calls.append(list(texts))
+        return np.array([[float(len(t)), 0.0] for t in texts], dtype=np.float32)
+
+    batcher = EmbeddingBatcher(encode, max_batch_size=16, max_wait=0.05, workers=2)
+
+    async def run():
+        return await asyncio.gather(*[batcher.embed(["x" * i, "y"]) for i in range(1, 5)])
+
+    results = asyncio.run(run())
+    assert [r[:, 0].tolist() for r in results] == [[i, 1.0] for i in range(1, 5)]
+    assert len(calls) < 4 and sum(len(c) for c in calls) == 8
+
+    # 不同事件循环（如 Celery 任务各自的 asyncio.run）共用同一个批处理器
+    assert asyncio.run(batcher.embed(["abc"])).tolist() == [[3.0, 0.0]]
+
+
+def test_embedder_uses_local_provider(monkeypatch):
+    """local 模式下嵌入走本地模型，缓存 key 使用本地模型名"""
+    from app.services import embedder as embedder_module
+
+    model = _model()
+    provider = LocalProvider(EmbeddingBatcher(model.encode, max_wait=0), model="local:fake-e5")
+    monkeypatch.setattr(embedder_module.settings, "model_serve_mode", "local")
+
+    embedder = Embedder(cache=None)
+    embedder.cache = None
+    embedder.provider = provider
+    vectors = asyncio.run(embedder.embed_texts(["光合作用", "ab"]))
+
+    assert len(vectors) == 2 and len(vectors[0]) == 2
+    assert abs(np.linalg.norm(vectors[1]) - 1) < 1e-6
+    assert embedder.model_name == "local:multilingual-e5-small"
+
+
+class InvalidProtobuf(Exception):
+    """模拟 onnxruntime 加载损坏模型时抛出的异常（非 OSError / ImportError）"""
+
+
+def _broken_model(*args, **kwargs):
+    raise InvalidProtobuf("model.onnx: Protobuf parsing failed")
+
+
+@pytest.mark.parametrize("model_dir, model_class", [
+    ("missing", None),  # 目录中没有 tokenizer.json
+    ("broken", _broken_model),  # onnxruntime 加载失败
+    ("", None),  # 未配置嵌入模型目录
+])
+def test_embedder_falls_back_when_local_model_unavailable(monkeypatch, tmp_path, model_dir, model_class):
+    """本地模型加载失败统一转换为 LocalModelUnavailableError，嵌入器退回占位向量"""
+    from app.services import embedder as embedder_module
+    from app.services import local_models
+
+    monkeypatch.setattr(embedder_module.settings, "model_serve_mode", "local")
+    monkeypatch.setattr(local_models.settings, "local_embedding_model_dir", model_dir and str(tmp_path / model_dir))
+    monkeypatch.setattr(local_models.settings, "local_chat_model_path", "")
+    monkeypatch.setattr(local_models, "_local_provider", None)
+    if model_class is not None:
+        monkeypatch.setattr(local_models, "OnnxEmbeddingModel", model_class)
+
+    if model_dir:
+        with pytest.raises(LocalModelUnavailableError):
+            local_models.get_local_provider()
+
+    embedder = Embedder(cache=None)
+    embedder.cache = None
+    vectors = asyncio.run(embedder.embed_texts(["光合作用"]))
+    assert vectors == [[0.0] * 1536]
+
+
+@pytest.mark.asyncio
+async def test_chat_requires_local_chat_model():
+    """未配置本地对话模型时明确报错"""
+    with pytest.raises(LocalModelUnavailableError):
+        await LocalProvider().chat([{"role": "user", "content": "hi"}])
+    with pytest.raises(LocalModelUnavailableError):
+        await LocalProvider().stream_chat([{"role": "user", "content": "hi"}]).__anext__()
+
+
+class FakeChatModel:
+    name = "fake-gguf"
+
+    def chat(self, messages, **kwargs):
+        return "光合作用"
+
+    def stream(self, messages, emit, **kwargs):
+        for delta in ("光合", "作用"):
+            emit(delta)
+
+
+@pytest.mark.asyncio
+async def test_local_chat_streams_from_worker_thread():
+    """本地对话在线程池中推理，流式片段经队列回到事件循环"""
+    provider = LocalProvider(chat_model=FakeChatModel())
+    messages = [{"role": "user", "content": "hi"}]
+
+    assert await provider.chat(messages) == "光合作用"
+    assert [d async for d in provider.stream_chat(messages)] == ["光合", "作用"]
+    assert provider.model == "fake-gguf"
@@ -0,0 +1,233 @@
+"""整章素材 map-reduce 单元测试"""
+
+import asyncio
+import json
+
+import pytest
+
+from app.services.map_reduce import balance_quiz, map_parts, merge_mindmaps, split_content
+from app.services.material_generator import MaterialGenerationError, MindMapGenerator, QuizGenerator
+from app.services.tokenizer import count_tokens
+
+
+def test_split_content_packs_paragraphs_within_budget():
+    paragraphs = [f"第{i}节讲述光合作用的第{i}个要点，植物利用光能制造有机物。" for i in range(40)]
+    content = "\n\n".join(paragraphs)
+
+    parts = split_content(content, target_tokens=100)
+
+    assert len(parts) > 1
+    assert all(count_tokens(part) <= 100 for part in parts)
+    assert "\n".join(parts) == "\n".join(paragraphs)
+    assert split_content("短文本", target_tokens=100) == ["短文本"]
+
+
+def test_merge_mindmaps_dedupes_similar_labels():
+    """子图挂到同一个根下，相似标签合并，边重定向且不重复"""
+    first = {
+        "nodes": [
+            {"id": "root", "label": "光合作用", "type": "root"},
+            {"id": "node1", "label": "叶绿体", "type": "concept"},
+            {"id": "node2", "label": "光反应阶段", "type": "concept"},
+        ],
+        "edges": [
+            {"source": "root", "target": "node1", "label": "发生在"},
+            {"source": "node1", "target": "node2", "label": "进行"},
+        ],
+    }
+    second = {
+        "nodes": [
+            {"id": "root", "label": "光合作用 ", "type": "root"},
+            {"id": "node1", "label": "叶绿体。", "type": "concept"},
+            {"id": "node2", "label": "暗反应阶段", "type": "concept"},
+            {"id": "node3", "label": "光反应的阶段", "type": "concept"},
+        ],
+        "edges": [
+            {"source": "root", "target": "node1", "label": "发生在"},
+            {"source": "node1", "target": "node2", "label": "进行"},
+            {"source": "node1", "target": "node3", "label": "进行"},
+        ],
+    }
+
+    merged = merge_mindmaps([first, second], threshold=0.85)
+
+    labels = [node["label"] for node in merged["nodes"]]
+    assert labels == ["光合作用", "叶绿体", "光反应阶段", "暗反应阶段"]
+    assert [n["type"] for n in merged["nodes"]].count("root") == 1
+    pairs = [(e["source"], e["target"]) for e in merged["edges"]]
+    assert len(pairs) == len(set(pairs)) == 3
+    ids = {node["id"] for node in merged["nodes"]}
+    assert all(s in ids and t in ids for s, t in pairs)
+
+
+def test_balance_quiz_spreads_difficulty_and_drops_duplicates():
+    def question(stem, difficulty):
+        return {"id": "q", "type": "tf", "stem": stem, "answer": True, "difficulty": difficulty}
+
+    candidates = [
+        [question(f"第一节题目{i}", 1) for i in range(6)] + [question("叶绿素是绿色的吗", 5)],
+        [question("叶绿素是绿色的吗？", 5), question("第二节中等题", 3), question("第二节难题", 4)],
+    ]
+
+    selected = balance_quiz(candidates, count=5, threshold=0.85)
+
+    assert [q["difficulty"] for q in selected] == [1, 1, 3, 4, 5]
+    assert [q["id"] for q in selected] == ["q1", "q2", "q3", "q4", "q5"]
+    assert sum("叶绿素" in q["stem"] for q in selected) == 1
+
+
+def test_balance_quiz_coerces_bad_difficulty():
+    """缺失或无法解析的难度按 3 处理"""
+    candidates = [[
+        {"stem": "无难度题", "difficulty": None},
+        {"stem": "中文难度题", "difficulty": "中等"},
+        {"stem": "超范围题", "difficulty": 9},
+        {"stem": "简单题", "difficulty": "1"},
+    ]]
+
+    selected = balance_quiz(candidates, count=4, threshold=0.85)
+
+    assert [q["difficulty"] for q in selected] == [1, 3, 3, 3]
+
+
+@pytest.mark.asyncio
+async def test_map_parts_limits_concurrency_and_keeps_order():
+    active = peak = 0
+
+    async def work(part):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return part.upper()
+
+    assert await map_parts(work, list("abcdef"), concurrency=2) == list("ABCDEF")
+    assert peak == 2
+
+
+TOPICS = ["光反应", "卡尔文循环", "叶绿体结构", "影响光合速率的环境因素"]
+ASPECTS = ["是什么", "有什么作用", "受哪些条件限制"]
+
+
+class PartProvider:
+    """按片段返回各自的子图 / 题目，记录调用次数"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def chat(self, messages, **kwargs):
+        self.calls += 1
+        topic = messages[-1]["content"].rsplit("\n", 1)[-1].split("：")[0]
+        if messages.prompt_id.startswith("quiz"):
+            questions = [
+                {"type": "tf", "stem": f"{topic}{ASPECTS[d - 1]}？", "answer": True, "explanation": "", "difficulty": d}
+                for d in (1, 2, 3)
+            ]
+            return json.dumps({"questions": questions}, ensure_ascii=False)
+        return json.dumps({
+            "nodes": [
+                {"id": "root", "label": "光合作用", "type": "root"},
+                {"id": "n1", "label": topic, "type": "concept"},
+            ],
+            "edges": [{"source": "root", "target": "n1", "label": "包含"}],
+        }, ensure_ascii=False)
+
+
+def _chapter(monkeypatch) -> str:
+    from app.services import map_reduce
+
+    monkeypatch.setattr(map_reduce.settings, "map_reduce_chunk_tokens", 40)
+    return "\n".join(f"{topic}：植物利用光能把二氧化碳和水转化为有机物并释放氧气。" for topic in TOPICS)
+
+
+@pytest.mark.asyncio
+async def test_generate_document_maps_parts_and_reduces(monkeypatch):
+    content = _chapter(monkeypatch)
+    profile = {"grade": 5, "interests": []}
+
+    mindmap = MindMapGenerator()
+    mindmap.llm_provider = PartProvider()
+    result = await mindmap.generate_document(content, profile)
+    assert mindmap.llm_provider.calls == len(split_content(content)) == len(TOPICS)
+    assert result["nodes"][0] == {"id": "root", "label": "光合作用", "type": "root"}
+    assert [node["label"] for node in result["nodes"][1:]] == TOPICS
+    assert mindmap.validate(result)
+
+    quiz = QuizGenerator()
+    quiz.llm_provider = PartProvider()
+    result = await quiz.generate_document(content, profile, count=6)
+    assert len(result["questions"]) == 6
+    assert sorted(q["difficulty"] for q in result["questions"]) == [1, 1, 2, 2, 3, 3]
+    assert quiz.validate(result)
+
+
+class FailingPartProvider(PartProvider):
+    """指定主题的片段返回无法解析的响应"""
+
+    def __init__(self, failing: set[str]):
+        super().__init__()
+        self.failing = failing
+
+    async def chat(self, messages, **kwargs):
+        topic = messages[-1]["content"].rsplit("\n", 1)[-1].split("：")[0]
+        if topic in self.failing:
+            self.calls += 1
+            return "抱歉，我无法完成这个请求。"
+        return await super().chat(messages, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_failed_parts_are_dropped_instead_of_merging_mock_data(monkeypatch):
+    """片段失败时跳过（不混入模拟数据），全部失败时报错"""
+    content = _chapter(monkeypatch)
+    profile = {"grade": 5, "interests": []}
+
+    mindmap = MindMapGenerator()
+    mindmap.llm_provider = FailingPartProvider({TOPICS[1]})
+    result = await mindmap.generate_document(content, profile)
+    assert [node["label"] for node in result["nodes"][1:]] == [t for t in TOPICS if t != TOPICS[1]]
+
+    quiz = QuizGenerator()
+    quiz.llm_provider = FailingPartProvider(set(TOPICS))
+    with pytest.raises(MaterialGenerationError):
+        await quiz.generate_document(content, profile, count=6)
+    # 单个片段时仍降级为模拟数据
+    result = await quiz.generate(f"{TOPICS[0]}：植物利用光能。", profile, count=2)
+    assert len(result["questions"]) == 2
+
+
+class MalformedPartProvider(PartProvider):
+    """指定主题的片段返回能解析但结构不完整的素材（节点无 id、难度非整数）"""
+
+    def __init__(self, malformed: set[str]):
+        super().__init__()
+        self.malformed = malformed
+
+    async def chat(self, messages, **kwargs):
+        response = json.loads(await super().chat(messages, **kwargs))
+        topic = messages[-1]["content"].rsplit("\n", 1)[-1].split("：")[0]
+        if topic in self.malformed:
+            for node in response.get("nodes", []):
+                node.pop("id")
+            for question in response.get("questions", []):
+                question["difficulty"] = "中等"
+        return json.dumps(response, ensure_ascii=False)
+
+
+@pytest.mark.asyncio
+async def test_invalid_parts_are_dropped(monkeypatch):
+    """未通过校验的局部素材与生成失败的片段一样跳过"""
+    content = _chapter(monkeypatch)
+    profile = {"grade": 5, "interests": []}
+
+    mindmap = MindMapGenerator()
+    mindmap.llm_provider = MalformedPartProvider({TOPICS[0]})
+    result = await mindmap.generate_document(content, profile)
+    assert [node["label"] for node in result["nodes"][1:]] == TOPICS[1:]
+
+    quiz = QuizGenerator()
+    quiz.llm_provider = MalformedPartProvider({TOPICS[0]})
+    result = await quiz.generate_document(content, profile, count=6)
+    assert not any(q["stem"].startswith(TOPICS[0]) for q in result["questions"])
+    assert quiz.validate(result)
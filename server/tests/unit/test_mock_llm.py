@@ -0,0 +1,53 @@
+"""mock LLM 服务单元测试（通过 ASGITransport 直连，不监听端口）"""
+
+import httpx
+import pytest
+
+from app.services.llm_provider import OpenAICompatibleProvider
+from app.services.material_generator import QuizGenerator
+from mock_llm import MockLLMSettings, create_app
+
+
+def _provider(**overrides) -> OpenAICompatibleProvider:
+    settings = MockLLMSettings(latency_ms=0, tokens_per_second=0, **overrides)
+    provider = OpenAICompatibleProvider(api_key="mock", model="mock-model", base_url="http://mock/v1")
+    provider.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(settings)))
+    return provider
+
+
+@pytest.mark.asyncio
+async def test_chat_is_deterministic_and_streams_same_content():
+    """测试相同输入得到相同输出，流式与非流式内容一致"""
+    provider = _provider(completion_tokens=20)
+    messages = [{"role": "user", "content": "把这段话改写得更有趣"}]
+
+    first = await provider.chat(messages)
+    second = await provider.chat(messages)
+    streamed = "".join([delta async for delta in provider.stream_chat(messages)])
+
+    assert first == second == streamed
+    assert len(first) == 40
+
+
+@pytest.mark.asyncio
+async def test_structured_prompt_returns_parsable_json():
+    """测试带 JSON 示例的提示词返回可解析结果，生成器不走降级"""
+    generator = QuizGenerator()
+    generator.llm_provider = _provider()
+
+    result = await generator.generate("光合作用", {"grade": 5, "interests": ["足球"]}, count=4)
+
+    assert [q["type"] for q in result["questions"]] == ["single", "multi", "tf", "short"]
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_injection():
+    """测试 429 注入"""
+    provider = _provider(rate_limit_rate=1.0, retry_after=3)
+
+    response = await provider.client.post(
+        "http://mock/v1/chat/completions", json={"messages": [{"role": "user", "content": "hi"}]}
+    )
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
@@ -0,0 +1,120 @@
+"""扫描页 OCR 单元测试"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz
+
+from app.services.blob_store import LocalBlobStore
+from app.services.ocr import OCRPipeline
+from app.services.pdf_parser import PDFParser
+
+
+class FakeEngine:
+    """按图片字节长度返回固定文本的引擎（可 pickle，用于进程池）"""
+
+    name = "fake"
+
+    def __init__(self):
+        self.calls = 0
+
+    def recognize(self, image: bytes) -> list[dict]:
+        self.calls += 1
+        return [
+            {"text": "扫描标题", "bbox": [100, 100, 500, 160], "font_size": 60.0},
+            {"text": f"识别出的正文 {len(image)}", "bbox": [100, 200, 1500, 260], "font_size": 40.0},
+        ]
+
+
+def _build_pdf(path, scanned_pages: int, text_pages: int = 1):
+    """前 text_pages 页为文本页，其余为整页图片（每页图片内容不同）"""
+    doc = fitz.open()
+    for i in range(text_pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Text page {i} with enough characters to skip OCR.")
+    for i in range(scanned_pages):
+        page = doc.new_page()
+        pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 40, 40), 0)
+        pixmap.set_rect(pixmap.irect, (i * 40 % 256, 128, 200))
+        page.insert_image(page.rect, pixmap=pixmap)
+    doc.save(path)
+    doc.close()
+
+
+def test_parse_pdf_ocr_only_scanned_pages(tmp_path):
+    """只有扫描页走 OCR，识别结果换算为 PDF 坐标并参与块分类"""
+    pdf_path = tmp_path / "scan.pdf"
+    _build_pdf(pdf_path, scanned_pages=2)
+    engine = FakeEngine()
+    pipeline = OCRPipeline(engine, dpi=144)
+
+    progress = []
+    result = PDFParser(ocr=pipeline).parse_pdf(
+        pdf_path, on_ocr_page=lambda done, total: progress.append((done, total))
+    )
+
+    assert engine.calls == 2
+    assert progress == [(1, 2), (2, 2)]
+    text_page, scanned = result["pages"][0], result["pages"][1]
+    assert text_page["ocr"] is False
+    assert "Text page 0" in text_page["blocks"][0]["text"]
+
+    assert scanned["ocr"] is True
+    heading, paragraph = scanned["blocks"]
+    # 144 dpi 下像素坐标缩小一半
+    assert heading["bbox"] == [50, 50, 250, 80]
+    assert heading["type"] == "heading"
+    assert paragraph["font_size"] == 20.0
+    assert paragraph["text"].startswith("识别出的正文")
+
+
+def test_parse_pdf_text_only_skips_ocr(tmp_path):
+    """文本型 PDF 不初始化 OCR"""
+    pdf_path = tmp_path / "text.pdf"
+    _build_pdf(pdf_path, scanned_pages=0, text_pages=3)
+
+    engine = FakeEngine()
+    result = PDFParser(ocr=OCRPipeline(engine)).parse_pdf(pdf_path)
+
+    assert engine.calls == 0
+    assert not any(page["ocr"] for page in result["pages"])
+
+
+def test_ocr_pipeline_cache(tmp_path):
+    """相同页面图像第二次直接命中缓存"""
+    pages = [(1, b"page-a"), (2, b"page-b"), (3, b"page-a")]
+    engine = FakeEngine()
+    pipeline = OCRPipeline(engine, cache=LocalBlobStore(tmp_path))
+
+    first = pipeline.run(iter(pages), total=3)
+    assert engine.calls == 2  # 第 3 页与第 1 页图像相同
+    assert first[3] == first[1]
+
+    second = pipeline.run(iter(pages), total=3)
+    assert engine.calls == 2
+    assert second == first
+
+
+def test_ocr_pipeline_process_pool_bounded():
+    """进程池识别：在途页面数不超过上限，逐页上报进度"""
+    rendered = []
+    in_flight_max = 0
+    progress = []
+
+    def pages():
+        for i in range(1, 9):
+            rendered.append(i)
+            yield i, f"page-{i}".encode()
+
+    def on_page(done: int, total: int):
+        nonlocal in_flight_max
+        in_flight_max = max(in_flight_max, len(rendered) - done + 1)
+        progress.append(done)
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        pipeline = OCRPipeline(FakeEngine(), dpi=72, executor=executor, max_in_flight=3)
+        results = pipeline.run(pages(), total=8, on_page=on_page)
+
+    assert sorted(results) == list(range(1, 9))
+    assert results[5][1]["text"] == "识别出的正文 6"
+    assert progress == list(range(1, 9))
+    assert in_flight_max <= 3
@@ -55,6 +55,19 @@ def test_text_cleaner_clean_text():
     assert cleaned == ""
 
 
+def test_text_cleaner_clean_batch_matches_clean_text():
+    """测试批量清洗与逐块清洗结果一致"""
+    import random
+    
+    rng = random.Random(0)
+    alphabet = ["光", "合", "作", "用", " ", "  ", "\n", "\t", "第", "页", "1", "23", "a", "B", "。", "-"]
+    texts = ["123", " 123 ", "第 3 页 正文", "12 \n", "这是中 文文 本", "", "   "]
+    texts += ["".join(rng.choices(alphabet, k=rng.randint(0, 20))) for _ in range(500)]
+    
+    assert TextCleaner.clean_batch(texts) == [TextCleaner.clean_text(t) for t in texts]
+    assert TextCleaner.clean_batch([]) == []
+
+
 def test_text_cleaner_is_header_footer():
     """测试页眉页脚识别"""
     page_height = 1000
@@ -102,3 +115,115 @@ async def test_clean_and_chunk_simple():
     assert all("chunk_id" in chunk for chunk in chunks)
     assert all("text" in chunk for chunk in chunks)
     assert all("pages" in chunk for chunk in chunks)
+
+
+def _block(block_type, text, font_size=11):
+    return {"type": block_type, "text": text, "bbox": [0, 0, 100, 20], "font_size": font_size}
+
+
+@pytest.mark.asyncio
+async def test_section_chunk_keeps_sections_and_paths():
+    """测试分节模式：按标题树分块并携带节路径，不跨越大节边界"""
+    from app.services.pdf_parser import clean_and_chunk
+    
+    pages_data = [{
+        "page_number": 1,
+        "blocks": [
+            _block("heading", "第一章光合作用", 20),
+            _block("heading", "1.1 条件", 16),
+            _block("paragraph", "植物需要阳光、水和二氧化碳。" * 2),
+            _block("heading", "1.2 产物", 16),
+            _block("paragraph", "光合作用产生氧气和葡萄糖。" * 2),
+            _block("heading", "第二章呼吸作用", 20),
+            _block("paragraph", "呼吸作用分解有机物并释放能量。" * 12),
+        ],
+    }]
+    
+    chunks = await clean_and_chunk(pages_data, target_tokens=60, mode="section")
+    
+    # 第一章的两个小节合并为一个分块，路径取父节
+    assert chunks[0]["section_path"] == ["第一章光合作用"]
+    assert "1.1 条件" in chunks[0]["text"] and "1.2 产物" in chunks[0]["text"]
+    # 第二章超长，按句子拆分，所有分块都归属第二章
+    rest = chunks[1:]
+    assert len(rest) > 1
+    assert all(chunk["section_path"] == ["第二章呼吸作用"] for chunk in rest)
+    assert rest[0]["text"].startswith("第二章呼吸作用\n呼吸作用")
+    assert all("光合作用" not in chunk["text"] for chunk in rest)
+
+
+@pytest.mark.asyncio
+async def test_section_chunk_carries_heading_into_first_child():
+    """章标题下直接是超长小节时，章标题并入小节的第一个分块而不单独成块"""
+    from app.services.pdf_parser import clean_and_chunk
+    
+    pages_data = [{
+        "page_number": 1,
+        "blocks": [
+            _block("heading", "第一章光合作用", 20),
+            _block("heading", "1.1 条件", 16),
+            _block("paragraph", "植物需要阳光、水和二氧化碳才能进行光合作用。" * 12),
+        ],
+    }]
+    
+    chunks = await clean_and_chunk(pages_data, target_tokens=60, mode="section")
+    
+    assert chunks[0]["chunk_id"] == "chunk_0000"
+    assert chunks[0]["text"] != "第一章光合作用"
+    assert chunks[0]["text"].startswith("第一章光合作用\n1.1 条件\n植物需要阳光")
+    assert all(chunk["section_path"] == ["第一章光合作用", "1.1 条件"] for chunk in chunks)
+    assert sum(chunk["text"].count("第一章光合作用") for chunk in chunks) == 1
+
+
+def test_strip_repeated_blocks():
+    """测试去除跨页重复的页眉、页码和水印，保留正文"""
+    from app.services.pdf_parser import strip_repeated_blocks
+    
+    def page(number, chapter):
+        return {
+            "page_number": number,
+            "height": 1000,
+            "blocks": [
+                {"type": "paragraph", "text": f"第{chapter}章 光合作用", "bbox": [72, 30, 300, 42]},
+                {"type": "paragraph", "text": f"正文内容第{number}段，植物吸收阳光。", "bbox": [72, 100, 500, 300]},
+                {"type": "paragraph", "text": "内部资料", "bbox": [200, 500, 300, 520]},
+                {"type": "paragraph", "text": f"- {number} -", "bbox": [280, 960, 320, 975]},
+            ],
+        }
+    
+    # 前 4 页为第 1 章，后 6 页为第 2 章
+    pages_data = [page(n, 1 if n <= 4 else 2) for n in range(1, 11)]
+    
+    stripped, removed = strip_repeated_blocks(pages_data)
+    
+    assert removed == 30  # 每页页眉、水印、页码
+    assert all(len(p["blocks"]) == 1 for p in stripped)
+    assert stripped[0]["blocks"][0]["text"].startswith("正文内容")
+    
+    # 页数过少时不做判断
+    assert strip_repeated_blocks(pages_data[:2]) == (pages_data[:2], 0)
+
+
+def test_strip_repeated_blocks_keeps_chapter_openers():
+    """各章首页顶部的「第N章」标题不是页眉：不做数字替换，且分散出现的页边块不算重复"""
+    from app.services.pdf_parser import strip_repeated_blocks
+    
+    def page(number):
+        blocks = [
+            {"type": "paragraph", "text": f"正文内容第{number}段，植物吸收阳光。", "bbox": [72, 100, 500, 300], "font_size": 11},
+            {"type": "paragraph", "text": f"- {number} -", "bbox": [280, 960, 320, 975], "font_size": 9},
+        ]
+        if number % 4 == 1:
+            chapter = number // 4 + 1
+            # 第 1 章被识别为标题，第 2、3 章只有大字号
+            block_type = "heading" if chapter == 1 else "paragraph"
+            blocks.insert(0, {"type": block_type, "text": f"第{chapter}章", "bbox": [72, 40, 200, 64], "font_size": 20})
+        return {"page_number": number, "height": 1000, "blocks": blocks}
+    
+    pages_data = [page(n) for n in range(1, 13)]
+    
+    stripped, removed = strip_repeated_blocks(pages_data)
+    
+    assert removed == 12  # 只去除页码
+    openers = [p["blocks"][0]["text"] for p in stripped if p["page_number"] % 4 == 1]
+    assert openers == ["第1章", "第2章", "第3章"]
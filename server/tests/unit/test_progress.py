@@ -0,0 +1,186 @@
+"""任务进度事件通道单元测试"""
+
+import asyncio
+
+import orjson
+import pytest
+
+from app.services.progress import ProgressHub, ProgressPublisher
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.ops = []
+
+    def set(self, key, value, ex=None):
+        self.ops.append(("set", key, value))
+
+    def publish(self, channel, payload):
+        self.ops.append(("publish", channel, payload))
+
+    def execute(self):
+        self.client.executed.extend(self.ops)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.executed = []
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    @property
+    def published(self):
+        return [orjson.loads(op[2]) for op in self.executed if op[0] == "publish"]
+
+
+def test_publisher_throttles_within_stage():
+    """测试同一阶段内节流，阶段切换与终止状态立即发布"""
+    client = FakeRedis()
+    publisher = ProgressPublisher("task1", client=client, min_interval=60)
+
+    assert publisher.publish("parsing", 1, pages_parsed=1, total_pages=100)
+    assert not publisher.publish("parsing", 2, pages_parsed=2, total_pages=100)
+    assert publisher.publish("chunking", 40)
+    assert publisher.publish("completed", 100, status="success")
+
+    events = client.published
+    assert [e["stage"] for e in events] == ["parsing", "chunking", "completed"]
+    assert events[0]["detail"] == {"pages_parsed": 1, "total_pages": 100}
+    assert events[-1]["status"] == "success"
+    assert ("set", "progress:last:task1", client.executed[0][2]) == client.executed[0]
+
+
+@pytest.mark.asyncio
+async def test_hub_dispatch_fans_out_to_subscribers():
+    """测试分发中心向同一任务的多个订阅者广播"""
+    hub = ProgressHub(queue_size=2)
+    queues = [asyncio.Queue(maxsize=2) for _ in range(3)]
+    for queue in queues:
+        hub._subscribers["task1"].add(queue)
+
+    for progress in (10, 20, 30):
+        hub.dispatch("task1", orjson.dumps({"task_id": "task1", "progress": progress}))
+    hub.dispatch("other", orjson.dumps({"task_id": "other", "progress": 1}))
+
+    for queue in queues:
+        # 队列满时丢弃最旧事件，保留最新进度
+        assert [queue.get_nowait()["progress"] for _ in range(queue.qsize())] == [20, 30]
+
+    hub.unsubscribe("task1", queues[0])
+    assert queues[0] not in hub._subscribers["task1"]
+
+
+class FakePubSub:
+    """第一个连接在 client.drop 被设置后断开，之后的连接保持"""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def psubscribe(self, pattern):
+        self.client.psubscribes += 1
+        await asyncio.sleep(0)
+
+    async def listen(self):
+        if self.client.psubscribes == 1:
+            await self.client.drop.wait()
+            raise ConnectionError("connection reset")
+        await asyncio.Event().wait()
+        yield
+
+    async def aclose(self):
+        pass
+
+
+class FakeAsyncRedis:
+    def __init__(self, last=None):
+        self.last = last
+        self.drop = asyncio.Event()
+        self.psubscribes = 0
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+    async def get(self, key):
+        return self.last
+
+    async def aclose(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_hub_starts_single_listener_and_restarts_after_failure(monkeypatch):
+    """并发的首批订阅者只启动一个监听；连接断开后重新订阅并补发最近状态"""
+    from app.services import progress
+
+    monkeypatch.setattr(progress, "LISTENER_RETRY_MIN", 0)
+    last = orjson.dumps({"task_id": "task1", "status": "running", "progress": 50})
+    client = FakeAsyncRedis(last=last)
+    hub = ProgressHub(client=client)
+
+    queues = await asyncio.gather(*(hub.subscribe("task1") for _ in range(3)))
+    assert client.psubscribes == 1
+    listener = hub._listener
+
+    client.drop.set()
+    for _ in range(10):
+        await asyncio.sleep(0)
+    assert client.psubscribes == 2
+    assert hub._listener is listener and not listener.done()
+    for queue in queues:
+        # 订阅时一条、重连补发一条
+        assert [queue.get_nowait()["progress"] for _ in range(queue.qsize())] == [50, 50]
+
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_hub_subscribe_unregisters_queue_when_read_fails():
+    """读取最近状态失败时撤销订阅并抛出异常"""
+    client = FakeAsyncRedis()
+
+    async def get(key):
+        raise ConnectionError("redis down")
+
+    client.get = get
+    hub = ProgressHub(client=client)
+
+    with pytest.raises(ConnectionError):
+        await hub.subscribe("task1")
+    assert "task1" not in hub._subscribers
+
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_falls_back_to_celery_state_when_idle(monkeypatch):
+    """长时间没有进度事件时查询 Celery 状态并补发终止事件"""
+    from app.api import events
+
+    monkeypatch.setattr(events.settings, "progress_heartbeat", 0.01)
+    monkeypatch.setattr(events.settings, "progress_idle_timeout", 0.02)
+    monkeypatch.setattr(
+        events,
+        "_celery_event",
+        lambda task_id: {"task_id": task_id, "status": "failure", "detail": {"source": "celery"}},
+    )
+
+    received = [event async for event in events._events("task1", asyncio.Queue())]
+
+    assert received[0] is None
+    assert received[-1]["status"] == "failure"
+    assert received[-1]["detail"] == {"source": "celery"}
+
+
+@pytest.mark.asyncio
+async def test_stream_ends_after_overall_timeout(monkeypatch):
+    from app.api import events
+
+    monkeypatch.setattr(events.settings, "progress_heartbeat", 0.01)
+    monkeypatch.setattr(events.settings, "progress_idle_timeout", 60)
+    monkeypatch.setattr(events.settings, "progress_stream_timeout", 0.03)
+
+    received = [event async for event in events._events("task1", asyncio.Queue())]
+
+    assert received and all(event is None for event in received)
@@ -0,0 +1,74 @@
+"""提示词注册表单元测试"""
+
+import pytest
+
+from app.prompts import PromptMessages, PromptRegistry, PromptTemplate, registry
+from app.services.llm_provider import SingleFlightProvider
+from app.services.material_generator import QuizGenerator
+
+
+def test_system_prompt_is_identical_across_requests():
+    """system 不含按请求变化的内容，可被前缀缓存复用；变量位于 user 末尾"""
+    a = registry.render("quiz", count=5, grade=3, interests="足球", content="光合作用……")
+    b = registry.render("quiz", count=10, grade=8, interests="音乐", content="牛顿第一定律……")
+
+    assert a[0] == b[0] and a[0]["role"] == "system"
+    assert "```json" in a[0]["content"]
+    assert a[1]["content"].endswith("光合作用……")
+    assert a.prompt_id == "quiz@1"
+
+
+def test_services_render_through_registry():
+    """服务构建的提示词带有版本标识"""
+    messages = QuizGenerator.build_quiz_prompt(None, "内容", 5, ["足球"], count=3)
+
+    assert messages.prompt_id == "quiz@1"
+    assert "**题目数量**：3" in messages[1]["content"]
+    assert "足球" not in messages[0]["content"]
+
+
+def test_registry_versions_and_pinning():
+    """默认使用最新版本，可按名称固定版本；重复版本与 system 中的变量被拒绝"""
+    prompts = PromptRegistry(pinned={"demo": "1"})
+    prompts.register(PromptTemplate("demo", "1", "规则", "{text}"))
+    prompts.register(PromptTemplate("demo", "2", "新规则", "正文：{text}"))
+
+    assert prompts.render("demo", text="x").prompt_id == "demo@1"
+    prompts.pinned.clear()
+    assert prompts.render("demo", text="x")[1]["content"] == "正文：x"
+
+    with pytest.raises(ValueError):
+        prompts.register(PromptTemplate("demo", "2", "规则", "{text}"))
+    with pytest.raises(ValueError):
+        prompts.register(PromptTemplate("other", "1", "适合 {grade} 年级", "{text}"))
+    with pytest.raises(KeyError):
+        prompts.render("demo")
+
+
+class RecordingFlight:
+    def __init__(self):
+        self.keys = []
+
+    async def do(self, key, fn):
+        self.keys.append(key)
+        return await fn()
+
+
+class EchoProvider:
+    provider_name = "fake"
+    model = "fake-model"
+
+    async def chat(self, messages, **kwargs):
+        return messages.prompt_id
+
+
+@pytest.mark.asyncio
+async def test_prompt_version_is_part_of_singleflight_key():
+    """消息相同但提示词版本不同的请求使用不同的合并 key"""
+    flight = RecordingFlight()
+    provider = SingleFlightProvider(EchoProvider(), flight)
+    messages = [{"role": "user", "content": "x"}]
+
+    assert await provider.chat(PromptMessages(messages, "demo@1")) == "demo@1"
+    assert await provider.chat(PromptMessages(messages, "demo@2")) == "demo@2"
+    assert len(set(flight.keys)) == 2
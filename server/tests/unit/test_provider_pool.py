@@ -0,0 +1,180 @@
+"""Provider 池单元测试"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.config import LLMEndpoint
+from app.services.provider_pool import (
+    Endpoint,
+    PoolExhaustedError,
+    ProviderPool,
+    build_provider_pool,
+    parse_duration,
+)
+
+
+class FakeProvider:
+    model = "fake-model"
+
+    def __init__(self, name: str, delay: float = 0.0):
+        self.name = name
+        self.delay = delay
+        self.calls = 0
+
+    async def chat(self, messages, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.name
+
+
+def _endpoint(name, clock=None, **limits) -> Endpoint:
+    options = {"clock": clock} if clock else {}
+    return Endpoint(name, FakeProvider(name, delay=0.01), **limits, **options)
+
+
+MESSAGES = [{"role": "user", "content": "光合作用"}]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_load_follows_weights():
+    """并发请求按权重分摊到负载最低的端点"""
+    a, b = _endpoint("a", weight=1), _endpoint("b", weight=2)
+    pool = ProviderPool([a, b], max_wait=1)
+
+    await asyncio.gather(*[pool.chat(MESSAGES) for _ in range(30)])
+
+    assert (a.provider.calls, b.provider.calls) == (10, 20)
+    assert a.in_flight == b.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_rpm_limit_spills_to_other_endpoints():
+    """端点的 rpm 额度用完后，即使权重更高也不再选中；全部用完时报错"""
+    now = [0.0]
+    a = _endpoint("a", clock=lambda: now[0], weight=10, rpm=2)
+    b = _endpoint("b", clock=lambda: now[0], weight=1, rpm=3)
+    pool = ProviderPool([a, b], max_wait=0, clock=lambda: now[0])
+
+    assert [await pool.chat(MESSAGES) for _ in range(5)] == ["a", "a", "b", "b", "b"]
+    with pytest.raises(PoolExhaustedError):
+        await pool.chat(MESSAGES)
+
+    # 60 秒窗口滑过后额度恢复
+    now[0] = 61
+    assert await pool.chat(MESSAGES) == "a"
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_endpoint_is_skipped_until_retry_after():
+    """429 时换端点重试，并按 Retry-After 暂停该端点"""
+    calls = {"a": 0, "b": 0}
+
+    def handler(name, status):
+        def respond(request: httpx.Request) -> httpx.Response:
+            calls[name] += 1
+            if status == 429:
+                return httpx.Response(429, headers={"Retry-After": "7"})
+            return httpx.Response(200, json={"choices": [{"message": {"content": name}}]})
+        return respond
+
+    pool = build_provider_pool([
+        LLMEndpoint(base_url="http://a/v1", api_key="k1", weight=10),
+        LLMEndpoint(base_url="http://b/v1", api_key="k2"),
+    ])
+    for endpoint, name, status in zip(pool.endpoints, "ab", (429, 200)):
+        endpoint.provider.client = httpx.AsyncClient(transport=httpx.MockTransport(handler(name, status)))
+
+    assert await pool.chat(MESSAGES) == "b"
+    assert await pool.chat(MESSAGES) == "b"
+    assert calls == {"a": 1, "b": 2}
+    assert pool.endpoints[0].name == "a#0"
+    assert pool.endpoints[0].headroom() == 0
+
+
+@pytest.mark.asyncio
+async def test_only_server_errors_fail_over_and_cool_down():
+    """5xx、超时换端点并暂停该端点；其他 4xx 直接抛出，不影响端点"""
+    calls = {"a": 0, "b": 0}
+    failure = {"a": None}
+
+    def handler(name):
+        def respond(request: httpx.Request) -> httpx.Response:
+            calls[name] += 1
+            if name == "a" and failure["a"] is not None:
+                if isinstance(failure["a"], Exception):
+                    raise failure["a"]
+                return httpx.Response(failure["a"], json={"error": "x"})
+            return httpx.Response(200, json={"choices": [{"message": {"content": name}}]})
+        return respond
+
+    def fresh_pool():
+        pool = build_provider_pool([
+            LLMEndpoint(base_url="http://a/v1", api_key="k1", weight=10),
+            LLMEndpoint(base_url="http://b/v1", api_key="k2"),
+        ])
+        for endpoint, name in zip(pool.endpoints, "ab"):
+            endpoint.provider.client = httpx.AsyncClient(transport=httpx.MockTransport(handler(name)))
+        return pool
+
+    for error in (503, httpx.ReadTimeout("timeout"), httpx.ConnectError("refused")):
+        failure["a"] = error
+        pool = fresh_pool()
+        assert await pool.chat(MESSAGES) == "b"
+        assert pool.endpoints[0].headroom() == 0
+
+    for status in (400, 401, 404):
+        failure["a"] = status
+        pool = fresh_pool()
+        calls.update(a=0, b=0)
+        with pytest.raises(httpx.HTTPStatusError):
+            await pool.chat(MESSAGES)
+        assert calls == {"a": 1, "b": 0}
+        assert pool.endpoints[0].headroom() == 1
+
+
+def test_response_headers_update_headroom():
+    """响应头中的剩余额度修正端点余量，余量为 0 时暂停到重置时间"""
+    now = [0.0]
+    endpoint = _endpoint("a", clock=lambda: now[0])
+    endpoint.observe_response(httpx.Response(200, headers={
+        "x-ratelimit-limit-requests": "100",
+        "x-ratelimit-remaining-requests": "50",
+        "x-ratelimit-limit-tokens": "1000",
+        "x-ratelimit-remaining-tokens": "800",
+        "x-ratelimit-reset-requests": "30s",
+    }))
+    assert endpoint.headroom() == 0.5
+
+    endpoint.observe_response(httpx.Response(200, headers={
+        "x-ratelimit-limit-requests": "100",
+        "x-ratelimit-remaining-requests": "0",
+        "x-ratelimit-reset-requests": "1m30s",
+    }))
+    assert endpoint.headroom() == 0
+    now[0] = 91
+    assert endpoint.headroom() == 1.0
+
+    assert parse_duration("20ms") == 0.02 and parse_duration("2") == 2.0
+
+
+def test_services_share_one_pool(monkeypatch):
+    """进程内只创建一个 Provider 池，各服务共用同一份额度统计"""
+    from app.services import llm_provider
+    from app.services.material_generator import MindMapGenerator, QuizGenerator
+    from app.services.personalize_service import PersonalizeService
+
+    monkeypatch.setattr(llm_provider, "_llm_provider", None)
+    monkeypatch.setattr(llm_provider.settings, "model_serve_mode", "api")
+    monkeypatch.setattr(llm_provider.settings, "llm_fallback_provider", "")
+    monkeypatch.setattr(llm_provider.settings, "llm_fallback_model", "")
+    monkeypatch.setattr(llm_provider.settings, "llm_singleflight_enabled", False)
+    monkeypatch.setattr(
+        llm_provider.settings, "llm_endpoints", [LLMEndpoint(base_url="http://a/v1", api_key="k1", rpm=10)]
+    )
+
+    providers = [QuizGenerator().llm_provider, MindMapGenerator().llm_provider, PersonalizeService().llm_provider]
+
+    assert isinstance(providers[0], ProviderPool)
+    assert all(provider is providers[0] for provider in providers)
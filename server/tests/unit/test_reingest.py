@@ -0,0 +1,180 @@
+"""增量重新摄取单元测试"""
+
+import asyncio
+
+import fitz
+
+from app.services.blob_store import LocalBlobStore
+from app.services.chunk_store import ChunkStore
+from app.services.pdf_parser import PDFParser, clean_and_chunk
+from app.services.reingest import load_previous_version, reuse_chunk_ids
+
+
+def _build_pdf(path, sections: list[str]):
+    """每页一节：标题 + 若干段正文"""
+    doc = fitz.open()
+    for body in sections:
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Section {body}", fontsize=18)
+        for j in range(3):
+            page.insert_text((72, 120 + j * 40), f"{body} paragraph {j} of this section.")
+    doc.save(path)
+    doc.close()
+
+
+def _parse_and_chunk(pdf_path, previous_pages=None):
+    result = PDFParser().parse_pdf(pdf_path, previous_pages=previous_pages)
+    chunks = asyncio.run(clean_and_chunk(result["pages"], target_tokens=40))
+    return result, chunks
+
+
+def test_reingest_reuses_unchanged_pages_and_chunk_ids(tmp_path):
+    """修订版只重新解析变化的页面，未变化分块沿用 chunk_id 和向量"""
+    store = ChunkStore(LocalBlobStore(tmp_path / "blobs"))
+    v1 = [f"Original text {i}" for i in range(6)]
+    _build_pdf(tmp_path / "v1.pdf", v1)
+
+    result, chunks = _parse_and_chunk(tmp_path / "v1.pdf")
+    assert result["reused_pages"] == 0
+    assert all(page["hash"] for page in result["pages"])
+    for i, chunk in enumerate(chunks):
+        chunk["embedding"] = [float(i), 1.0]
+    store.save("doc", chunks, model="embed-v1")
+    store.save_pages("doc", result["pages"])
+    old_ids = {chunk["text"]: chunk["chunk_id"] for chunk in chunks}
+
+    # 修改第 3 页，并在开头插入一页
+    v2 = ["Inserted text"] + v1[:2] + ["Revised text 2"] + v1[3:]
+    _build_pdf(tmp_path / "v2.pdf", v2)
+
+    previous = load_previous_version(store, "doc")
+    assert previous is not None
+    result, new_chunks = _parse_and_chunk(tmp_path / "v2.pdf", previous.pages)
+    # 插入页后页码整体后移，按内容哈希仍能命中未修改的 5 页
+    assert result["reused_pages"] == 5
+    assert [page["page_number"] for page in result["pages"]] == list(range(1, 8))
+
+    assert previous.model == "embed-v1"
+    stats = reuse_chunk_ids(new_chunks, previous.chunks, "embed-v1", previous.model)
+    assert stats["reused"] > 0 and stats["added"] > 0
+    assert stats["reused"] + stats["added"] == len(new_chunks)
+    assert stats["reused"] + stats["removed"] == len(chunks)
+
+    max_old = max(int(cid.split("_")[1]) for cid in old_ids.values())
+    for chunk in new_chunks:
+        if chunk["text"] in old_ids:
+            assert chunk["chunk_id"] == old_ids[chunk["text"]]
+            assert "embedding" in chunk
+        else:
+            assert int(chunk["chunk_id"].split("_")[1]) > max_old
+            assert "embedding" not in chunk
+    assert len({chunk["chunk_id"] for chunk in new_chunks}) == len(new_chunks)
+
+
+def test_reingest_identical_file_reuses_everything(tmp_path):
+    """重新上传完全相同的文件：全部页面与分块复用"""
+    store = ChunkStore(LocalBlobStore(tmp_path / "blobs"))
+    _build_pdf(tmp_path / "v1.pdf", [f"Body {i}" for i in range(4)])
+
+    result, chunks = _parse_and_chunk(tmp_path / "v1.pdf")
+    store.save("doc", chunks)
+    store.save_pages("doc", result["pages"])
+
+    previous = load_previous_version(store, "doc")
+    result, new_chunks = _parse_and_chunk(tmp_path / "v1.pdf", previous.pages)
+    assert result["reused_pages"] == 4
+    stats = reuse_chunk_ids(new_chunks, previous.chunks)
+    assert stats == {"reused": len(chunks), "added": 0, "removed": 0}
+    assert [c["chunk_id"] for c in new_chunks] == [c["chunk_id"] for c in chunks]
+
+
+def test_reuse_chunk_ids_skips_foreign_and_placeholder_embeddings():
+    """嵌入模型不同或旧向量是全零占位向量时只沿用 chunk_id，不沿用向量"""
+    previous = [
+        {"chunk_id": "chunk_0000", "text": "a", "embedding": [0.5, 1.0]},
+        {"chunk_id": "chunk_0001", "text": "b", "embedding": [0.0, 0.0]},
+    ]
+
+    chunks = [{"text": "a"}, {"text": "b"}]
+    reuse_chunk_ids(chunks, previous, "embed-v2", "embed-v1")
+    assert [c["chunk_id"] for c in chunks] == ["chunk_0000", "chunk_0001"]
+    assert not any("embedding" in c for c in chunks)
+
+    # 旧矩阵未记录模型时同样不沿用
+    chunks = [{"text": "a"}]
+    reuse_chunk_ids(chunks, previous, "embed-v1", None)
+    assert "embedding" not in chunks[0]
+
+    chunks = [{"text": "a"}, {"text": "b"}]
+    reuse_chunk_ids(chunks, previous, "embed-v1", "embed-v1")
+    assert chunks[0]["embedding"] == [0.5, 1.0]
+    assert "embedding" not in chunks[1]
+
+
+def test_reingest_reparses_scanned_pages_without_ocr(tmp_path, monkeypatch):
+    """上次 OCR 不可用的扫描页不复用，OCR 可用后重新识别"""
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Text page with enough characters to skip OCR.")
+    page = doc.new_page()
+    pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 40, 40), 0)
+    pixmap.set_rect(pixmap.irect, (40, 128, 200))
+    page.insert_image(page.rect, pixmap=pixmap)
+    doc.save(tmp_path / "scan.pdf")
+    doc.close()
+
+    monkeypatch.setattr("app.services.pdf_parser.get_ocr_pipeline", lambda: None)
+    first = PDFParser().parse_pdf(tmp_path / "scan.pdf")
+    assert [page["scanned"] for page in first["pages"]] == [False, True]
+    assert first["pages"][1]["ocr"] is False
+
+    second = PDFParser().parse_pdf(tmp_path / "scan.pdf", previous_pages=first["pages"])
+    assert second["reused_pages"] == 1
+    # 早期版本的页面数据没有 scanned 字段，没有文本块的页面按扫描页处理
+    legacy = [{k: v for k, v in page.items() if k != "scanned"} for page in first["pages"]]
+    assert PDFParser().parse_pdf(tmp_path / "scan.pdf", previous_pages=legacy)["reused_pages"] == 1
+
+
+def test_chunk_store_load_all_and_pages(tmp_path):
+    """全部分块与向量、页面数据的读写；新分块无向量时删除旧向量"""
+    store = ChunkStore(LocalBlobStore(tmp_path))
+    assert store.load_pages("doc") is None
+    assert load_previous_version(store, "doc") is None
+
+    chunks = [
+        {"chunk_id": f"chunk_{i:04d}", "text": str(i), "embedding": [i, i + 0.5]} for i in range(3)
+    ]
+    store.save("doc", chunks)
+    store.save_pages("doc", [{"page_number": 1, "hash": "abc", "blocks": []}])
+
+    loaded = store.load_all("doc")
+    assert [c["embedding"] for c in loaded] == [[0.0, 0.5], [1.0, 1.5], [2.0, 2.5]]
+    assert store.load_pages("doc")[0]["hash"] == "abc"
+
+    store.save("doc", [{"chunk_id": "chunk_0000", "text": "0"}])
+    assert "embedding" not in store.load_all("doc")[0]
+
+
+def _form_xobject_pdf(texts: list[str]) -> fitz.Document:
+    """每页只有一个嵌套两层的 Form XObject（内容流相同，差异全在 XObject 中）"""
+    doc = fitz.open()
+    for text in texts:
+        source = fitz.open()
+        source.new_page().insert_text((72, 72), text, fontsize=14)
+        wrapper = fitz.open()
+        wrapper.new_page().show_pdf_page(source[0].rect, source, 0)
+        page = doc.new_page()
+        page.show_pdf_page(page.rect, wrapper, 0)
+    return doc
+
+
+def test_page_hash_covers_nested_form_xobjects():
+    """页面哈希递归覆盖 Form XObject 与字体资源；对象编号不同不影响哈希"""
+    from app.services.pdf_parser import page_content_hash
+
+    doc = _form_xobject_pdf(["Photosynthesis v1", "Respiration v2"])
+    first, second = (page_content_hash(doc, page) for page in doc)
+    assert first != second
+
+    # 另一个文件中同样内容的页面（对象编号不同）哈希相同
+    other = _form_xobject_pdf(["Extra page", "Photosynthesis v1"])
+    assert page_content_hash(other, other[1]) == first
@@ -0,0 +1,144 @@
+"""相同请求合并单元测试"""
+
+import asyncio
+
+import pytest
+import redis
+
+from app.services.llm_provider import SingleFlightProvider
+from app.services.singleflight import SingleFlight
+
+
+class FakeAsyncRedis:
+    """多个 SingleFlight 共享同一个实例，模拟多进程共用 Redis"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value.encode() if isinstance(value, str) else value
+        return True
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+
+class BrokenRedis:
+    async def set(self, *args, **kwargs):
+        raise redis.ConnectionError("down")
+
+
+class SlowProvider:
+    provider_name = "fake"
+    model = "fake-model"
+
+    def __init__(self, fail: bool = False):
+        self.calls = 0
+        self.fail = fail
+
+    async def chat(self, messages, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        if self.fail:
+            raise RuntimeError("upstream error")
+        return f"reply to {messages[-1]['content']} @ {kwargs.get('temperature')}"
+
+
+def _flight(client) -> SingleFlight:
+    return SingleFlight(client=client, lock_ttl=5, result_ttl=5, poll_interval=0.01)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_chats_share_one_call():
+    """同一进程内 N 个相同请求只调用一次上游，不同参数互不合并"""
+    upstream = SlowProvider()
+    flight = _flight(FakeAsyncRedis())
+    provider = SingleFlightProvider(upstream, flight)
+    messages = [{"role": "user", "content": "光合作用"}]
+
+    results = await asyncio.gather(
+        *[provider.chat(messages, temperature=0.7) for _ in range(20)],
+        provider.chat(messages, temperature=0.3),
+    )
+
+    assert upstream.calls == 2
+    assert set(results[:20]) == {"reply to 光合作用 @ 0.7"}
+    assert results[20] == "reply to 光合作用 @ 0.3"
+    assert (flight.executed, flight.shared) == (2, 19)
+    assert provider.model == "fake-model"
+
+
+@pytest.mark.asyncio
+async def test_requests_in_other_processes_wait_for_lock_holder():
+    """跨进程：持锁者执行，其他进程轮询取走结果，锁随之释放"""
+    client = FakeAsyncRedis()
+    upstream = SlowProvider()
+    workers = [SingleFlightProvider(upstream, _flight(client)) for _ in range(3)]
+    messages = [{"role": "user", "content": "牛顿第一定律"}]
+
+    results = await asyncio.gather(*[p.chat(messages) for p in workers])
+
+    assert upstream.calls == 1
+    assert len(set(results)) == 1
+    assert not [key for key in client.data if key.startswith("sf:lock:")]
+
+
+@pytest.mark.asyncio
+async def test_failure_propagates_and_next_call_retries():
+    """执行失败时等待者收到同一异常，之后的请求重新执行"""
+    upstream = SlowProvider(fail=True)
+    provider = SingleFlightProvider(upstream, _flight(FakeAsyncRedis()))
+    messages = [{"role": "user", "content": "x"}]
+
+    results = await asyncio.gather(*[provider.chat(messages) for _ in range(5)], return_exceptions=True)
+    assert upstream.calls == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    upstream.fail = False
+    assert await provider.chat(messages) == "reply to x @ None"
+    assert upstream.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_redis_unavailable_falls_back_to_in_process():
+    """Redis 不可用时仍在进程内合并"""
+    upstream = SlowProvider()
+    provider = SingleFlightProvider(upstream, _flight(BrokenRedis()))
+    messages = [{"role": "user", "content": "y"}]
+
+    await asyncio.gather(*[provider.chat(messages) for _ in range(5)])
+    assert upstream.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_cancel_waiters():
+    """发起者被取消时上游调用继续，其他等待者照常拿到结果；全部取消后才取消上游"""
+    upstream = SlowProvider()
+    provider = SingleFlightProvider(upstream, _flight(FakeAsyncRedis()))
+    messages = [{"role": "user", "content": "z"}]
+
+    t1 = asyncio.create_task(provider.chat(messages))
+    await asyncio.sleep(0.01)
+    t2 = asyncio.create_task(provider.chat(messages))
+    await asyncio.sleep(0.01)
+    t1.cancel()
+
+    assert await t2 == "reply to z @ None"
+    assert t1.cancelled()
+    assert upstream.calls == 1
+
+    t3 = asyncio.create_task(provider.chat([{"role": "user", "content": "w"}]))
+    await asyncio.sleep(0.01)
+    t3.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await t3
+    await asyncio.sleep(0)
+    assert not provider.flight._inflight[asyncio.get_running_loop()]
@@ -0,0 +1,64 @@
+"""Tokenizer 与提示词预算单元测试"""
+
+import pytest
+
+from app.config import get_settings
+from app.services.pdf_parser import clean_and_chunk
+from app.services.tokenizer import (
+    CJKEstimator,
+    ContextOverflowError,
+    fit_max_tokens,
+    get_tokenizer,
+    truncate_tokens,
+)
+
+settings = get_settings()
+
+
+def test_estimator_counts_cjk_words_and_numbers():
+    """测试估算器分别折算汉字、英文单词和数字"""
+    estimator = CJKEstimator(cjk_ratio=1.0)
+
+    assert estimator.count("光合作用") == 4
+    assert estimator.count("photosynthesis") == 4  # 14 字符 / 4
+    assert estimator.count("2024年，") == 2 + 1 + 1
+
+
+def test_truncate_tokens_keeps_tail_within_budget():
+    """测试按 token 截断（保留末尾）"""
+    estimator = CJKEstimator(cjk_ratio=1.0)
+
+    assert truncate_tokens("一二三四五六", 2, from_end=True, tokenizer=estimator) == "五六"
+    assert truncate_tokens("一二三", 10, tokenizer=estimator) == "一二三"
+    assert truncate_tokens("一二三", 0, tokenizer=estimator) == ""
+
+
+def test_fit_max_tokens_shrinks_and_rejects(monkeypatch):
+    """测试 max_tokens 按剩余上下文收紧，放不下时拒绝"""
+    monkeypatch.setattr(settings, "llm_context_window", 1000)
+    monkeypatch.setattr(settings, "context_safety_margin", 0)
+    monkeypatch.setattr(settings, "min_output_tokens", 100)
+    short = [{"role": "user", "content": "你好"}]
+
+    assert fit_max_tokens(short, 200) == 200
+    assert fit_max_tokens(short, 5000) < 1000
+
+    with pytest.raises(ContextOverflowError):
+        fit_max_tokens([{"role": "user", "content": "字" * 5000}], 200)
+
+
+@pytest.mark.asyncio
+async def test_chunk_tokens_use_tokenizer():
+    """测试分块按 tokenizer 计数且不超过目标"""
+    tokenizer = get_tokenizer()
+    pages_data = [{
+        "page_number": 1,
+        "blocks": [{"type": "paragraph", "text": "植物通过叶绿体吸收阳光。" * 5} for _ in range(20)],
+    }]
+
+    chunks = await clean_and_chunk(pages_data, target_tokens=120, overlap=10)
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk["tokens"] == tokenizer.count(chunk["text"])
+        assert chunk["tokens"] <= 120 + 10
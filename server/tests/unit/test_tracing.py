@@ -0,0 +1,50 @@
+"""分布式追踪单元测试"""
+
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from app.services import tracing
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    """用内存导出器替换全局 tracer"""
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(tracing, "_tracer", provider.get_tracer("test"))
+    return exporter
+
+
+def test_noop_when_disabled(monkeypatch):
+    """测试未启用追踪时装饰器透明、不传播上下文"""
+    monkeypatch.setattr(tracing, "_tracer", None)
+
+    @tracing.traced("noop")
+    def add(a, b):
+        return a + b
+
+    carrier = {}
+    tracing.inject_context(carrier)
+
+    assert add(1, 2) == 3
+    assert carrier == {}
+
+
+def test_context_propagates_across_carrier(exporter):
+    """测试上下文经消息头传播后子 span 归属同一 trace"""
+    carrier = {}
+    with tracing.start_span("publish"):
+        tracing.inject_context(carrier)
+
+    with tracing.start_span("run", context=tracing.extract_context(carrier)):
+        with tracing.start_span("llm.chat", **{"llm.model": "m"}):
+            pass
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    assert "traceparent" in carrier
+    assert len({span.context.trace_id for span in spans.values()}) == 1
+    assert spans["run"].parent.span_id == spans["publish"].context.span_id
+    assert spans["llm.chat"].attributes["llm.model"] == "m"
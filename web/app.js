@@ -156,8 +156,8 @@ async function handlePDFUpload(input) {
             const taskId = uploadResponse.data.data.task_id;
             updatePDFStatus('解析中...', 30);
             
-            // 轮询任务状态
-            await pollPDFTask(taskId);
+            // 订阅进度推送（不可用时退回轮询）
+            await watchPDFTask(taskId);
         } else {
             throw new Error(uploadResponse.data.message || '上传失败');
         }
@@ -172,6 +172,55 @@ async function handlePDFUpload(input) {
     }
 }
 
+const STAGE_LABELS = {
+    parsing: '解析中',
+    chunking: '分块中',
+    embedding: '向量化中',
+    indexing: '存储中',
+};
+
+function watchPDFTask(taskId) {
+    // 同步模式任务已完成，或浏览器不支持 SSE 时直接轮询
+    if (taskId.startsWith('sync_') || typeof EventSource === 'undefined') {
+        return pollPDFTask(taskId);
+    }
+    
+    return new Promise(resolve => {
+        const source = new EventSource(`${API_BASE_URL}/tasks/${taskId}/events`);
+        let finished = false;
+        
+        source.addEventListener('progress', async (e) => {
+            const event = JSON.parse(e.data);
+            const detail = event.detail || {};
+            let label = STAGE_LABELS[event.stage] || event.stage || '处理中...';
+            
+            if (detail.total_pages && detail.pages_parsed) {
+                label += `（${detail.pages_parsed}/${detail.total_pages} 页）`;
+            } else if (detail.total_chunks && detail.chunks_embedded !== undefined) {
+                label += `（${detail.chunks_embedded}/${detail.total_chunks} 块）`;
+            }
+            updatePDFStatus(label, event.progress);
+            
+            if (event.status === 'success' || event.status === 'failure') {
+                // 任务结束后查询一次最终结果
+                finished = true;
+                source.close();
+                await pollPDFTask(taskId);
+                resolve();
+            }
+        });
+        
+        source.onerror = async () => {
+            if (finished) return;
+            // 推送通道不可用，退回轮询
+            finished = true;
+            source.close();
+            await pollPDFTask(taskId);
+            resolve();
+        };
+    });
+}
+
 async function pollPDFTask(taskId, maxAttempts = 30) {
     const statusDiv = document.getElementById('pdfUploadStatus');
     
@@ -196,17 +245,21 @@ async function pollPDFTask(taskId, maxAttempts = 30) {
                 let extractedText = '';
                 
                 if (taskData.result) {
-                    // 方式1: 如果有 chunks 数组
-                    if (taskData.result.chunks && Array.isArray(taskData.result.chunks)) {
+                    // 方式1: 有 document_id 时分页拉取完整分块正文
+                    if (taskData.result.document_id) {
+                        extractedText = await fetchDocumentText(taskData.result.document_id);
+                    }
+                    // 方式2: 如果有 chunks 数组（预览）
+                    else if (taskData.result.chunks && Array.isArray(taskData.result.chunks)) {
                         extractedText = taskData.result.chunks
                             .map(chunk => chunk.text || chunk)
                             .join('\n\n');
                     }
-                    // 方式2: 如果直接是 filename 和 total_pages
+                    // 方式3: 如果直接是 filename 和 total_pages
                     else if (taskData.result.filename) {
                         extractedText = `PDF 文件：${taskData.result.filename}\n总页数：${taskData.result.total_pages}\n\n提取的文本将显示在这里...`;
                     }
-                    // 方式3: 如果是其他格式
+                    // 方式4: 如果是其他格式
                     else if (typeof taskData.result === 'string') {
                         extractedText = taskData.result;
                     }
@@ -252,6 +305,27 @@ async function pollPDFTask(taskId, maxAttempts = 30) {
     }, 3000);
 }
 
+async function fetchDocumentText(documentId, pageSize = 200) {
+    // 游标分页拉取文档分块（只取正文字段）
+    const texts = [];
+    let cursor = null;
+    
+    do {
+        const params = { limit: pageSize, fields: 'text' };
+        if (cursor) params.cursor = cursor;
+        
+        const response = await axios.get(
+            `${API_BASE_URL}/documents/${documentId}/chunks`,
+            { params }
+        );
+        const page = response.data.data;
+        page.items.forEach(chunk => texts.push(chunk.text));
+        cursor = page.next_cursor;
+    } while (cursor);
+    
+    return texts.join('\n\n');
+}
+
 function updatePDFStatus(text, progress) {
     document.getElementById('pdfStatusText').textContent = text;
     document.getElementById('pdfProgressBar').style.width = progress + '%';